@@ -0,0 +1,117 @@
+"""
+Cold-start benchmark: import time and time to first response, each run in a
+fresh interpreter.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup [--runs 5] [--json]
+    python -m benchmarks.bench_startup --update-baseline
+
+Every run starts a new Python process that imports main, runs the app
+lifespan (logging, provider pools, worker pools) and answers one
+/generate_map request with the provider reply replayed from
+benchmarks/fixtures/providers.json, as benchmarks.suite does. Three
+checkpoints are reported, each measured from just before "import main":
+
+    startup:import main     the module imports
+    startup:ready           + lifespan startup, when uvicorn would start serving
+    startup:first request   + the first /generate_map (lazy imports, first connection)
+
+with the best and median over the runs and the peak RSS of the process at
+that point. They are compared with, and stored in, benchmarks/baselines.json
+under the same rules as benchmarks.suite (--tolerance, --memory-tolerance).
+"""
+import os
+import sys
+import json
+import platform
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+from benchmarks.suite import BASELINES, MAP_TEXT, compare, print_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKPOINTS = ["startup:import main", "startup:ready", "startup:first request"]
+
+# Runs in the child interpreter; prints one JSON object of (seconds, peak RSS KiB) per checkpoint
+_CHILD = """
+import sys, json, time, asyncio, resource
+from benchmarks.suite import configure_environment
+configure_environment(record=False)
+
+def checkpoint():
+    return [time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss]
+
+start = time.perf_counter()
+import main
+marks = {"startup:import main": checkpoint()}
+
+async def first_request():
+    async with main.lifespan(main.app):
+        marks["startup:ready"] = checkpoint()
+        response = await main.generate_map(main.MapRequest(text=sys.argv[1]), main.Response())
+        marks["startup:first request"] = checkpoint()
+        assert response.api_used in ("gemini", "mistral"), response.api_used
+
+asyncio.run(first_request())
+print(json.dumps(marks))
+"""
+
+
+def run_once(text: str) -> Dict[str, List[float]]:
+    completed = subprocess.run([sys.executable, "-c", _CHILD, text], cwd=BACKEND_DIR, capture_output=True,
+                               text=True, timeout=120)
+    if completed.returncode != 0:
+        raise SystemExit(f"startup run failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(runs: int) -> Dict[str, Dict]:
+    samples = [run_once(MAP_TEXT) for _ in range(runs)]
+    results = {}
+    for name in CHECKPOINTS:
+        times = [sample[name][0] for sample in samples]
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = max(sample[name][1] for sample in samples) / (1024 if sys.platform == "darwin" else 1)
+        results[name] = {"min_ms": round(min(times) * 1000, 2), "median_ms": round(statistics.median(times) * 1000, 2),
+                         "peak_kib": round(peak, 1), "runs": runs}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to start")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed time increase (0.25 = +25%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="allowed peak RSS increase")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baselines")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = measure(max(1, args.runs))
+
+    stored = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES, encoding="utf-8") as f:
+            stored = json.load(f)
+    baselines = stored.get("benchmarks", {})
+    regressions = compare(results, baselines, args.tolerance, args.memory_tolerance)
+
+    if args.json:
+        print(json.dumps({"results": results, "regressions": regressions}, indent=2))
+    else:
+        print_report(results, baselines, regressions)
+
+    if args.update_baseline:
+        stored.update(python=platform.python_version(), machine=f"{platform.system()} {platform.machine()}",
+                      benchmarks={**baselines, **results})
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines updated: {BASELINES}")
+    elif regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
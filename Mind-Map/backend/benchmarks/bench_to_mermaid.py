@@ -0,0 +1,53 @@
+"""
+Scaling benchmark for mermaid_formatter.to_mermaid on synthetic graphs.
+
+Run from the backend directory:
+    python -m benchmarks.bench_to_mermaid [--sizes 10,100,1000,10000,50000] [--repeat 3]
+
+Two graph shapes are measured: "deep" (about sqrt(N) main categories) and
+"wide" (N/4 main categories, the worst case for category matching). Prints
+the best wall time per size and the time per node; with a linear formatter
+the per-node column stays roughly flat as the graph grows.
+"""
+import argparse
+import time
+
+from mermaid_formatter import to_mermaid
+from benchmarks.synthetic import synthetic_graph
+
+DEFAULT_SIZES = [10, 100, 1000, 5000, 10000, 50000]
+
+
+SHAPES = {
+    "deep": lambda size: 0,
+    "wide": lambda size: max(3, size // 4),
+}
+
+
+def bench(nodes, edges, main_topic, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        node_copy, edge_copy = list(nodes), [list(edge) for edge in edges]
+        start = time.perf_counter()
+        to_mermaid(node_copy, edge_copy, main_topic=main_topic)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    print(f"{'shape':>6} {'nodes':>8} {'edges':>8} {'best (ms)':>12} {'us/node':>10}")
+    for shape, categories in SHAPES.items():
+        for size in sizes:
+            nodes, edges, main_topic = synthetic_graph(size, categories=categories(size))
+            seconds = bench(nodes, edges, main_topic, args.repeat)
+            print(f"{shape:>6} {size:>8} {len(edges):>8} {seconds * 1000:>12.2f} {seconds * 1e6 / size:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
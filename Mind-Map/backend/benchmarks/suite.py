@@ -0,0 +1,268 @@
+"""
+Pipeline benchmark suite with stored baselines.
+
+Run from the backend directory:
+    python -m benchmarks.suite [--only to_mermaid,generate_map] [--repeat 1.0] [--json]
+    python -m benchmarks.suite --update-baseline
+    python -m benchmarks.suite --record
+
+Micro benchmarks time the CPU stages on synthetic input: reply parsing
+(extract_map_json), validate_and_fix_result, canonicalize, to_mermaid and
+the local extractor. Macro benchmarks run call_gemini / call_mistral
+(request building, limiter / breaker plumbing, reply parsing, validation)
+and the full /generate_map handler in-process, with every provider HTTP call
+answered from benchmarks/fixtures/providers.json by the replay transport
+(http_fixtures.py), so nothing leaves the machine. Response caches are
+disabled so every run does the full work.
+
+Each benchmark reports the best and median wall time of its runs (--repeat
+scales the run counts) and the peak memory traced by tracemalloc during one
+more run. The best time (least disturbed by other load on the machine) and
+the peak memory are compared with benchmarks/baselines.json: a benchmark
+regresses when its time exceeds the baseline by more than --tolerance (and 0.05 ms),
+or its peak memory by more than --memory-tolerance; the suite then exits 1.
+Baselines are machine-specific, so regenerate them with --update-baseline
+on the machine that runs the comparison (and raise --tolerance on small or
+shared hosts, where timings easily vary by a third).
+
+--record runs the macro benchmarks once against the configured providers
+(real keys from .env, or the *_API_URL overrides, e.g. loadtest.mock_providers)
+and stores their responses in the fixture file. Re-record after changing a
+prompt: replay matches requests by body, so changed prompts find no fixture.
+"""
+import gc
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import tracemalloc
+from contextlib import AsyncExitStack
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic import synthetic_graph
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures", "providers.json")
+BASELINES = os.path.join(HERE, "baselines.json")
+
+# Inputs of the macro benchmarks; the fixture file holds the provider answers to exactly these
+MAP_TEXT = ("Python is a high-level programming language used for web development, data analysis "
+            "and machine learning. Popular frameworks include Django, Flask, NumPy and PyTorch.")
+RESEARCH_TOPIC = "Rust memory safety"
+# Time regressions smaller than this are timer noise
+MIN_TIME_DELTA_MS = 0.05
+
+
+def configure_environment(record: bool):
+    """Replay (or record) provider HTTP and switch off the response caches; runs before any app import."""
+    os.environ["HTTP_FIXTURES_MODE"] = "record" if record else "replay"
+    os.environ["HTTP_FIXTURES"] = FIXTURES
+    if not record:
+        # Any well-formed keys will do: the replay transport answers every call
+        for key in ("GEMINI_API_KEY", "MISTRAL_API_KEY", "SERPER_API_KEY"):
+            os.environ[key] = "benchmark-" + "x" * 24
+    for prefix in ("MAP_CACHE", "SEARCH_CACHE"):
+        os.environ[f"{prefix}_DB"] = ""
+        os.environ[f"{prefix}_MAX_ENTRIES"] = "0"
+    # The research fixtures were recorded with facet fan-out on
+    os.environ["RESEARCH_FACETS"] = "tools,techniques,history"
+    os.environ.setdefault("LOG_LEVEL", "error")
+
+
+class Benchmark:
+    """
+    A named benchmark: prepare() builds fresh input (untimed) and returns the
+    callable that is timed; async callables run on the suite's event loop.
+    """
+
+    def __init__(self, name: str, prepare: Callable[[], Callable], runs: int, macro: bool = False):
+        self.name = name
+        self.prepare = prepare
+        self.runs = runs
+        self.macro = macro
+
+
+def build_benchmarks() -> List[Benchmark]:
+    from json_extractor import extract_map_json
+    from nlp_service import validate_and_fix_result, call_gemini, call_mistral
+    from canonicalize import canonicalize
+    from mermaid_formatter import to_mermaid
+    from local_extractor import extract_local
+    import main
+
+    def graph_dict(size: int) -> Dict:
+        nodes, edges, _ = synthetic_graph(size)
+        return {"nodes": nodes, "edges": edges, "api_used": "benchmark"}
+
+    reply = "Here is the mind map:\n```json\n" + json.dumps(graph_dict(200)) + "\n```"
+    document = " ".join(f"{' '.join(nodes[:3])} supports {nodes[-1]}." for nodes in
+                        (synthetic_graph(12, seed=seed)[0] for seed in range(400)))
+
+    def generate_map(body: Dict) -> Callable:
+        async def run():
+            response = await main.generate_map(main.MapRequest(**body), main.Response())
+            assert "+" in response.api_used or response.api_used in ("gemini", "mistral"), response.api_used
+        return run
+
+    def provider(call: Callable, research: bool) -> Callable:
+        async def run():
+            result = await call(MAP_TEXT, research)
+            assert result["nodes"], result.get("api_used")
+        return run
+
+    return [
+        Benchmark("extract_map_json[200 nodes]", lambda: lambda: extract_map_json(reply), runs=200),
+        Benchmark("validate_and_fix_result[1k]", lambda: (lambda data: lambda: validate_and_fix_result(data))(
+            graph_dict(1000)), runs=50),
+        Benchmark("canonicalize[5k]", lambda: (lambda data: lambda: canonicalize(data["nodes"], data["edges"]))(
+            graph_dict(5000)), runs=10),
+        Benchmark("to_mermaid[1k]", lambda: (lambda graph: lambda: to_mermaid(*graph))(synthetic_graph(1000)),
+                  runs=50),
+        Benchmark("to_mermaid[10k]", lambda: (lambda graph: lambda: to_mermaid(*graph))(synthetic_graph(10000)),
+                  runs=10),
+        Benchmark("extract_local[~30k chars]", lambda: lambda: extract_local(document), runs=20),
+        Benchmark("call_mistral", lambda: provider(call_mistral, False), runs=50, macro=True),
+        Benchmark("call_gemini", lambda: provider(call_gemini, False), runs=50, macro=True),
+        Benchmark("generate_map", lambda: generate_map({"text": MAP_TEXT}), runs=50, macro=True),
+        Benchmark("generate_map[research]", lambda: generate_map({"text": RESEARCH_TOPIC, "research_mode": True}),
+                  runs=20, macro=True),
+    ]
+
+
+def measure(benchmark: Benchmark, loop: asyncio.AbstractEventLoop, runs: int) -> Dict:
+    """Best and median wall time over `runs` runs, then the peak traced memory of one more run."""
+
+    def call(function: Callable):
+        result = function()
+        if asyncio.iscoroutine(result):
+            loop.run_until_complete(result)
+
+    # One untimed warm-up run (imports, lazily built state, pools)
+    call(benchmark.prepare())
+    times = []
+    for _ in range(runs):
+        function = benchmark.prepare()
+        # Like timeit: collect first, then keep the collector out of the timed run
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            call(function)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    function = benchmark.prepare()
+    tracemalloc.start()
+    try:
+        call(function)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"min_ms": round(min(times) * 1000, 4), "median_ms": round(statistics.median(times) * 1000, 4),
+            "peak_kib": round(peak / 1024, 1), "runs": runs}
+
+
+def compare(results: Dict[str, Dict], baselines: Dict[str, Dict], tolerance: float,
+            memory_tolerance: float) -> Dict[str, List[str]]:
+    """Names of the regressed metrics per benchmark."""
+    regressions = {}
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        flagged = []
+        if result["min_ms"] > baseline["min_ms"] * (1 + tolerance) \
+                and result["min_ms"] - baseline["min_ms"] > MIN_TIME_DELTA_MS:
+            flagged.append("time")
+        if result["peak_kib"] > baseline["peak_kib"] * (1 + memory_tolerance):
+            flagged.append("memory")
+        if flagged:
+            regressions[name] = flagged
+    return regressions
+
+
+def _change(value: float, baseline: float) -> str:
+    return f"{(value / baseline - 1) * 100:+.0f}%" if baseline else "-"
+
+
+def print_report(results: Dict[str, Dict], baselines: Dict[str, Dict], regressions: Dict[str, List[str]]):
+    print(f"{'benchmark':<30} {'best ms':>10} {'vs base':>8} {'median ms':>10} {'peak KiB':>10} {'vs base':>8}")
+    for name, result in results.items():
+        baseline = baselines.get(name, {})
+        flag = ("  REGRESSION (" + ", ".join(regressions[name]) + ")") if name in regressions else ""
+        print(f"{name:<30} {result['min_ms']:>10.3f} {_change(result['min_ms'], baseline.get('min_ms', 0)):>8} "
+              f"{result['median_ms']:>10.3f} "
+              f"{result['peak_kib']:>10.1f} {_change(result['peak_kib'], baseline.get('peak_kib', 0)):>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="", help="comma-separated substrings of benchmark names")
+    parser.add_argument("--repeat", type=float, default=1.0, help="scale factor for every benchmark's run count")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed time increase (0.25 = +25%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="allowed peak memory increase")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baselines")
+    parser.add_argument("--record", action="store_true", help="record provider fixtures for the macro benchmarks")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    configure_environment(args.record)
+    benchmarks = build_benchmarks()
+    if args.only:
+        wanted = [part.strip() for part in args.only.split(",") if part.strip()]
+        benchmarks = [benchmark for benchmark in benchmarks if any(part in benchmark.name for part in wanted)]
+
+    import main as app_main
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    stack = AsyncExitStack()
+    # The app lifespan opens the (replaying) provider clients once for all macro benchmarks
+    loop.run_until_complete(stack.enter_async_context(app_main.lifespan(app_main.app)))
+    try:
+        if args.record:
+            for benchmark in benchmarks:
+                if benchmark.macro:
+                    result = benchmark.prepare()()
+                    if asyncio.iscoroutine(result):
+                        loop.run_until_complete(result)
+            print(f"recorded fixtures into {FIXTURES}")
+            return
+        results = {benchmark.name: measure(benchmark, loop, max(1, int(benchmark.runs * args.repeat)))
+                   for benchmark in benchmarks}
+    finally:
+        loop.run_until_complete(stack.aclose())
+        loop.close()
+
+    stored = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES, encoding="utf-8") as f:
+            stored = json.load(f)
+    baselines = stored.get("benchmarks", {})
+    regressions = compare(results, baselines, args.tolerance, args.memory_tolerance)
+
+    if args.json:
+        print(json.dumps({"results": results, "regressions": regressions}, indent=2))
+    else:
+        print_report(results, baselines, regressions)
+
+    if args.update_baseline:
+        stored = {
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}",
+            "benchmarks": {**baselines, **results},
+        }
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines updated: {BASELINES}")
+    elif regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import random
+from typing import List, Tuple
+
+WORDS = [
+    "Learning", "Neural", "Agent", "Data", "Model", "Graph", "Search", "Policy",
+    "Vision", "Language", "Memory", "Planning", "Reward", "Network", "System",
+    "Training", "Inference", "Tools", "Methods", "Theory", "Design", "Analysis",
+]
+
+
+def synthetic_graph(num_nodes: int, seed: int = 42, categories: int = 0) -> Tuple[List[str], List[List[str]], str]:
+    """
+    Build a document-like mind map graph: a root, a layer of main categories,
+    a tree of sub-concepts below them, some cross links, and ~5% of nodes left
+    unconnected so the formatter has to attach them itself.
+
+    Returns (nodes, edges, main_topic).
+    """
+    rng = random.Random(seed)
+    root = "Main Topic"
+    categories = categories or max(3, int(num_nodes ** 0.5))
+    nodes = [root]
+    edges = []
+
+    def name(i):
+        return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+
+    category_names = [f"{rng.choice(WORDS)} Category {i}" for i in range(min(categories, num_nodes - 1))]
+    for category in category_names:
+        nodes.append(category)
+        edges.append([root, category, ""])
+
+    for i in range(len(nodes), num_nodes):
+        node = name(i)
+        nodes.append(node)
+        if rng.random() < 0.05:
+            continue  # left unconnected
+        parent = nodes[rng.randrange(1, len(nodes) - 1)] if len(nodes) > 2 else root
+        edges.append([parent, node, rng.choice(["", "includes", "uses"])])
+
+    # A few cross links between existing concepts
+    for _ in range(num_nodes // 10):
+        a, b = rng.choice(nodes), rng.choice(nodes)
+        if a != b:
+            edges.append([a, b, "related"])
+
+    rng.shuffle(edges)
+    return nodes, edges, root
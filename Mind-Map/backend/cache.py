@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from logs import get_logger
+
+log = get_logger("cache")
+
+# Relative cache DB paths are resolved against CACHE_DIR, or this directory when unset,
+# so the file does not depend on where the server was started
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The SQLite tier is pruned (expired rows, then the disk caps) once every this many writes
+DISK_PRUNE_EVERY = 100
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and casefold so trivially different inputs share a cache entry."""
+    return " ".join((text or "").split()).casefold()
+
+
+def make_key(*parts: Any) -> str:
+    """Build a compact, fixed-length cache key from the given parts."""
+    raw = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """
+    In-memory LRU cache with per-entry TTL and a byte budget, optionally
+    backed by a SQLite table so entries survive restarts.
+
+    Values must be JSON-serializable; their encoded size is what counts
+    against max_bytes. With stale_ttl > 0, expired entries are kept that much
+    longer and returned with tier 'stale' so callers can serve them while
+    they refresh in the background. The SQLite tier has its own caps
+    (disk_max_entries, disk_max_bytes), enforced every DISK_PRUNE_EVERY
+    writes by dropping the rows closest to expiry.
+    """
+
+    def __init__(self, namespace: str, ttl: float = 3600, max_entries: int = 1000,
+                 max_bytes: int = 50 * 1024 * 1024, db_path: Optional[str] = None,
+                 stale_ttl: float = 0, disk_max_entries: int = 10000,
+                 disk_max_bytes: int = 200 * 1024 * 1024):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = max(0.0, stale_ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path or None
+        self.disk_max_entries = disk_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._writes = 0
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # The SQLite file is opened on first use, so creating a cache (at import) touches no files
+        self._db_opened = False
+        self.stats = {"hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """The SQLite connection (None without one); call with the lock held."""
+        if self.db_path and not self._db_opened:
+            self._db_opened = True
+            self._open_db()
+        return self._db
+
+    def _uses_disk(self) -> bool:
+        # Configured, and not (yet) failed to open or closed
+        return bool(self.db_path) and (not self._db_opened or self._db is not None)
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_expiry ON cache (namespace, expires_at)")
+            self._prune_disk()
+            self._db.commit()
+        except Exception as e:
+            log.warning("cache_disk_disabled", cache=self.namespace, error=str(e))
+            self._db = None
+
+    def _prune_disk(self):
+        """Drop rows past their stale window, then the rows closest to expiry until both disk caps hold."""
+        self._db.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?",
+                         (self.namespace, time.time() - self.stale_ttl))
+        count, size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM cache WHERE namespace = ?",
+            (self.namespace,),
+        ).fetchone()
+        if count <= self.disk_max_entries and size <= self.disk_max_bytes:
+            return
+        doomed = []
+        rows = self._db.execute(
+            "SELECT key, LENGTH(CAST(value AS BLOB)) FROM cache WHERE namespace = ? ORDER BY expires_at",
+            (self.namespace,),
+        )
+        for key, row_size in rows:
+            if count <= self.disk_max_entries and size <= self.disk_max_bytes:
+                break
+            doomed.append((self.namespace, key))
+            count -= 1
+            size -= row_size
+        self._db.executemany("DELETE FROM cache WHERE namespace = ? AND key = ?", doomed)
+        self.stats["disk_evictions"] += len(doomed)
+
+    def _store_memory(self, key: str, value: Any, expires_at: float, size: int):
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Tuple[Optional[Any], str]:
+        """Return (value, tier) where tier is 'memory', 'disk', 'stale' or 'miss'."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[2], "memory"
+                if entry[0] + self.stale_ttl > now:
+                    self._entries.move_to_end(key)
+                    self.stats["stale_hits"] += 1
+                    return entry[2], "stale"
+                self._entries.pop(key)
+                self._bytes -= entry[1]
+
+            if self._disk() is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    ).fetchone()
+                except Exception as e:
+                    log.warning("cache_disk_read_error", cache=self.namespace, error=str(e))
+                    row = None
+                if row and row[1] + self.stale_ttl > now:
+                    value = json.loads(row[0])
+                    self._store_memory(key, value, row[1], len(row[0]))
+                    if row[1] <= now:
+                        self.stats["stale_hits"] += 1
+                        return value, "stale"
+                    self.stats["disk_hits"] += 1
+                    return value, "disk"
+
+            self.stats["misses"] += 1
+            return None, "miss"
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        encoded = json.dumps(value)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store_memory(key, value, expires_at, len(encoded))
+            if self._disk() is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                        (self.namespace, key, encoded, expires_at),
+                    )
+                    self._writes += 1
+                    if self._writes % DISK_PRUNE_EVERY == 0:
+                        self._prune_disk()
+                    self._db.commit()
+                except Exception as e:
+                    log.warning("cache_disk_write_error", cache=self.namespace, error=str(e))
+
+    async def aget(self, key: str) -> Tuple[Optional[Any], str]:
+        # Only the SQLite tier can block, so skip the thread hop when it is off
+        if not self._uses_disk():
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        if not self._uses_disk():
+            return self.set(key, value, ttl)
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "disk": self.db_path if self._uses_disk() else None,
+                "disk_max_entries": self.disk_max_entries,
+                "disk_max_bytes": self.disk_max_bytes,
+                **self.stats,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db_opened = True
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def cache_from_env(namespace: str, prefix: str, default_ttl: float = 3600, default_stale_ttl: float = 0,
+                   default_db: str = "") -> TTLCache:
+    """
+    Create a cache configured by <PREFIX>_TTL, _STALE_TTL, _MAX_ENTRIES, _MAX_BYTES,
+    _DB, _DISK_MAX_ENTRIES and _DISK_MAX_BYTES env vars. A relative _DB path is
+    resolved against CACHE_DIR (default: the backend directory).
+    """
+    def _num(name, default, cast):
+        try:
+            return cast(os.getenv(f"{prefix}_{name}", default))
+        except (TypeError, ValueError):
+            return default
+
+    db_path = os.getenv(f"{prefix}_DB", default_db).strip()
+    if db_path and db_path != ":memory:":
+        db_path = os.path.join(os.getenv("CACHE_DIR", "").strip() or _MODULE_DIR, os.path.expanduser(db_path))
+
+    return TTLCache(
+        namespace,
+        ttl=_num("TTL", default_ttl, float),
+        max_entries=_num("MAX_ENTRIES", 1000, int),
+        max_bytes=_num("MAX_BYTES", 50 * 1024 * 1024, int),
+        db_path=db_path or None,
+        stale_ttl=_num("STALE_TTL", default_stale_ttl, float),
+        disk_max_entries=_num("DISK_MAX_ENTRIES", 10000, int),
+        disk_max_bytes=_num("DISK_MAX_BYTES", 200 * 1024 * 1024, int),
+    )
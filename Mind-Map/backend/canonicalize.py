@@ -0,0 +1,270 @@
+import os
+import re
+import zlib
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# A "." separates ("Node.js") unless it starts a word (".NET")
+_SEPARATORS_RE = re.compile(r"[\s\-_/]+|(?<=\S)\.")
+# "+" and "#" carry meaning in names like "C++" and "C#", so they stay in the key
+_PUNCTUATION_RE = re.compile(r"[^\w\s+#.]")
+_DIGITS_RE = re.compile(r"\d+")
+# Words of symbols only ("...", "+") carry no name
+_SYMBOLS_ONLY_RE = re.compile(r"[+#.]+")
+
+# MinHash over character trigrams: NUM_BANDS buckets of ROWS_PER_BAND hashes each.
+# Two names whose trigram Jaccard similarity is s share at least one bucket with
+# probability 1 - (1 - s^ROWS)^BANDS (~0.97 at s = 0.6, ~0.2 at s = 0.2).
+NUM_BANDS = 8
+ROWS_PER_BAND = 2
+_PRIME = (1 << 31) - 1
+_SEEDS_A = [(i * 2654435761 + 1) % _PRIME or 1 for i in range(NUM_BANDS * ROWS_PER_BAND)]
+_SEEDS_B = [(i * 40503 + 7) % _PRIME for i in range(NUM_BANDS * ROWS_PER_BAND)]
+# Names hashed per NumPy pass (bounds the hashes x shingles temporary)
+_MINHASH_BATCH = 4096
+# Buckets bigger than this are common fragments, not near-duplicates
+MAX_BUCKET = 64
+# Shortest word a fuzzy merge may correct: one edit in a shorter word usually makes
+# another real word ("Modes" / "Models") rather than a typo
+MIN_TYPO_WORD = 7
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def canonicalize_enabled() -> bool:
+    return os.getenv("CANONICALIZE_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+
+
+# Words ending in "s" that are not plurals (or whose stem is another word)
+_NOT_PLURAL = frozenset({
+    "news", "series", "species", "means", "lens", "windows", "kubernetes", "diabetes", "headquarters",
+    "physics", "mathematics", "economics", "statistics", "analytics", "ethics", "robotics", "graphics",
+    "linguistics", "logistics", "genetics", "electronics", "politics", "dynamics", "mechanics", "ios", "macos",
+})
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 4 or word in _NOT_PLURAL or word.endswith(("ss", "us", "is", "as")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """
+    Comparison key for a concept name: Unicode-normalized, casefolded,
+    hyphens/underscores/slashes and inner dots treated as spaces, punctuation
+    other than "+", "#" and a leading "." dropped, and the last word singularized
+    ("Reinforcement-Learning" -> "reinforcement learning", "Neural Networks" ->
+    "neural network", "C++" stays "c++"). Names without any word give "".
+    """
+    text = unicodedata.normalize("NFKC", name).casefold()
+    text = _PUNCTUATION_RE.sub("", _SEPARATORS_RE.sub(" ", text))
+    words = [word for word in text.split() if not _SYMBOLS_ONLY_RE.fullmatch(word)]
+    if words:
+        words[-1] = _singular(words[-1])
+    return " ".join(words)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def minhash_bands(shingle_sets: List[Set[str]]) -> "np.ndarray":
+    """
+    One bucket key per (name, band): MinHash signatures of every name computed
+    batch-wise as a hashes x shingles matrix, then each band's rows folded into
+    a single int64. Every shingle set must be non-empty.
+    """
+    # NumPy is imported on first use, keeping it off the service's import path
+    import numpy as np
+
+    seed_a = np.array(_SEEDS_A, dtype=np.int64)[:, None]
+    seed_b = np.array(_SEEDS_B, dtype=np.int64)[:, None]
+    bands = np.empty((len(shingle_sets), NUM_BANDS), dtype=np.int64)
+    for start in range(0, len(shingle_sets), _MINHASH_BATCH):
+        batch = shingle_sets[start:start + _MINHASH_BATCH]
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingles in batch for shingle in shingles),
+                             dtype=np.int64)
+        offsets = np.cumsum([0] + [len(shingles) for shingles in batch[:-1]])
+        signatures = np.minimum.reduceat((seed_a * hashes + seed_b) % _PRIME, offsets, axis=1).T
+        folded = signatures.reshape(len(batch), NUM_BANDS, ROWS_PER_BAND)
+        key = folded[:, :, 0]
+        for row in range(1, ROWS_PER_BAND):
+            key = key * _PRIME + folded[:, :, row]
+        bands[start:start + len(batch)] = key
+    return bands
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """True when one substitution, insertion, deletion or adjacent swap turns a into b."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    left, right = a[start:end_a], b[start:end_b]
+    if len(left) <= 1 and len(right) <= 1:
+        return True
+    return len(left) == len(right) == 2 and left == right[::-1]
+
+
+def is_typo_variant(key_a: str, key_b: str) -> bool:
+    """
+    Whether two normalized keys may be fuzzy-merged: they differ in exactly one
+    word, both spellings of it are at least MIN_TYPO_WORD letters long and share
+    their first letter, and they are one edit apart. This keeps typo fixes
+    ("Reinforcment" / "Reinforcement") while leaving apart words that differ by
+    a prefix ("Synchronous" / "Asynchronous", "Supervised" / "Unsupervised").
+    """
+    words_a, words_b = key_a.split(), key_b.split()
+    if len(words_a) != len(words_b):
+        return False
+    differing = [(a, b) for a, b in zip(words_a, words_b) if a != b]
+    if len(differing) != 1:
+        return False
+    a, b = differing[0]
+    return min(len(a), len(b)) >= MIN_TYPO_WORD and a[0] == b[0] and _one_edit_apart(a, b)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # The earlier name stays the representative
+            self.parent[max(a, b)] = min(a, b)
+
+
+def canonicalize(nodes: List[str], edges: List[List[str]]) -> Tuple[List[str], List[List[str]], Dict]:
+    """
+    Merge concept names that differ only in case, separators, punctuation or
+    plural form, plus typo variants: names whose trigram Jaccard similarity
+    reaches CANONICALIZE_SIMILARITY and that pass is_typo_variant. Fuzzy
+    candidates come from MinHash LSH buckets, so the cost stays near-linear in
+    the number of names instead of comparing every pair. Names with different
+    numbers or word counts are never fuzzy-merged ("Type 1" vs "Type 2"), and
+    names with no word at all ("!!!") are never merged.
+
+    Each group keeps the spelling used most often: first the normalized key
+    with the most occurrences across its case / punctuation variants (so a
+    typo cannot win because the correct spelling was written two ways), then
+    that key's most used spelling, and only on equal counts the first seen.
+    Edges are rewritten onto it and self-loops / repeated edges are dropped.
+    Returns (nodes, edges, stats).
+    """
+    threshold = _env_float("CANONICALIZE_SIMILARITY", 0.8)
+
+    # Every distinct spelling, in first-seen order, with how often it is used
+    usage: Counter = Counter()
+    for node in nodes:
+        usage[node] += 1
+    for edge in edges:
+        usage[edge[0]] += 1
+        usage[edge[1]] += 1
+    names = list(usage)
+    keys = [normalize_name(name) for name in names]
+    groups = _UnionFind(len(names))
+
+    # Exact matches on the normalized key
+    first_with_key: Dict[str, int] = {}
+    for position, key in enumerate(keys):
+        if not key:
+            continue
+        if key in first_with_key:
+            groups.union(first_with_key[key], position)
+        else:
+            first_with_key[key] = position
+
+    # Near-duplicates among the distinct keys, found through MinHash buckets
+    fuzzy = 0
+    if threshold < 1.0:
+        unique = list(first_with_key.items())
+        shingles = [_trigrams(key) for key, _ in unique]
+        # Fuzzy merges need the same numbers and word count (typos, not "Semi-Supervised" vs "Supervised")
+        shapes = [(tuple(_DIGITS_RE.findall(key)), key.count(" ")) for key, _ in unique]
+        candidates = [item for item, (key, _) in enumerate(unique) if len(key) >= 5]
+        buckets: Dict[Tuple, List[int]] = {}
+        for item, band_keys in zip(candidates, minhash_bands([shingles[item] for item in candidates]).tolist()):
+            for band, bucket in enumerate(band_keys):
+                buckets.setdefault((band, bucket, shapes[item]), []).append(item)
+        compared = set()
+        for members in buckets.values():
+            if len(members) < 2 or len(members) > MAX_BUCKET:
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) in compared:
+                        continue
+                    compared.add((a, b))
+                    union = len(shingles[a] | shingles[b])
+                    if (union and len(shingles[a] & shingles[b]) / union >= threshold
+                            and is_typo_variant(unique[a][0], unique[b][0])):
+                        if groups.find(unique[a][1]) != groups.find(unique[b][1]):
+                            fuzzy += 1
+                        groups.union(unique[a][1], unique[b][1])
+
+    # Best spelling per group: most used key, then most used spelling, then first seen
+    key_usage: Counter = Counter()
+    for name, key in zip(names, keys):
+        key_usage[key] += usage[name]
+    best: Dict[int, int] = {}
+    for position, name in enumerate(names):
+        root = groups.find(position)
+        if root not in best:
+            best[root] = position
+            continue
+        current = best[root]
+        if (key_usage[keys[position]], usage[name]) > (key_usage[keys[current]], usage[names[current]]):
+            best[root] = position
+    canonical = {name: names[best[groups.find(position)]] for position, name in enumerate(names)}
+
+    merged_nodes: List[str] = []
+    seen_nodes = set()
+    for node in nodes:
+        name = canonical[node]
+        if name not in seen_nodes:
+            seen_nodes.add(name)
+            merged_nodes.append(name)
+    merged_edges: List[List[str]] = []
+    seen_edges = set()
+    for edge in edges:
+        source, target = canonical[edge[0]], canonical[edge[1]]
+        if source == target or (source, target) in seen_edges:
+            continue
+        seen_edges.add((source, target))
+        merged_edges.append([source, target, edge[2] if len(edge) > 2 else ""])
+
+    stats = {
+        "names_merged": len(names) - len(best),
+        "fuzzy_merges": fuzzy,
+        "edges_dropped": len(edges) - len(merged_edges),
+    }
+    return merged_nodes, merged_edges, stats
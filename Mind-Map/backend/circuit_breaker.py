@@ -0,0 +1,178 @@
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from logs import get_logger
+
+log = get_logger("circuit_breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a rolling window of calls.
+
+    A call counts as bad when it failed or took longer than slow_call_seconds.
+    Once the window holds at least min_calls and the bad-call rate reaches
+    failure_rate, the breaker opens and callers are turned away immediately.
+    After open_seconds it lets a single probe through (half-open): success
+    closes it again, failure re-opens it.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 20.0, open_seconds: float = 30.0):
+        self.name = name
+        self.window = deque(maxlen=max(1, window))
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"rejected": 0, "opened": 0, "last_error_rate": 0.0, "last_latency": None}
+
+    def _maybe_half_open(self):
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+
+    def is_open(self) -> bool:
+        """True when calls would be rejected right now (does not use up a half-open probe)."""
+        self._maybe_half_open()
+        return self.state == OPEN or (self.state == HALF_OPEN and self._probe_in_flight)
+
+    def allow(self) -> bool:
+        """Ask to make a call; in half-open state only one probe is let through at a time."""
+        self._maybe_half_open()
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self.stats["opened"] += 1
+        log.warning("breaker_opened", provider=self.name, error_rate=self.stats["last_error_rate"])
+
+    def record(self, success: bool, latency: float):
+        """Record the outcome of a call that allow() let through."""
+        bad = not success or latency > self.slow_call_seconds
+        self.stats["last_latency"] = round(latency, 3)
+        if self.state == HALF_OPEN:
+            if bad:
+                self._open()
+            else:
+                log.info("breaker_closed", provider=self.name)
+                self.state = CLOSED
+                self.window.clear()
+                self._probe_in_flight = False
+            return
+
+        self.window.append(bad)
+        error_rate = sum(self.window) / len(self.window)
+        self.stats["last_error_rate"] = round(error_rate, 3)
+        if self.state == CLOSED and len(self.window) >= self.min_calls and error_rate >= self.failure_rate:
+            self._open()
+
+    def release(self):
+        """Give back a half-open probe whose call was cancelled without an outcome."""
+        self._probe_in_flight = False
+
+    def info(self) -> Dict:
+        self._maybe_half_open()
+        info = {"state": self.state, "window_calls": len(self.window), **self.stats}
+        if self.state == OPEN:
+            info["retry_in"] = round(max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)), 1)
+        return info
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """Breaker for a provider, configured by the BREAKER_* environment variables."""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            provider,
+            window=int(_env_float("BREAKER_WINDOW", 20)),
+            min_calls=int(_env_float("BREAKER_MIN_CALLS", 5)),
+            failure_rate=_env_float("BREAKER_FAILURE_RATE", 0.5),
+            slow_call_seconds=_env_float("BREAKER_SLOW_CALL_SECONDS", 20.0),
+            open_seconds=_env_float("BREAKER_OPEN_SECONDS", 30.0),
+        )
+        _breakers[provider] = breaker
+    return breaker
+
+
+class _Call:
+    """
+    Outcome holder for guarded_call: set success=False for bad answers that did
+    not raise, or success=None for answers that say nothing about the provider's
+    health (429 throttling, which the rate limiter queues and retries).
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.success: Optional[bool] = True
+        self.latency: Optional[float] = None
+
+    def mark(self):
+        """Fix the latency now (e.g. when a streaming response's headers arrive)."""
+        self.latency = time.monotonic() - self.started
+
+
+@asynccontextmanager
+async def guarded_call(provider: str):
+    """
+    Run one provider call under its circuit breaker: raise CircuitOpenError
+    right away when the breaker is open, otherwise record the call's outcome
+    and latency. Exceptions count as failures unless the call was marked
+    success=None first; cancellation records nothing.
+    """
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{provider} circuit breaker is open")
+    call = _Call()
+    outcome = None
+    try:
+        yield call
+        outcome = call.success
+    except Exception:
+        outcome = False if call.success is not None else None
+        raise
+    finally:
+        if outcome is None:
+            breaker.release()
+        else:
+            breaker.record(outcome, call.latency if call.latency is not None else time.monotonic() - call.started)
+
+
+def provider_open(provider: str) -> bool:
+    """True when the provider's breaker would reject a call right now."""
+    return get_breaker(provider).is_open()
+
+
+def breaker_info() -> Dict[str, Dict]:
+    return {name: get_breaker(name).info() for name in ("gemini", "mistral", "serper")}
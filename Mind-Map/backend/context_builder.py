@@ -0,0 +1,165 @@
+import os
+import re
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from rate_limit import estimate_tokens
+
+# NumPy is imported inside the functions that use it, keeping it off the service's import path
+if TYPE_CHECKING:
+    import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD_RE.findall(text.casefold()) if word not in _STOPWORDS]
+
+
+def split_passages(text: str, max_words: int) -> List[str]:
+    """Group sentences into passages of at most ~max_words words."""
+    passages, current, words = [], [], 0
+    for sentence in _SENTENCE_RE.split(text):
+        length = len(sentence.split())
+        if current and words + length > max_words:
+            passages.append(" ".join(current))
+            current, words = [], 0
+        current.append(sentence)
+        words += length
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def term_matrix(docs: List[List[str]]) -> Tuple["np.ndarray", Dict[str, int]]:
+    """Dense passage x term count matrix (passages are few, so dense is cheapest)."""
+    import numpy as np
+
+    vocab: Dict[str, int] = {}
+    ids = [vocab.setdefault(term, len(vocab)) for doc in docs for term in doc]
+    counts = np.zeros((len(docs), max(1, len(vocab))), dtype=np.float32)
+    if ids:
+        rows = np.repeat(np.arange(len(docs)), [len(doc) for doc in docs])
+        np.add.at(counts, (rows, np.asarray(ids)), 1.0)
+    return counts, vocab
+
+
+def bm25_scores(counts: "np.ndarray", query_ids: List[int], k1: float = 1.5, b: float = 0.75) -> "np.ndarray":
+    """Okapi BM25 score of every passage for the query terms, computed over the whole matrix at once."""
+    import numpy as np
+
+    if not query_ids:
+        return np.zeros(counts.shape[0], dtype=np.float32)
+    n_docs = counts.shape[0]
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    lengths = counts.sum(axis=1)
+    norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0))
+    tf = counts[:, query_ids]
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf[query_ids]).sum(axis=1)
+
+
+def tfidf_rows(counts: "np.ndarray") -> "np.ndarray":
+    """L2-normalized TF-IDF rows, so row dot products are cosine similarities."""
+    import numpy as np
+
+    df = np.count_nonzero(counts, axis=0)
+    weights = counts * np.log((1 + counts.shape[0]) / (1 + df) + 1)
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return weights / np.where(norms == 0, 1, norms)
+
+
+def _naive_context(search_results: List[Dict], topic: str) -> str:
+    """The prompt as it looked before budgeting: every source, in full."""
+    parts = [f"Research on {topic}:\n\n"]
+    for i, result in enumerate(search_results, 1):
+        parts.append(f"Source {i}:\nTitle: {result.get('title', '')}\nSummary: {result.get('snippet', '')}\n")
+        if result.get("content"):
+            parts.append(f"Content: {result['content']}\n")
+        parts.append("\n")
+    return "".join(parts)
+
+
+def build_context(search_results: List[Dict], topic: str) -> Tuple[str, Dict]:
+    """
+    Build the research context for the prompt: split every source into
+    passages (snippet + page text), rank them by BM25 relevance to the topic,
+    drop near-duplicates (TF-IDF cosine >= CONTEXT_DUP_THRESHOLD against a
+    better-ranked passage) and pack the best ones into CONTEXT_TOKEN_BUDGET
+    tokens. Kept passages are printed per source, in their original order.
+
+    Returns (text, report) where report counts passages and tokens saved.
+    """
+    budget = int(_env_float("CONTEXT_TOKEN_BUDGET", 1500))
+    threshold = _env_float("CONTEXT_DUP_THRESHOLD", 0.85)
+    max_words = max(10, int(_env_float("CONTEXT_PASSAGE_WORDS", 80)))
+
+    # (source index, is_snippet, text)
+    passages: List[Tuple[int, bool, str]] = []
+    for source, result in enumerate(search_results):
+        if result.get("snippet"):
+            passages.append((source, True, result["snippet"]))
+        for passage in split_passages(result.get("content") or "", max_words):
+            if passage.strip():
+                passages.append((source, False, passage))
+
+    header = f"Research on {topic}:\n\n"
+    before = estimate_tokens(_naive_context(search_results, topic))
+    report = {"passages": len(passages), "duplicates": 0, "kept": 0, "tokens_before": before}
+    if not passages:
+        report.update(tokens_after=before, tokens_saved=0)
+        return _naive_context(search_results, topic), report
+
+    counts, vocab = term_matrix([tokenize(text) for _, _, text in passages])
+    query_ids = sorted({vocab[term] for term in tokenize(topic) if term in vocab})
+    scores = bm25_scores(counts, query_ids)
+    # Stable sort: equal scores keep search-rank order (snippets before page text)
+    order = (-scores).argsort(kind="stable")
+    vectors = tfidf_rows(counts)
+
+    kept: List[int] = []
+    used = estimate_tokens(header)
+    titled = set()
+    for index in order.tolist():
+        if kept and float((vectors[kept] @ vectors[index]).max()) >= threshold:
+            report["duplicates"] += 1
+            continue
+        source, _, text = passages[index]
+        cost = estimate_tokens(text) + 2
+        if source not in titled:
+            cost += estimate_tokens(search_results[source].get("title", "")) + 4
+        if budget > 0 and used + cost > budget:
+            continue
+        used += cost
+        titled.add(source)
+        kept.append(index)
+
+    selected: Dict[int, List[int]] = {}
+    for index in sorted(kept):
+        selected.setdefault(passages[index][0], []).append(index)
+
+    parts = [header]
+    for number, source in enumerate(sorted(selected), 1):
+        parts.append(f"Source {number}:\nTitle: {search_results[source].get('title', '')}\n")
+        snippets = [passages[i][2] for i in selected[source] if passages[i][1]]
+        content = [passages[i][2] for i in selected[source] if not passages[i][1]]
+        if snippets:
+            parts.append(f"Summary: {snippets[0]}\n")
+        if content:
+            parts.append(f"Content: {' '.join(content)}\n")
+        parts.append("\n")
+    text = "".join(parts)
+
+    after = estimate_tokens(text)
+    report.update(kept=len(kept), tokens_after=after, tokens_saved=max(0, before - after))
+    return text, report
@@ -0,0 +1,190 @@
+import os
+import re
+import socket
+import asyncio
+import ipaddress
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from http_client import get_named_client
+from logs import get_logger
+from tracing import span
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+log = get_logger("deep_research")
+
+# Tags whose text is never article content
+_SKIP_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "footer", "header", "aside", "form", "iframe"]
+_WHITESPACE_RE = re.compile(r"\s+")
+# Redirects followed per page; each hop is checked like the original URL
+MAX_REDIRECTS = 3
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def deep_research_enabled() -> bool:
+    return os.getenv("DEEP_RESEARCH_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+
+
+def settings() -> Dict:
+    """DEEP_RESEARCH_* settings, read per call so they can be changed without a restart."""
+    return {
+        "pages": max(0, int(_env_float("DEEP_RESEARCH_PAGES", 3))),
+        "max_bytes": max(1024, int(_env_float("DEEP_RESEARCH_MAX_BYTES", 512 * 1024))),
+        "page_timeout": _env_float("DEEP_RESEARCH_PAGE_TIMEOUT", 5.0),
+        "deadline": _env_float("DEEP_RESEARCH_DEADLINE", 10.0),
+        "max_chars": max(200, int(_env_float("DEEP_RESEARCH_MAX_CHARS", 4000))),
+    }
+
+
+def html_to_text(html: bytes, encoding: Optional[str], max_chars: int) -> str:
+    """
+    Visible text of an HTML page, whitespace-collapsed and cut to max_chars.
+    Runs in a worker process, so it only takes and returns picklable values.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser", from_encoding=encoding)
+    for tag in soup(_SKIP_TAGS):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    text = _WHITESPACE_RE.sub(" ", root.get_text(" ", strip=True)).strip()
+    return text[:max_chars]
+
+
+_executor: Optional["ProcessPoolExecutor"] = None
+
+
+def start_extraction_pool():
+    """Start the HTML extraction worker processes (called from the app lifespan when enabled)."""
+    global _executor
+    if _executor is None:
+        # Imported here: it pulls in multiprocessing, which only deep research needs
+        from concurrent.futures import ProcessPoolExecutor
+
+        _executor = ProcessPoolExecutor(max_workers=max(1, int(_env_float("DEEP_RESEARCH_WORKERS", 2))))
+
+
+def shutdown_extraction_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def is_public_url(url: str) -> bool:
+    """
+    True for http(s) URLs whose host resolves only to public addresses, so a
+    search result (or its redirect) cannot point the backend at loopback,
+    private, link-local or other internal addresses.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return False
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        return False
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not address.is_global or address.is_multicast:
+            return False
+    return bool(infos)
+
+
+async def fetch_page(url: str, max_bytes: int, timeout: float) -> Optional[Tuple[bytes, Optional[str]]]:
+    """
+    Stream one page, giving up on non-HTML answers and closing the connection
+    as soon as max_bytes have arrived. Redirects are followed by hand (at most
+    MAX_REDIRECTS) and every hop must pass is_public_url. Returns (body,
+    charset), or None when nothing usable was read.
+    """
+    client = get_named_client("pages")
+    headers = {"User-Agent": "MindMapAI/1.0 (+deep research)", "Accept": "text/html,application/xhtml+xml"}
+    for _ in range(MAX_REDIRECTS + 1):
+        if not await is_public_url(url):
+            log.info("page_blocked", url=url)
+            return None
+        async with client.stream("GET", url, headers=headers, timeout=timeout, follow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers.get("location", ""))
+                continue
+            content_type = response.headers.get("content-type", "")
+            if response.status_code != 200 or ("html" not in content_type and "text/plain" not in content_type):
+                log.debug("page_skipped", url=url, status=response.status_code, content_type=content_type)
+                return None
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= max_bytes:
+                    # Leaving the block closes the stream; the rest of the page is never downloaded
+                    log.debug("page_truncated", url=url, max_bytes=max_bytes)
+                    del body[max_bytes:]
+                    break
+            return bytes(body), response.charset_encoding
+    log.debug("page_skipped", url=url, reason="too many redirects")
+    return None
+
+
+async def _page_text(url: str, config: Dict) -> Optional[str]:
+    with span("page", url=url) as record:
+        try:
+            page = await asyncio.wait_for(fetch_page(url, config["max_bytes"], config["page_timeout"]),
+                                          config["page_timeout"])
+        except Exception as e:
+            log.info("page_fetch_failed", url=url, error=str(e) or type(e).__name__)
+            return None
+        if not page or not page[0]:
+            return None
+        html, encoding = page
+        loop = asyncio.get_running_loop()
+        try:
+            # Parsing is CPU-bound: keep it off the event loop (worker processes when started)
+            if _executor is not None:
+                text = await loop.run_in_executor(_executor, html_to_text, html, encoding, config["max_chars"])
+            else:
+                text = await asyncio.to_thread(html_to_text, html, encoding, config["max_chars"])
+        except Exception as e:
+            log.warning("page_extract_failed", url=url, error=str(e) or type(e).__name__)
+            return None
+        if record is not None:
+            record.attrs.update(bytes=len(html), chars=len(text))
+        return text or None
+
+
+async def deep_research(search_results: List[Dict]) -> List[Dict]:
+    """
+    When DEEP_RESEARCH_ENABLED is set, download the top DEEP_RESEARCH_PAGES result
+    pages concurrently and add their extracted text to the results as "content".
+    Pages that fail or miss DEEP_RESEARCH_DEADLINE are simply left with their snippet.
+    """
+    if not deep_research_enabled() or not search_results:
+        return search_results
+    config = settings()
+    targets = [result for result in search_results if result.get("link")][:config["pages"]]
+    if not targets:
+        return search_results
+
+    with span("deep_research", pages=len(targets)):
+        tasks = [asyncio.ensure_future(_page_text(result["link"], config)) for result in targets]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=config["deadline"])
+        finally:
+            # Also stop the downloads when this request is cancelled (client gone, hedge lost)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        if pending:
+            log.warning("deep_research_deadline", finished=len(done), dropped=len(pending))
+
+    enriched = {id(result): task.result() for result, task in zip(targets, tasks)
+                if task in done and task.result()}
+    return [{**result, "content": enriched[id(result)]} if id(result) in enriched else result
+            for result in search_results]
@@ -0,0 +1,138 @@
+import sys
+import zlib
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Characters replaced or removed when turning a node name into a Mermaid ID
+_ID_TRANSLATION = str.maketrans({
+    " ": "_",
+    "(": None, ")": None, "[": None, "]": None, "{": None, "}": None, "<": None, ">": None,
+    "/": "_", "\\": "_",
+    "&": "_and_",
+    "-": "_", ":": "_", ".": "_", ",": "_",
+    "?": None, "!": None, "'": None, '"': None,
+})
+
+
+def sanitize_node_id(text):
+    """
+    Remove or replace special characters that can cause issues in Mermaid syntax.
+    """
+    if not text:
+        return "empty_node"
+
+    # Replace spaces / punctuation in a single pass
+    result = text.translate(_ID_TRANSLATION)
+
+    # Ensure valid ID by removing any non-alphanumeric/underscore characters
+    # and make sure it starts with a letter or underscore
+    result = ''.join(c for c in result if c.isalnum() or c == '_')
+
+    # Ensure ID doesn't start with a number
+    if result and result[0].isdigit():
+        result = 'n_' + result
+
+    # If empty after cleaning, use a placeholder (stable across processes, unlike hash())
+    if not result:
+        return "node_" + str(zlib.crc32(text.encode("utf-8")) % 10000)
+
+    return result
+
+
+class MindMapGraph:
+    """
+    Compact mind map graph shared by the NLP and formatting layers.
+
+    Node names are interned and stored once; edges are three parallel integer
+    columns (source index, target index, relation index). The Mermaid ID of
+    each node is sanitized once, when the node is added, and made unique so
+    two different names can never collapse into the same Mermaid node.
+
+    'listed' marks nodes that came from the provider's node list, as opposed
+    to names that only appear as edge endpoints.
+    """
+
+    __slots__ = ("names", "ids", "listed", "sources", "targets", "relation_ids",
+                 "relations", "_index", "_relation_index", "_taken_ids")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: List[str] = []
+        self.listed = bytearray()
+        self.sources = array("i")
+        self.targets = array("i")
+        self.relation_ids = array("i")
+        self.relations: List[str] = [""]
+        self._index: Dict[str, int] = {}
+        self._relation_index: Dict[str, int] = {"": 0}
+        self._taken_ids = set()
+
+    @classmethod
+    def from_lists(cls, nodes, edges) -> "MindMapGraph":
+        """Build a graph from the provider's node list and [source, target, relation] edges."""
+        graph = cls()
+        for node in nodes or ():
+            if node and isinstance(node, str):
+                graph.add_node(node)
+        for edge in edges or ():
+            if not edge or len(edge) < 2:
+                continue
+            source, target = edge[0], edge[1]
+            if not source or not target or not isinstance(source, str) or not isinstance(target, str):
+                continue
+            relation = edge[2] if len(edge) >= 3 and isinstance(edge[2], str) else ""
+            graph.add_edge(source, target, relation)
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def index(self, name: str) -> Optional[int]:
+        return self._index.get(name)
+
+    def _allocate_id(self, name: str) -> str:
+        base = sanitize_node_id(name)
+        node_id = base
+        suffix = 2
+        while node_id in self._taken_ids:
+            node_id = f"{base}_{suffix}"
+            suffix += 1
+        self._taken_ids.add(node_id)
+        return node_id
+
+    def add_node(self, name: str, listed: bool = True) -> int:
+        """Return the index of name, adding it if needed."""
+        position = self._index.get(name)
+        if position is None:
+            position = len(self.names)
+            name = sys.intern(name)
+            self._index[name] = position
+            self.names.append(name)
+            self.ids.append(self._allocate_id(name))
+            self.listed.append(1 if listed else 0)
+        elif listed and not self.listed[position]:
+            self.listed[position] = 1
+        return position
+
+    def add_edge(self, source: str, target: str, relation: str = "") -> int:
+        """Append an edge (endpoints are added as unlisted nodes if unknown); returns its index."""
+        relation_id = self._relation_index.get(relation)
+        if relation_id is None:
+            relation_id = len(self.relations)
+            self._relation_index[relation] = relation_id
+            self.relations.append(sys.intern(relation))
+        self.sources.append(self.add_node(source, listed=False))
+        self.targets.append(self.add_node(target, listed=False))
+        self.relation_ids.append(relation_id)
+        return len(self.sources) - 1
+
+    def node_id(self, position: int) -> str:
+        return self.ids[position]
+
+    def listed_nodes(self) -> List[int]:
+        return [position for position, flag in enumerate(self.listed) if flag]
+
+    def edges(self) -> Iterator[Tuple[str, str, str]]:
+        names, relations = self.names, self.relations
+        for source, target, relation in zip(self.sources, self.targets, self.relation_ids):
+            yield names[source], names[target], relations[relation]
@@ -0,0 +1,106 @@
+import os
+import httpx
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from logs import get_logger
+from http_fixtures import transport_from_env
+
+log = get_logger("http")
+
+# One pooled AsyncClient per upstream host (Gemini, Mistral, Serper, ...).
+# Keeping a client per host gives every provider its own keep-alive limits,
+# so a burst against one provider cannot starve connections to another.
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 is opt-in and needs the optional 'h2' package (pip install httpx[http2])."""
+    if os.getenv("HTTP2_ENABLED", "false").strip().lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        log.warning("http2_unavailable", reason="HTTP2_ENABLED is set but the 'h2' package is not installed")
+        return False
+
+
+def pool_config() -> Dict:
+    """Read the connection pool settings from the environment."""
+    return {
+        "max_connections": _env_int("HTTP_MAX_CONNECTIONS", 50),
+        "max_keepalive_connections": _env_int("HTTP_MAX_KEEPALIVE", 20),
+        "keepalive_expiry": _env_float("HTTP_KEEPALIVE_EXPIRY", 30.0),
+        "http2": _http2_enabled(),
+    }
+
+
+def _build_client(config: Dict) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive_connections"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    # HTTP_FIXTURES_MODE=record|replay captures / replays provider responses (benchmarks)
+    transport = transport_from_env(limits, config["http2"])
+    if transport is not None:
+        return httpx.AsyncClient(transport=transport)
+    return httpx.AsyncClient(limits=limits, http2=config["http2"])
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_client(url: str) -> httpx.AsyncClient:
+    """Return the shared client for the host of the given URL, creating it on first use."""
+    key = _host_key(url)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = _build_client(pool_config())
+        _clients[key] = client
+    return client
+
+
+def get_named_client(name: str) -> httpx.AsyncClient:
+    """Shared client for traffic that is not tied to one host (e.g. downloading result pages)."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(pool_config())
+        _clients[name] = client
+    return client
+
+
+async def open_clients(*urls: Optional[str]):
+    """Warm up the pool for the given provider URLs (called from the app lifespan)."""
+    config = pool_config()
+    for url in urls:
+        if not url:
+            continue
+        key = _host_key(url)
+        if key not in _clients or _clients[key].is_closed:
+            _clients[key] = _build_client(config)
+    log.info("http_pool_ready", hosts=len(_clients), http2=config["http2"])
+
+
+async def close_clients():
+    """Close every pooled client and release their connections."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
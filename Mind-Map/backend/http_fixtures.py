@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import httpx
+
+from logs import get_logger
+
+log = get_logger("fixtures")
+
+# Headers worth replaying; the body is stored decoded, so encoding/length headers are not
+_KEPT_HEADERS = ("content-type", "retry-after")
+
+
+class FixtureMissingError(httpx.TransportError):
+    """Replay mode got a request that was never recorded."""
+
+
+def request_key(request: httpx.Request) -> str:
+    """
+    Method, path + query and a hash of the (JSON-canonicalized) body. The host
+    is left out, so fixtures recorded against loadtest.mock_providers replay
+    against the real URLs and vice versa; the body is only stored as a hash.
+    """
+    body = request.read()
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    return f"{request.method} {request.url.raw_path.decode('ascii', 'replace')} {digest}"
+
+
+class Cassette:
+    """
+    Recorded responses in one JSON file, keyed by request_key. A key can hold
+    several responses (e.g. a 429 then a 200); replay cycles through them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._replayed: Dict[str, int] = {}
+        self.interactions: Dict[str, List[Dict]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", {})
+
+    def next(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            recorded = self.interactions.get(key)
+            if not recorded:
+                return None
+            position = self._replayed.get(key, 0)
+            self._replayed[key] = position + 1
+            return recorded[position % len(recorded)]
+
+    def add(self, key: str, interaction: Dict):
+        with self._lock:
+            self.interactions.setdefault(key, []).append(interaction)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write-then-rename so an interrupted run never leaves a truncated file
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"interactions": self.interactions}, f, indent=1, sort_keys=True)
+            os.replace(temporary, self.path)
+
+
+class RecordReplayTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that either records every response of the wrapped
+    transport into a cassette ("record") or answers from the cassette without
+    touching the network ("replay"). Request headers, and so API keys, are
+    never stored. Streamed responses are recorded whole and replayed as one
+    body, which the SSE readers consume the same way.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        if mode == "record" and inner is None:
+            raise ValueError("record mode needs a transport to record from")
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if self.mode == "replay":
+            interaction = self.cassette.next(key)
+            if interaction is None:
+                raise FixtureMissingError(f"no recorded response for {key}", request=request)
+            return httpx.Response(interaction["status"], headers=interaction["headers"],
+                                  content=interaction["body"].encode("utf-8"), request=request)
+
+        response = await self.inner.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        headers = {name: value for name, value in response.headers.items() if name.lower() in _KEPT_HEADERS}
+        # Decode through an httpx.Response so gzip/deflate bodies are stored as text
+        decoded = httpx.Response(response.status_code, headers=response.headers, content=content).content
+        self.cassette.add(key, {"status": response.status_code, "headers": headers,
+                                "body": decoded.decode("utf-8", "replace")})
+        log.debug("fixture_recorded", key=key, status=response.status_code)
+        return httpx.Response(response.status_code, headers=headers, content=decoded, request=request)
+
+    async def aclose(self):
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def fixtures_mode() -> str:
+    mode = os.getenv("HTTP_FIXTURES_MODE", "").strip().lower()
+    return mode if mode in ("record", "replay") else ""
+
+
+def transport_from_env(limits: httpx.Limits, http2: bool) -> Optional[RecordReplayTransport]:
+    """
+    The record/replay transport when HTTP_FIXTURES_MODE is "record" or
+    "replay", using the cassette file HTTP_FIXTURES; None otherwise.
+    """
+    mode = fixtures_mode()
+    if not mode:
+        return None
+    path = os.path.abspath(os.getenv("HTTP_FIXTURES", "fixtures/http.json"))
+    cassette = _cassettes.get(path)
+    if cassette is None:
+        cassette = _cassettes[path] = Cassette(path)
+    inner = httpx.AsyncHTTPTransport(limits=limits, http2=http2) if mode == "record" else None
+    return RecordReplayTransport(cassette, mode, inner)
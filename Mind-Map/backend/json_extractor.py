@@ -0,0 +1,258 @@
+import re
+import json
+from typing import Dict, List, Optional, Tuple
+from logs import get_logger
+
+log = get_logger("json")
+
+NODE_NAME_KEYS = ("name", "label", "id", "concept", "title")
+EDGE_SOURCE_KEYS = ("source", "from", "parent")
+EDGE_TARGET_KEYS = ("target", "to", "child")
+EDGE_LABEL_KEYS = ("relationship", "relation", "label", "type")
+
+# A code fence with its optional language tag; an unclosed fence runs to the end (truncated reply)
+_FENCE_RE = re.compile(r"```([A-Za-z][\w+.-]*)?[ \t]*(.*?)(?:```|$)", re.DOTALL)
+
+
+def _first(obj: Dict, keys) -> str:
+    for key in keys:
+        value = obj.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return ""
+
+
+class IncrementalMapParser:
+    """
+    Incremental, tolerant scanner for the {"nodes": [...], "edges": [[...], ...]}
+    object returned by the providers.
+
+    Text can be fed in arbitrary chunks as it streams in. Every node and every
+    edge is reported as soon as its closing quote / bracket has been seen,
+    without waiting for the rest of the document. Because it never needs the
+    document to be complete or valid, it also recovers maps from replies with
+    code fences, prose around the JSON, trailing commas or output truncated at
+    the token limit. Nodes and edges written as objects ({"name": ...},
+    {"source": ..., "target": ...}) are accepted as well.
+    """
+
+    def __init__(self):
+        self.nodes: List[str] = []
+        self.edges: List[List[str]] = []
+        # Stack of (bracket, role) for the containers we are inside of;
+        # role is "nodes", "edges" or "edge" for the arrays we care about
+        self._stack: List[Tuple[str, str]] = []
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []
+        self._last_string = None
+        self._key = None
+        self._edge: List[str] = []
+        # Key/value pairs of the node or edge object currently open
+        self._obj: Dict[str, str] = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        """Consume a chunk of text and return the ("node", name) / ("edge", [s, t, r]) events it completed."""
+        events = []
+        for char in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._buffer.append(char)
+                elif char == "\\":
+                    self._escape = True
+                    self._buffer.append(char)
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string(self._decode("".join(self._buffer)), events)
+                else:
+                    self._buffer.append(char)
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._buffer = []
+            elif char == "{":
+                role = ""
+                parent_role = self._stack[-1][1] if self._stack else ""
+                if parent_role == "nodes":
+                    role = "node_obj"
+                    self._obj = {}
+                elif parent_role == "edges":
+                    role = "edge_obj"
+                    self._obj = {}
+                self._stack.append(("{", role))
+                self._key = None
+            elif char == "[":
+                if not self._stack:
+                    continue
+                role = ""
+                parent, parent_role = self._stack[-1]
+                # The map keys may sit below a wrapper object or after stray braces in prose
+                if parent == "{" and not self._inside_map() and self._key in ("nodes", "edges"):
+                    role = self._key
+                elif parent_role == "edges":
+                    role = "edge"
+                    self._edge = []
+                self._stack.append(("[", role))
+                self._key = None
+            elif char in "]}":
+                if not self._stack:
+                    continue
+                _, role = self._stack.pop()
+                if role == "edge":
+                    self._emit_edge(self._edge, events)
+                elif role == "edge_obj":
+                    self._emit_edge([_first(self._obj, EDGE_SOURCE_KEYS), _first(self._obj, EDGE_TARGET_KEYS),
+                                     _first(self._obj, EDGE_LABEL_KEYS)], events)
+                elif role == "node_obj":
+                    name = _first(self._obj, NODE_NAME_KEYS)
+                    if name:
+                        self.nodes.append(name)
+                        events.append(("node", name))
+            elif char == ":":
+                self._key = self._last_string
+            elif char == ",":
+                self._last_string = None
+                self._key = None
+        return events
+
+    def _inside_map(self) -> bool:
+        return any(role in ("nodes", "edges") for _, role in self._stack)
+
+    def _emit_edge(self, values: List[str], events: List[Tuple[str, object]]):
+        if len(values) < 2 or not values[0] or not values[1]:
+            return
+        edge = [values[0], values[1], values[2] if len(values) > 2 else ""]
+        self.edges.append(edge)
+        events.append(("edge", edge))
+
+    def result(self) -> Dict[str, List]:
+        """The nodes and edges recovered so far; nodes are derived from edges if none were listed."""
+        nodes = list(self.nodes)
+        if not nodes and self.edges:
+            seen = set()
+            for source, target, _ in self.edges:
+                for name in (source, target):
+                    if name not in seen:
+                        seen.add(name)
+                        nodes.append(name)
+        return {"nodes": nodes, "edges": [list(edge) for edge in self.edges]}
+
+    def _on_string(self, value: str, events: List[Tuple[str, object]]):
+        self._last_string = value
+        if not self._stack:
+            return
+        role = self._stack[-1][1]
+        if role == "nodes":
+            self.nodes.append(value)
+            events.append(("node", value))
+        elif role == "edge":
+            self._edge.append(value)
+        elif role in ("node_obj", "edge_obj") and self._key is not None:
+            self._obj[self._key] = value
+            self._key = None
+
+    @staticmethod
+    def _decode(raw: str) -> str:
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return raw
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Remove commas directly followed by a closing bracket, ignoring string contents."""
+    out = []
+    in_string = escape = False
+    pending_comma = None
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if char.isspace():
+                pending_comma.append(char)
+                continue
+            if char not in "]}":
+                out.append(",")
+            out.extend(pending_comma)
+            pending_comma = None
+        if char == ",":
+            pending_comma = []
+            continue
+        if char == '"':
+            in_string = True
+        out.append(char)
+    if pending_comma is not None:
+        out.append(",")
+        out.extend(pending_comma)
+    return "".join(out)
+
+
+def _strict_parse(text: str) -> Optional[Dict]:
+    json_start = text.find('{')
+    json_end = text.rfind('}') + 1
+    if json_start < 0 or json_end <= json_start:
+        return None
+    candidate = text[json_start:json_end]
+    for attempt in (candidate, _strip_trailing_commas(candidate)):
+        try:
+            result = json.loads(attempt)
+        except ValueError:
+            continue
+        if not isinstance(result, dict):
+            continue
+        nodes, edges = result.get("nodes"), result.get("edges")
+        # Object-shaped nodes/edges are left to IncrementalMapParser, which normalizes them
+        if (isinstance(nodes, list) and isinstance(edges, list)
+                and all(isinstance(node, str) for node in nodes)
+                and all(isinstance(edge, list) for edge in edges)):
+            return result
+    return None
+
+
+def _candidates(text: str) -> List[str]:
+    """Places the map may be in: json-tagged fences, then any other fence, then the whole reply."""
+    tagged, other = [], []
+    for fence in _FENCE_RE.finditer(text):
+        language, body = (fence.group(1) or "").lower(), fence.group(2)
+        if body.strip():
+            (tagged if language.startswith("json") else other).append(body)
+    return tagged + other + [text]
+
+
+def extract_map_json(text: str) -> Optional[Dict]:
+    """
+    Recover the nodes/edges map from an LLM reply.
+
+    Each code fence is tried in turn (json-tagged ones first), then the whole
+    reply: a strict parse of the JSON object, then the same with trailing
+    commas removed. Only when none of them parses is every complete node and
+    edge salvaged with IncrementalMapParser, in the same order. Returns None
+    when nothing usable is found.
+    """
+    if not text:
+        return None
+    candidates = _candidates(text)
+
+    for body in candidates:
+        result = _strict_parse(body)
+        if result is not None:
+            return result
+
+    for body in candidates:
+        parser = IncrementalMapParser()
+        parser.feed(body)
+        salvaged = parser.result()
+        if salvaged["edges"] or salvaged["nodes"]:
+            log.info("json_salvaged", nodes=len(salvaged["nodes"]), edges=len(salvaged["edges"]))
+            return salvaged
+    return None
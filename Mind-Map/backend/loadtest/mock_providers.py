@@ -0,0 +1,204 @@
+"""
+Local stand-in for the Gemini, Mistral and Serper APIs, so /generate_map can
+be load-tested without spending provider quota.
+
+Run from the backend directory:
+    python -m loadtest.mock_providers [--port 8900] [--gemini latency=900,errors=0.02] [--seed 1]
+
+and point the backend at it (python -m loadtest.run does this itself):
+    GEMINI_API_URL=http://127.0.0.1:8900/v1beta/models/gemini-1.5-flash:generateContent
+    GEMINI_STREAM_URL=http://127.0.0.1:8900/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse
+    MISTRAL_API_URL=http://127.0.0.1:8900/v1/chat/completions
+    SERPER_API_URL=http://127.0.0.1:8900/search
+
+Each provider takes a profile of comma-separated key=value settings:
+    latency      median response time in ms (log-normally distributed)
+    sigma        spread of the log-normal latency (0 = fixed latency)
+    errors       fraction of requests answered with a 500 or 503
+    throttle     fraction of requests answered with a 429
+    retry_after  Retry-After seconds sent with each 429
+    nodes        size of the generated mind maps / number of search results
+
+Replies are valid wire-format payloads: map JSON (fenced, for Gemini) built
+deterministically from the prompt, streamed as SSE when the client asks.
+"""
+import json
+import math
+import random
+import asyncio
+import argparse
+import zlib
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.synthetic import synthetic_graph
+
+DEFAULT_PROFILES = {
+    "gemini": "latency=1200,sigma=0.4,errors=0.01,throttle=0.02,retry_after=1,nodes=25",
+    "mistral": "latency=800,sigma=0.4,errors=0.01,throttle=0.02,retry_after=1,nodes=25",
+    "serper": "latency=300,sigma=0.3,errors=0.005,throttle=0,retry_after=1,nodes=5",
+}
+# Streamed replies are cut into this many SSE chunks
+STREAM_CHUNKS = 12
+
+
+def parse_profile(spec: str, base: str = "") -> Dict[str, float]:
+    """Parse "latency=800,errors=0.02" on top of the base spec."""
+    profile = {}
+    for item in f"{base},{spec}".split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            profile[key.strip()] = float(value)
+    return profile
+
+
+class MockProviders:
+    """Samples latency and failures per provider and renders the provider wire formats."""
+
+    def __init__(self, profiles: Dict[str, Dict[str, float]], seed: int = 0):
+        self.profiles = profiles
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, Dict[str, int]] = {name: {"requests": 0, "errors": 0, "throttled": 0}
+                                                 for name in profiles}
+
+    def latency(self, provider: str) -> float:
+        profile = self.profiles[provider]
+        median = profile.get("latency", 0) / 1000
+        sigma = profile.get("sigma", 0)
+        return median * math.exp(self.rng.gauss(0, sigma)) if sigma > 0 else median
+
+    def failure(self, provider: str):
+        """An error JSONResponse for this request according to the profile, or None."""
+        profile = self.profiles[provider]
+        stats = self.stats[provider]
+        stats["requests"] += 1
+        roll = self.rng.random()
+        if roll < profile.get("throttle", 0):
+            stats["throttled"] += 1
+            return JSONResponse({"error": {"code": 429, "message": "Resource exhausted (mock)"}}, status_code=429,
+                                headers={"Retry-After": str(int(profile.get("retry_after", 1)))})
+        if roll < profile.get("throttle", 0) + profile.get("errors", 0):
+            stats["errors"] += 1
+            status = self.rng.choice([500, 503])
+            return JSONResponse({"error": {"code": status, "message": "Internal error (mock)"}}, status_code=status)
+        return None
+
+    def map_text(self, provider: str, prompt: str) -> str:
+        """A mind map as JSON text, the same for the same prompt."""
+        nodes, edges, _ = synthetic_graph(max(3, int(self.profiles[provider].get("nodes", 25))),
+                                          seed=zlib.crc32(prompt.encode("utf-8")))
+        return json.dumps({"nodes": nodes, "edges": edges})
+
+    def search_results(self, query: str) -> List[Dict]:
+        count = max(1, int(self.profiles["serper"].get("nodes", 5)))
+        slug = "-".join(query.lower().split()) or "query"
+        return [{
+            "title": f"{query} - result {i + 1}",
+            "link": f"https://example.com/{slug}/{i + 1}",
+            "snippet": f"{query} explained: overview, key concepts, tools and techniques (mock result {i + 1}).",
+        } for i in range(count)]
+
+
+def _chunks(text: str, count: int) -> List[str]:
+    size = max(1, -(-len(text) // count))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def create_app(mock: MockProviders) -> FastAPI:
+    app = FastAPI(title="Mock providers")
+
+    async def stream(events: List[str], delay: float):
+        # First byte after roughly a third of the latency, the rest spread over the remainder
+        await asyncio.sleep(delay / 3)
+        for event in events:
+            yield f"data: {event}\n\n"
+            await asyncio.sleep(delay * 2 / 3 / max(1, len(events)))
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "stats": mock.stats}
+
+    @app.post("/v1beta/models/{model_call}")
+    async def gemini(model_call: str, request: Request):
+        body = await request.json()
+        delay = mock.latency("gemini")
+        failure = mock.failure("gemini")
+        if failure is not None:
+            await asyncio.sleep(delay / 4)
+            return failure
+        prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                         for part in content.get("parts", []))
+        text = f"```json\n{mock.map_text('gemini', prompt)}\n```"
+        if model_call.endswith(":streamGenerateContent"):
+            events = [json.dumps({"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]})
+                      for piece in _chunks(text, STREAM_CHUNKS)]
+            return StreamingResponse(stream(events, delay), media_type="text/event-stream")
+        await asyncio.sleep(delay)
+        return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+    @app.post("/v1/chat/completions")
+    async def mistral(request: Request):
+        body = await request.json()
+        delay = mock.latency("mistral")
+        failure = mock.failure("mistral")
+        if failure is not None:
+            await asyncio.sleep(delay / 4)
+            return failure
+        prompt = "".join(message.get("content", "") for message in body.get("messages", []))
+        text = mock.map_text("mistral", prompt)
+        if body.get("stream"):
+            events = [json.dumps({"choices": [{"index": 0, "delta": {"content": piece}}]})
+                      for piece in _chunks(text, STREAM_CHUNKS)] + ["[DONE]"]
+            return StreamingResponse(stream(events, delay), media_type="text/event-stream")
+        await asyncio.sleep(delay)
+        return {
+            "object": "chat.completion",
+            "model": body.get("model", "mistral-tiny"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }
+
+    @app.post("/search")
+    async def serper(request: Request):
+        body = await request.json()
+        delay = mock.latency("serper")
+        failure = mock.failure("serper")
+        if failure is not None:
+            await asyncio.sleep(delay / 4)
+            return failure
+        await asyncio.sleep(delay)
+        return {"searchParameters": {"q": body.get("q", "")}, "organic": mock.search_results(body.get("q", ""))}
+
+    return app
+
+
+def provider_urls(base: str) -> Dict[str, str]:
+    """The backend's *_URL environment overrides for a mock server at base."""
+    base = base.rstrip("/")
+    return {
+        "GEMINI_API_URL": f"{base}/v1beta/models/gemini-1.5-flash:generateContent",
+        "GEMINI_STREAM_URL": f"{base}/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse",
+        "MISTRAL_API_URL": f"{base}/v1/chat/completions",
+        "SERPER_API_URL": f"{base}/search",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--seed", type=int, default=0)
+    for name, spec in DEFAULT_PROFILES.items():
+        parser.add_argument(f"--{name}", default="", help=f"{name} profile (default: {spec})")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    profiles = {name: parse_profile(getattr(args, name), base) for name, base in DEFAULT_PROFILES.items()}
+    uvicorn.run(create_app(MockProviders(profiles, args.seed)), host=args.host, port=args.port,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Offline load test for /generate_map against the mock providers.
+
+Run from the backend directory:
+    python -m loadtest.run [--requests 500] [--concurrency 50 | --rate 20] [--research 0.2] [--unique 0.8]
+                           [--mock http://127.0.0.1:8900] [--url http://localhost:8000] [--json]
+
+By default it starts loadtest.mock_providers in a subprocess, points the
+provider URLs at it (fake API keys, in-memory caches) and drives the app
+in-process through httpx's ASGI transport, so the event-loop lag it reports
+is the app's own. --mock reuses a mock server that is already running;
+--url drives a running backend instead (started with the provider URLs of
+loadtest.mock_providers in its environment), measuring only the client side.
+
+Closed loop by default: --concurrency workers each send their next request
+as soon as the previous one finished. --rate N sends N requests per second
+(Poisson arrivals) however long they take, which is what exposes queueing.
+--unique is the fraction of distinct texts; the rest repeat a small pool and
+exercise the map cache and request coalescing.
+
+Reports throughput, latency percentiles, status codes, api_used / cache
+counts, and the event-loop lag: how late a 10 ms ticker wakes up.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.synthetic import WORDS
+from loadtest.mock_providers import DEFAULT_PROFILES, provider_urls
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Texts the non-unique requests are drawn from
+REPEATED_TEXTS = 10
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag: how much later than asked a short sleep returns."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def request_bodies(count: int, unique: float, research: float, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+
+    def text(index: int) -> str:
+        words = random.Random(index).sample(WORDS, 4)
+        return f"{' '.join(words)} and how {words[0].lower()} relates to {words[1].lower()} ({index})"
+
+    bodies = []
+    for i in range(count):
+        index = i if rng.random() < unique else count + rng.randrange(REPEATED_TEXTS)
+        bodies.append({"text": text(index), "research_mode": rng.random() < research})
+    return bodies
+
+
+async def send(client: httpx.AsyncClient, body: Dict, results: List[Dict]):
+    start = time.perf_counter()
+    try:
+        response = await client.post("/generate_map", json=body)
+        data = response.json() if response.status_code == 200 else {}
+        results.append({"seconds": time.perf_counter() - start, "status": response.status_code,
+                        "api_used": data.get("api_used", "-"), "cache": data.get("cache", "-")})
+    except Exception as e:
+        results.append({"seconds": time.perf_counter() - start, "status": type(e).__name__,
+                        "api_used": "-", "cache": "-"})
+
+
+async def closed_loop(client: httpx.AsyncClient, bodies: List[Dict], concurrency: int, results: List[Dict]):
+    queue = iter(bodies)
+
+    async def worker():
+        for body in queue:
+            await send(client, body, results)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+
+async def open_loop(client: httpx.AsyncClient, bodies: List[Dict], rate: float, seed: int, results: List[Dict]):
+    rng = random.Random(seed)
+    tasks = []
+    for body in bodies:
+        tasks.append(asyncio.ensure_future(send(client, body, results)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+
+
+async def drive(args, bodies: List[Dict]) -> Dict:
+    """Send every request, returning the per-request results plus wall time and loop lag samples."""
+    results: List[Dict] = []
+    monitor = LoopLagMonitor()
+
+    async def load(client: httpx.AsyncClient) -> float:
+        monitor.start()
+        start = time.perf_counter()
+        if args.rate > 0:
+            await open_loop(client, bodies, args.rate, args.seed, results)
+        else:
+            await closed_loop(client, bodies, args.concurrency, results)
+        elapsed = time.perf_counter() - start
+        await monitor.stop()
+        return elapsed
+
+    timeout = httpx.Timeout(args.timeout)
+    if args.url:
+        limits = httpx.Limits(max_connections=max(args.concurrency, 100))
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            elapsed = await load(client)
+    else:
+        import main
+
+        # The app's lifespan opens the provider pools; ASGITransport alone does not run it
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+                elapsed = await load(client)
+    return {"results": results, "elapsed": elapsed, "lag": monitor.samples}
+
+
+def summarize(run: Dict, args) -> Dict:
+    results, elapsed = run["results"], run["elapsed"]
+    latencies = sorted(result["seconds"] for result in results)
+    ok = sorted(result["seconds"] for result in results if result["status"] == 200)
+    lag = sorted(run["lag"])
+
+    def counts(field: str) -> Dict[str, int]:
+        tally: Dict[str, int] = {}
+        for result in results:
+            tally[str(result[field])] = tally.get(str(result[field]), 0) + 1
+        return dict(sorted(tally.items(), key=lambda item: -item[1]))
+
+    def ms(values: List[float]) -> Dict[str, float]:
+        return {
+            "p50": round(percentile(values, 0.50) * 1000, 1),
+            "p90": round(percentile(values, 0.90) * 1000, 1),
+            "p95": round(percentile(values, 0.95) * 1000, 1),
+            "p99": round(percentile(values, 0.99) * 1000, 1),
+            "max": round((values[-1] if values else 0) * 1000, 1),
+        }
+
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "mode": f"open loop, {args.rate}/s" if args.rate > 0 else f"closed loop, {args.concurrency} workers",
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": ms(latencies),
+        "ok_latency_ms": ms(ok),
+        "status": counts("status"),
+        "api_used": counts("api_used"),
+        "cache": counts("cache"),
+        "loop_lag_ms": {**ms(lag), "samples": len(lag)},
+    }
+
+
+def print_report(summary: Dict, mock_stats: Optional[Dict]):
+    print(f"{summary['requests']} requests ({summary['mode']}) in {summary['seconds']:.2f}s: "
+          f"{summary['requests_per_second']:.1f} req/s, {summary['ok']} ok")
+    print(f"{'':>14} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for label, key in (("latency ms", "latency_ms"), ("ok only ms", "ok_latency_ms"), ("loop lag ms", "loop_lag_ms")):
+        row = summary[key]
+        print(f"{label:>14} " + " ".join(f"{row[name]:>9.1f}" for name in ("p50", "p90", "p95", "p99", "max")))
+    for key in ("status", "api_used", "cache"):
+        print(f"{key:>14} " + ", ".join(f"{name}: {count}" for name, count in summary[key].items()))
+    if mock_stats:
+        print(f"{'mock':>14} " + ", ".join(f"{name} {stats['requests']} req / {stats['errors']} err / "
+                                          f"{stats['throttled']} 429" for name, stats in mock_stats.items()))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(args) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    command = [sys.executable, "-m", "loadtest.mock_providers", "--port", str(port), "--seed", str(args.seed)]
+    for name in DEFAULT_PROFILES:
+        if getattr(args, name):
+            command += [f"--{name}", getattr(args, name)]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base}/health", timeout=1).status_code == 200:
+                return process, base
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("mock provider server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=0, help="open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--research", type=float, default=0.0, help="fraction of research-mode requests")
+    parser.add_argument("--unique", type=float, default=1.0, help="fraction of distinct texts")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mock", default="", help="URL of a running mock provider server")
+    parser.add_argument("--url", default="", help="URL of a running backend (default: drive the app in-process)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    for name, spec in DEFAULT_PROFILES.items():
+        parser.add_argument(f"--{name}", default="", help=f"{name} mock profile (default: {spec})")
+    args = parser.parse_args()
+
+    process = None
+    mock = args.mock
+    if not args.url:
+        if not mock:
+            process, mock = start_mock(args)
+        # Must be in place before the app starts: settings are read on first use
+        os.environ.update(provider_urls(mock))
+        for key in ("GEMINI_API_KEY", "MISTRAL_API_KEY", "SERPER_API_KEY"):
+            os.environ[key] = "loadtest-" + "x" * 24
+        for prefix in ("MAP_CACHE", "SEARCH_CACHE"):
+            os.environ[f"{prefix}_DB"] = ""
+        os.environ.setdefault("LOG_LEVEL", "error")
+    try:
+        bodies = request_bodies(args.requests, args.unique, args.research, args.seed)
+        run = asyncio.run(drive(args, bodies))
+        mock_stats = httpx.get(f"{mock}/health", timeout=5).json()["stats"] if mock else None
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    summary = summarize(run, args)
+    if args.json:
+        print(json.dumps({**summary, "mock": mock_stats}, indent=2))
+    else:
+        print_report(summary, mock_stats)
+
+
+if __name__ == "__main__":
+    main()
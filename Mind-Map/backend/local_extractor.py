@@ -0,0 +1,269 @@
+import os
+import re
+import math
+from typing import Dict, List, Optional, Tuple
+
+from canonicalize import normalize_name
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|(?<=[。！？])|\n+")
+# Elided articles ("l'", "d'", "qu'"), words in any script (keeping "C++", "C#", "Node.js",
+# "object-oriented") and any other symbol, which ends a phrase
+_TOKEN_RE = re.compile(r"\b(?:qu|[cdjlmnst])['’](?=\w)|[^\W_][\w+#'’\-]*(?:\.[^\W_]+)*|[^\w\s]", re.IGNORECASE)
+# Chinese and Japanese write words without spaces: a run of these characters is cut at the
+# function words below, and each piece is one word
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_CJK_STOPWORDS = ("一个", "一种", "以及", "并且", "通过", "包括", "使用", "可以", "的", "是", "和", "与", "及", "或",
+                  "了", "等", "也", "被", "把", "から", "まで", "の", "は", "が", "を", "に", "で", "と", "も", "や")
+_CJK_SPLIT_RE = re.compile("(" + "|".join(_CJK_STOPWORDS) + ")")
+# Phrase delimiters: function words plus the generic verbs that link concepts
+# ("Python supports X") and would otherwise glue them into one phrase
+_STOPWORDS = frozenset("""
+a about above after again against all also an and any are as at be because been before being below
+between both but by can could did do does doing down during each either etc even every few for from
+further had has have having he her here hers him his how however i if in into is it its itself just
+like many may might more most much must my neither no nor not now of off often on once only or other
+our out over own per rather same several she should since so some such than that the their them then
+there these they this those though through thus to too under until up upon us very via was we were
+what when where whether which while who whom whose why will with within without would yet you your
+called known used using use uses allow allows allowed based become becomes help helps helped include
+includes including included involve involves make makes made provide provides provided require
+requires required support supports supported enable enables enabled consist consists contain contains
+describe describes refer refers mean means need needs build builds built create creates created
+write writes written release released develop develops developed
+new one two first second well way ways
+aber als am auch auf aus bei bis das dass dem den der des die durch ein eine einem einen einer eines
+für hat ist im mit nach nicht noch oder sich sie sind über um und uns vom von vor wie wird zu zum zur
+au aux avec ce ces cette dans de des du elle en est et il ils la le les leur mais ne ou par pas pour
+qui que sa se ses son sont sur un une
+al como con del el es las lo los más para pero por se su sus una y
+c' d' j' l' m' n' qu' s' t'
+""".split()) | frozenset(_CJK_STOPWORDS)
+# Words that say nothing as an edge label on their own
+_CONNECTORS = frozenset("a an and or the as".split())
+MAX_PHRASE_WORDS = 3
+MAX_LABEL_WORDS = 3
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def settings() -> Dict:
+    """LOCAL_* settings: how many concepts the local extractor keeps and how many branch off the root."""
+    return {
+        "max_nodes": max(2, _env_int("LOCAL_MAX_NODES", 24)),
+        "branches": max(1, _env_int("LOCAL_BRANCHES", 5)),
+    }
+
+
+def _display(phrase: str) -> str:
+    # Capitalize lowercase words only, so acronyms and product names keep their spelling
+    return " ".join(word[:1].upper() + word[1:] if word.islower() else word for word in phrase.split())
+
+
+def _fold(token: str) -> str:
+    return token.casefold().replace("’", "'")
+
+
+def _tokens(sentence: str) -> List[str]:
+    """Words and symbols of a sentence, with Chinese / Japanese runs cut at their function words."""
+    tokens = []
+    for token in _TOKEN_RE.findall(sentence):
+        if _CJK_RE.search(token):
+            tokens.extend(piece for piece in _CJK_SPLIT_RE.split(token) if piece)
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _candidates(tokens: List[str]) -> List[Tuple[int, int]]:
+    """(start, end) token spans of the sentence's candidate phrases: runs between stopwords and symbols."""
+    spans = []
+    start = None
+    for position, token in enumerate(tokens + [","]):
+        folded = _fold(token)
+        breaks = (not token[0].isalnum() or folded in _STOPWORDS or folded.isdigit()
+                  or (len(token) < 2 and not _CJK_RE.match(token)))
+        if not breaks and start is None:
+            start = position
+        elif breaks and start is not None:
+            # Long runs are cut into pieces of at most MAX_PHRASE_WORDS words
+            for piece in range(start, position, MAX_PHRASE_WORDS):
+                spans.append((piece, min(position, piece + MAX_PHRASE_WORDS)))
+            start = None
+    return spans
+
+
+def _central_phrase(candidates: List[str], sentence_spans: List[Tuple[List[str], List]]) -> str:
+    """
+    The candidate (best phrase score first) found in the most sentences, also
+    counting sentences where it is only part of a longer phrase ("machine
+    learning" in "machine learning models"); longer phrases get the same
+    small bonus as in the phrase score.
+    """
+    sentence_keys = [" " + " ".join(key for key, _, _ in spans) + " " for _, spans in sentence_spans]
+
+    def coverage(key: str) -> float:
+        needle = key if _CJK_RE.search(key) else f" {key} "
+        return sum(needle in keys for keys in sentence_keys) * (1 + 0.25 * key.count(" "))
+
+    # max() keeps the first of equals, i.e. the better phrase score
+    return max(candidates, key=coverage)
+
+
+def extract_local(text: str, topic: Optional[str] = None) -> Dict:
+    """
+    Build a mind map from the text alone, without any LLM call:
+
+    1. candidate keyphrases are the runs of words between stopwords and
+       punctuation (RAKE-style), grouped by their normalized name;
+    2. each is weighted TF-IDF style, its frequency times log(1 + N/df) over
+       the N sentences, with a small bonus for multi-word phrases;
+    3. the top LOCAL_MAX_NODES become nodes: the topic is the root (without
+       one, the best-scored phrase found in the most sentences, counting those
+       where it is part of a longer phrase), the next LOCAL_BRANCHES its
+       branches, and every other phrase hangs off the node it shares most
+       sentences with (co-occurrence graph), or the nearest preceding branch
+       when it shares none.
+
+    Edges are labelled with the words linking the two phrases when they stand
+    a few words apart in a sentence ("Python" -supports-> "Dynamic Typing").
+    Deterministic, and a few milliseconds even for long documents.
+    Returns {"nodes", "edges"}.
+    """
+    config = settings()
+    sentences = [sentence for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+
+    # Phrases repeat a lot, so each surface form is normalized once
+    normalized: Dict[str, str] = {}
+
+    def key_of(words: List[str]) -> str:
+        surface = " ".join(words)
+        key = normalized.get(surface)
+        if key is None:
+            key = normalized[surface] = normalize_name(surface)
+        return key
+
+    tokenized = [_tokens(sentence) for sentence in sentences]
+    candidates = [[(key_of(tokens[start:end]), start, end) for start, end in _candidates(tokens)]
+                  for tokens in tokenized]
+    # A phrase that is another phrase plus one trailing word ("Künstliche Intelligenz nutzt")
+    # usually ends in a verb the stopwords missed: count it as the shorter phrase
+    standalone = {key for spans in candidates for key, _, _ in spans}
+
+    # key -> [count, first sentence, surface form counts]; per sentence: tokens and (key, start, end)
+    phrases: Dict[str, list] = {}
+    sentence_spans: List[Tuple[List[str], List[Tuple[str, int, int]]]] = []
+    document_frequency: Dict[str, int] = {}
+    for index, tokens in enumerate(tokenized):
+        spans = []
+        for key, start, end in candidates[index]:
+            if end - start > 1:
+                shorter = key_of(tokens[start:end - 1])
+                if shorter in standalone:
+                    key, end = shorter, end - 1
+            if not key:
+                continue
+            surface = " ".join(tokens[start:end])
+            entry = phrases.get(key)
+            if entry is None:
+                entry = phrases[key] = [0, index, {}]
+            entry[0] += 1
+            entry[2][surface] = entry[2].get(surface, 0) + 1
+            spans.append((key, start, end))
+        for key in {key for key, _, _ in spans}:
+            document_frequency[key] = document_frequency.get(key, 0) + 1
+        sentence_spans.append((tokens, spans))
+
+    topic_key = normalize_name(topic) if topic else ""
+    total = max(1, len(sentences))
+    scored = sorted(
+        (key for key in phrases if key != topic_key),
+        key=lambda key: (-phrases[key][0] * math.log1p(total / document_frequency[key])
+                         * (1 + 0.25 * key.count(" ")), phrases[key][1]),
+    )
+
+    if topic:
+        root = _display(" ".join(topic.split()))
+        selected = scored[:config["max_nodes"] - 1]
+    elif scored:
+        root_key = _central_phrase(scored[:config["max_nodes"]], sentence_spans)
+        selected = [key for key in scored if key != root_key][:config["max_nodes"] - 1]
+        root = _display(max(phrases[root_key][2].items(), key=lambda item: item[1])[0])
+    else:
+        root = _display(" ".join(text.split()[:6])) or "Main Topic"
+        selected = []
+    if not selected:
+        return {"nodes": [root], "edges": []}
+
+    # Most frequent spelling of each selected phrase (first seen on ties)
+    names = [_display(max(phrases[key][2].items(), key=lambda item: item[1])[0]) for key in selected]
+    column = {key: position for position, key in enumerate(selected)}
+
+    # Imported here rather than at module level so fast startup does not pay for NumPy
+    import numpy as np
+
+    # Sentence x phrase incidence, then phrase x phrase co-occurrence counts
+    rows, cols = [], []
+    for index, (_, spans) in enumerate(sentence_spans):
+        for key in {key for key, _, _ in spans if key in column}:
+            rows.append(index)
+            cols.append(column[key])
+    incidence = np.zeros((len(sentence_spans), len(selected)), dtype=np.float32)
+    incidence[rows, cols] = 1.0
+    cooccurrence = incidence.T @ incidence
+
+    branches = list(range(min(config["branches"], len(selected))))
+    parents: Dict[int, int] = {}  # phrase -> parent phrase (-1 = root)
+    depth = {branch: 1 for branch in branches}
+    for branch in branches:
+        parents[branch] = -1
+    for phrase in range(len(branches), len(selected)):
+        # Branches first, so ties go to them; details can take children one level down
+        options = branches + [other for other in range(len(branches), phrase) if depth.get(other) == 2]
+        weights = cooccurrence[phrase, options]
+        best = int(np.argmax(weights))
+        if weights[best] > 0:
+            parent = options[best]
+        else:
+            first = phrases[selected[phrase]][1]
+            preceding = [branch for branch in branches if phrases[selected[branch]][1] <= first]
+            parent = max(preceding, key=lambda branch: phrases[selected[branch]][1]) if preceding else branches[0]
+        parents[phrase] = parent
+        depth[phrase] = depth[parent] + 1
+
+    # Labels: the first short gap of linking words from parent to child in a shared sentence
+    wanted = {(selected[parent], selected[child]) for child, parent in parents.items() if parent >= 0}
+    labels: Dict[Tuple[str, str], str] = {}
+    for tokens, spans in sentence_spans:
+        for parent_key, _, parent_end in spans:
+            for child_key, child_start, _ in spans:
+                pair = (parent_key, child_key)
+                if pair not in wanted or pair in labels or not 0 < child_start - parent_end <= MAX_LABEL_WORDS:
+                    continue
+                gap = [_fold(token) for token in tokens[parent_end:child_start]]
+                if all(token in _STOPWORDS for token in gap) and any(token not in _CONNECTORS for token in gap):
+                    labels[pair] = " ".join(gap)
+
+    nodes = [root] + names
+    edges = []
+    for child in range(len(selected)):
+        parent = parents[child]
+        source = root if parent < 0 else names[parent]
+        label = labels.get((selected[parent], selected[child]), "") if parent >= 0 else ""
+        edges.append([source, names[child], label])
+    return {"nodes": nodes, "edges": edges}
+
+
+def search_results_text(search_results: List[Dict]) -> str:
+    """Plain text of the search results (titles, snippets and page text) for extract_local."""
+    parts = []
+    for result in search_results:
+        for field in ("title", "snippet", "content"):
+            value = (result.get(field) or "").strip()
+            if value:
+                parts.append(value if value.endswith((".", "!", "?")) else value + ".")
+    return "\n".join(parts)
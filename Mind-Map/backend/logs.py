@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from tracing import current_trace
+
+LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def truncate(value: Any, limit: int) -> Any:
+    """Cut long strings down to `limit` characters, noting how much was dropped."""
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}...(+{len(value) - limit} chars)"
+    return value
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller: records are handed over as-is
+    (formatting happens on the listener thread) and dropped when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Formatter(logging.Formatter):
+    """One line per record: JSON objects (LOG_FORMAT=json) or `event key=value` text."""
+
+    def __init__(self, as_json: bool):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields: Dict[str, Any] = getattr(record, "fields", {})
+        if self.as_json:
+            line = {
+                "ts": round(record.created, 3),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                line["exc"] = self.formatException(record.exc_info)
+            return json.dumps(line, default=str, ensure_ascii=False)
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        text = " ".join(f"{key}={value}" for key, value in fields.items())
+        line = f"{stamp} {record.levelname:<7} {record.name} {record.getMessage()}" + (f" {text}" if text else "")
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class StructuredLogger:
+    """
+    Thin wrapper over a stdlib logger taking an event name plus keyword fields:
+
+        log.info("provider_error", provider="gemini", status=502)
+
+    Disabled levels cost one comparison. Debug/info records are sampled at
+    LOG_SAMPLE_RATE unless a call passes sample=; string fields are truncated
+    to LOG_MAX_FIELD_CHARS; the current trace ID is attached automatically.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], sample: Optional[float] = None,
+             exc_info: bool = False):
+        if _handler is None:
+            configure_logging()
+        if not self.logger.isEnabledFor(level):
+            return
+        rate = sample if sample is not None else (_settings["sample_rate"] if level < logging.WARNING else 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+        limit = _settings["max_field_chars"]
+        fields = {key: truncate(value, limit) for key, value in fields.items()}
+        trace = current_trace()
+        if trace is not None:
+            fields["trace_id"] = trace.trace_id
+        self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, sample: Optional[float] = None, **fields):
+        self._log(logging.DEBUG, event, fields, sample)
+
+    def info(self, event: str, sample: Optional[float] = None, **fields):
+        self._log(logging.INFO, event, fields, sample)
+
+    def warning(self, event: str, sample: Optional[float] = None, **fields):
+        self._log(logging.WARNING, event, fields, sample)
+
+    def error(self, event: str, exc_info: bool = False, **fields):
+        self._log(logging.ERROR, event, fields, 1.0, exc_info)
+
+
+_settings: Dict[str, Any] = {"sample_rate": 1.0, "max_field_chars": 200}
+_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def configure_logging():
+    """
+    Route the "mindmap" loggers through a bounded queue to a background writer
+    thread (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE, LOG_MAX_FIELD_CHARS,
+    LOG_QUEUE_SIZE). Runs once: at app startup, or on the first record logged
+    before that, so importing a module that creates a logger starts no thread.
+    """
+    global _handler, _listener
+    with _lock:
+        if _listener is not None:
+            return
+        _settings["sample_rate"] = min(1.0, max(0.0, _env_float("LOG_SAMPLE_RATE", 1.0)))
+        _settings["max_field_chars"] = max(16, int(_env_float("LOG_MAX_FIELD_CHARS", 200)))
+
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(_Formatter(os.getenv("LOG_FORMAT", "text").strip().lower() == "json"))
+        _handler = _DroppingQueueHandler(queue.Queue(maxsize=max(1, int(_env_float("LOG_QUEUE_SIZE", 10000)))))
+
+        root = logging.getLogger("mindmap")
+        root.setLevel(LEVELS.get(os.getenv("LOG_LEVEL", "info").strip().lower(), logging.INFO))
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread (safe to call more than once)."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        logging.getLogger("mindmap").removeHandler(_handler)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(f"mindmap.{name}"))
+
+
+def logging_info() -> Dict:
+    return {
+        "level": logging.getLevelName(logging.getLogger("mindmap").level).lower(),
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+        **_settings,
+    }
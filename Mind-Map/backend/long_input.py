@@ -0,0 +1,87 @@
+import os
+import re
+from typing import Dict, List
+from graph import MindMapGraph
+from canonicalize import canonicalize, canonicalize_enabled
+
+_BREAK_RE = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def settings() -> Dict:
+    """LONG_INPUT_* settings: texts above threshold characters are extracted chunk by chunk."""
+    chunk_chars = max(500, _env_int("LONG_INPUT_CHUNK_CHARS", 6000))
+    return {
+        "threshold": _env_int("LONG_INPUT_THRESHOLD", 12000),
+        "chunk_chars": chunk_chars,
+        "overlap": min(max(0, _env_int("LONG_INPUT_OVERLAP", 400)), chunk_chars // 2),
+        "max_chunks": max(1, _env_int("LONG_INPUT_MAX_CHUNKS", 8)),
+        "concurrency": max(1, _env_int("LONG_INPUT_CONCURRENCY", 4)),
+    }
+
+
+def split_chunks(text: str, chunk_chars: int, overlap: int, max_chunks: int) -> List[str]:
+    """
+    Split text into chunks of at most chunk_chars characters, ending each at
+    the last paragraph or sentence break in its second half when there is
+    one, with the next chunk starting overlap characters earlier so concepts
+    spanning a boundary are seen whole. If the text would need more than
+    max_chunks chunks, the chunk size grows to cover it in max_chunks, and
+    the last permitted chunk always takes the rest of the text, so snapping
+    to breaks can never spill into an extra chunk.
+    """
+    text = text.strip()
+    if len(text) > chunk_chars * max_chunks:
+        chunk_chars = -(-len(text) // max_chunks) + overlap
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = len(text) if len(chunks) == max_chunks - 1 else min(len(text), start + chunk_chars)
+        if end < len(text):
+            breaks = [match.end() for match in _BREAK_RE.finditer(text, start + chunk_chars // 2, end)]
+            if breaks:
+                end = breaks[-1]
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+def merge_partial_maps(results: List[Dict]) -> Dict:
+    """
+    Union the chunks' nodes and edges into one map. Names are matched
+    case-insensitively (first spelling wins) and repeated edges are dropped;
+    the union is then canonicalized, since variants can span chunks.
+    """
+    canonical: Dict[str, str] = {}
+    nodes: List[str] = []
+    edges: List[List[str]] = []
+    seen_edges = set()
+
+    def resolve(name: str) -> str:
+        key = name.casefold()
+        if key not in canonical:
+            canonical[key] = name
+            nodes.append(name)
+        return canonical[key]
+
+    for result in results:
+        for node in result.get("nodes", []):
+            resolve(node)
+        for source, target, relation in result.get("edges", []):
+            source, target = resolve(source), resolve(target)
+            if source == target or (source, target) in seen_edges:
+                continue
+            seen_edges.add((source, target))
+            edges.append([source, target, relation])
+
+    if canonicalize_enabled():
+        nodes, edges, _ = canonicalize(nodes, edges)
+    return {"nodes": nodes, "edges": edges, "graph": MindMapGraph.from_lists(nodes, edges)}
@@ -1,24 +1,87 @@
-from fastapi import FastAPI, HTTPException
+import os
+import json
+import asyncio
+import importlib
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict
-from nlp_service import extract_concepts_and_relationships, research_and_extract, GEMINI_API_KEY, MISTRAL_API_KEY
-from mermaid_formatter import to_mermaid
+from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from dotenv import load_dotenv
+from nlp_service import extract_concepts_and_relationships, research_and_extract, providers
+from nlp_service import research_settings, HEDGE_STATS, VALIDATION_STATS
+from nlp_service import search_cache, search_flights
+from mermaid_formatter import graph_to_mermaid
+from graph import MindMapGraph
+from http_client import open_clients, close_clients
+from cache import TTLCache, cache_from_env, make_key, normalize_text
+from singleflight import SingleFlight
+from streaming import stream_map_events
+from scheduler import BatchScheduler, scheduler_from_env
+from rate_limit import limiter_info
+from circuit_breaker import breaker_info
+from metrics import render_metrics, stage_timer, STAGE_SECONDS, MAPS_GENERATED, CACHE_EVENTS, IN_FLIGHT
+from tracing import TraceBuffer, buffer_from_env, span
+from logs import get_logger, configure_logging, shutdown_logging, logging_info
+from deep_research import deep_research_enabled, start_extraction_pool, shutdown_extraction_pool
 from fastapi.middleware.cors import CORSMiddleware
 
-print("Starting FastAPI application")
+log = get_logger("api")
 
-# Define constant
-MOCK_MODE = False
-if not GEMINI_API_KEY or len(GEMINI_API_KEY) < 10:
-    if not MISTRAL_API_KEY or len(MISTRAL_API_KEY) < 10:
-        print("No valid API keys found - enabling MOCK_MODE")
-        MOCK_MODE = True
-    else:
-        print("Using Mistral API only")
-else:
-    print("API keys detected")
+# The shared state below reads its settings from the environment, so it is built on
+# first use - after lifespan() has loaded .env - rather than when this module is imported
+
+@lru_cache(maxsize=None)
+def map_cache() -> TTLCache:
+    """Finished maps keyed on normalized text + mode (MAP_CACHE_TTL, _MAX_ENTRIES, _MAX_BYTES, _DB)."""
+    return cache_from_env("generate_map", "MAP_CACHE")
+
+@lru_cache(maxsize=None)
+def map_flights() -> SingleFlight:
+    """Concurrent identical requests wait on a single generation."""
+    return SingleFlight()
 
-app = FastAPI()
+@lru_cache(maxsize=None)
+def batch_scheduler() -> BatchScheduler:
+    """Worker pool for /generate_maps (BATCH_MAX_CONCURRENCY, BATCH_<PROVIDER>_CONCURRENCY)."""
+    return scheduler_from_env()
+
+@lru_cache(maxsize=None)
+def trace_buffer() -> TraceBuffer:
+    """Finished /generate_map traces, newest last (TRACE_BUFFER_SIZE)."""
+    return buffer_from_env()
+
+def batch_max_requests() -> int:
+    try:
+        return int(os.getenv("BATCH_MAX_REQUESTS", "500"))
+    except ValueError:
+        return 500
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # .env first: providers, caches and the other settings are read from the environment on first use
+    load_dotenv()
+    configure_logging()
+    # Open the shared provider connection pools once and reuse them for every request
+    config = providers()
+    await open_clients(config["gemini_url"], config["mistral_url"], config["serper_url"])
+    if deep_research_enabled():
+        # Worker processes for HTML-to-text extraction of downloaded result pages
+        start_extraction_pool()
+    # NumPy (canonicalization, context ranking) is imported on first use; load it in the
+    # background so the server accepts requests right away and the first map rarely waits for it
+    warm_up = asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "numpy")
+    yield
+    await warm_up
+    shutdown_extraction_pool()
+    await close_clients()
+    map_cache().close()
+    search_cache().close()
+    # Flush queued log records before the process exits
+    shutdown_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,69 +91,228 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read per-request timings and the trace ID
+    expose_headers=["Server-Timing", "X-Trace-Id"],
 )
 
 class MapRequest(BaseModel):
     text: str
     research_mode: bool = False
+    debug: bool = False  # include the request's trace in the response
+    fast_mode: bool = False  # local extractor only: no LLM call, a map in milliseconds
+
+class BatchMapRequest(BaseModel):
+    requests: List[MapRequest]
 
 class MapResponse(BaseModel):
     mermaid: str
     api_used: str = "gemini"  # Default, will be updated based on actual use
+    cache: str = "miss"  # "hit" from the response cache, "coalesced" when joined to an in-flight request
+    debug: Optional[Dict[str, Any]] = None  # trace ID and spans, only when the request asked for debug
 
 @app.get("/")
 async def root():
-    return {"status": "ok", "mock_mode": MOCK_MODE}
+    return {"status": "ok", "mock_mode": providers()["mock_mode"]}
 
 @app.get("/debug")
 async def debug():
     # Mask the API keys for security but show if they're loaded
-    gemini_status = "Not set" if not GEMINI_API_KEY else f"Set (length: {len(GEMINI_API_KEY)})"
-    mistral_status = "Not set" if not MISTRAL_API_KEY else f"Set (length: {len(MISTRAL_API_KEY)})"
+    config = providers()
+    gemini_key, mistral_key = config["gemini_key"], config["mistral_key"]
+    gemini_status = "Not set" if not gemini_key else f"Set (length: {len(gemini_key)})"
+    mistral_status = "Not set" if not mistral_key else f"Set (length: {len(mistral_key)})"
     
     return {
-        "mock_mode": MOCK_MODE,
+        "mock_mode": config["mock_mode"],
         "gemini_api_key": gemini_status,
         "mistral_api_key": mistral_status,
-        "gemini_api_key_placeholder": GEMINI_API_KEY == "your_gemini_api_key_here",
-        "mistral_api_key_placeholder": MISTRAL_API_KEY == "your_mistral_api_key_here",
+        "gemini_api_key_placeholder": gemini_key == "your_gemini_api_key_here",
+        "mistral_api_key_placeholder": mistral_key == "your_mistral_api_key_here",
+        "map_cache": map_cache().info(),
+        "in_flight_maps": map_flights().info(),
+        "search_cache": {**search_cache().info(), "in_flight": search_flights().info()},
+        "research_hedging": {"policy": research_settings()["hedge_policy"], **HEDGE_STATS},
+        "validation": VALIDATION_STATS,
+        "batch_scheduler": batch_scheduler().info(),
+        "rate_limits": limiter_info(),
+        "circuit_breakers": breaker_info(),
+        "traces": trace_buffer().info(),
+        "logging": logging_info(),
     }
 
-@app.post("/generate_map", response_model=MapResponse)
-async def generate_map(request: MapRequest):
-    try:
-        print(f"Generate map request for: '{request.text}', Research mode: {request.research_mode}")
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+async def traces(limit: int = 50, min_duration_ms: float = 0):
+    """Newest finished /generate_map traces, optionally only those slower than min_duration_ms."""
+    return {"traces": trace_buffer().recent(limit, min_duration_ms), **trace_buffer().info()}
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    trace = trace_buffer().get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (unknown or already evicted)")
+    return trace.to_dict()
+
+def map_cache_key(request: MapRequest) -> str:
+    if request.fast_mode:
+        # Fast maps come from a different extractor and must not answer normal requests
+        return make_key(normalize_text(request.text), request.research_mode, "fast")
+    return make_key(normalize_text(request.text), request.research_mode)
+
+def is_cacheable(api_used: str) -> bool:
+    # Never cache error maps, mock output or local fallbacks - the providers may be back next time
+    if api_used.startswith("research+"):
+        # Research results are judged by what produced them ("research+error" is still an error map)
+        api_used = api_used[len("research+"):]
+    return not (api_used in ("api_failure", "error", "unknown")
+                or api_used.endswith("_failed")
+                or api_used.endswith("local_fallback")
+                or api_used.startswith("mock_mode"))
+
+async def build_map(request: MapRequest, cache_key: str) -> Dict[str, str]:
+    """Run the provider pipeline and Mermaid formatting for one request."""
+    if request.research_mode:
+        # If research mode is enabled, perform web search and create mind map
+        nlp_result = await research_and_extract(request.text, fast_mode=request.fast_mode)
         
-        if request.research_mode:
-            # If research mode is enabled, perform web search and create mind map
-            nlp_result = await research_and_extract(request.text)
-            
-            # Set API used based on response
-            api_used = nlp_result.get("api_used", "unknown")
-            
-            # Ensure prefix for research mode
-            if "mistral" in api_used:
-                api_used = "research+mistral"
-            elif "gemini" in api_used:
-                api_used = "research+gemini"
-            elif api_used == "mock_mode":
-                api_used = "mock_mode (research)"
-            else:
-                api_used = f"research+{api_used}"
-        else:
-            # Direct text mode - uses Mistral only as per updated logic
-            nlp_result = await extract_concepts_and_relationships(request.text)
-            
-            # In non-research mode, will always be Mistral unless in mock mode
-            api_used = nlp_result.get("api_used", "mistral")
+        # Set API used based on response
+        api_used = nlp_result.get("api_used", "unknown")
         
-        # Pass the original query text to the formatter to ensure it's used as the main topic
-        mermaid = to_mermaid(nlp_result.get("nodes", []), nlp_result.get("edges", []), main_topic=request.text)
-        print(f"Generated mind map with API: {api_used}")
-        return MapResponse(mermaid=mermaid, api_used=api_used)
-    except Exception as e:
-        print(f"Error generating mind map: {str(e)}")
-        if MOCK_MODE:
-            raise HTTPException(status_code=500, detail=f"Error in mock mode: {str(e)}. To use real AI models, provide valid API keys in .env file.") 
+        # Ensure prefix for research mode
+        if "mistral" in api_used:
+            api_used = "research+mistral"
+        elif "gemini" in api_used:
+            api_used = "research+gemini"
         else:
-            raise HTTPException(status_code=500, detail=f"Failed to generate mind map: {str(e)}") 
\ No newline at end of file
+            api_used = f"research+{api_used}"
+    else:
+        # Direct text mode - uses Mistral only as per updated logic
+        nlp_result = await extract_concepts_and_relationships(request.text, fast_mode=request.fast_mode)
+        
+        # In non-research mode, will always be Mistral unless the map was built locally
+        api_used = nlp_result.get("api_used", "mistral")
+    
+    # Validated provider and local results already carry the interned graph; error maps are plain lists
+    graph = nlp_result.get("graph")
+    if graph is None:
+        graph = MindMapGraph.from_lists(nlp_result.get("nodes", []), nlp_result.get("edges", []))
+    
+    # Pass the original query text to the formatter to ensure it's used as the main topic
+    with stage_timer("format"):
+        mermaid = graph_to_mermaid(graph, main_topic=request.text)
+    log.info("map_generated", api_used=api_used, nodes=len(graph.names), edges=len(graph.sources))
+    MAPS_GENERATED.inc(api_used=api_used)
+    if is_cacheable(api_used):
+        await map_cache().aset(cache_key, {"mermaid": mermaid, "api_used": api_used})
+    return {"mermaid": mermaid, "api_used": api_used}
+
+async def resolve_map(request: MapRequest) -> MapResponse:
+    """Serve a map from the cache, an identical in-flight request, or a fresh generation."""
+    cache_key = map_cache_key(request)
+    with span("cache") as record:
+        cached, tier = await map_cache().aget(cache_key)
+        if record is not None:
+            record.attrs["tier"] = tier
+    if cached is not None:
+        log.debug("cache_hit", tier=tier)
+        CACHE_EVENTS.inc(cache="map", result="hit")
+        return MapResponse(mermaid=cached["mermaid"], api_used=cached["api_used"], cache="hit")
+    
+    # Identical requests already in flight share one provider round trip
+    result, shared = await map_flights().do(cache_key, lambda: build_map(request, cache_key))
+    if shared:
+        log.debug("request_coalesced")
+    CACHE_EVENTS.inc(cache="map", result="coalesced" if shared else "miss")
+    return MapResponse(mermaid=result["mermaid"], api_used=result["api_used"],
+                       cache="coalesced" if shared else "miss")
+
+@app.post("/generate_map", response_model=MapResponse, response_model_exclude_none=True)
+async def generate_map(request: MapRequest, response: Response):
+    with trace_buffer().trace("generate_map", research_mode=request.research_mode, fast_mode=request.fast_mode) as trace:
+        try:
+            log.info("generate_map", text=request.text, research_mode=request.research_mode, fast_mode=request.fast_mode)
+            with IN_FLIGHT.track(endpoint="generate_map"), STAGE_SECONDS.time(stage="total"):
+                result = await resolve_map(request)
+        except Exception as e:
+            log.error("generate_map_failed", error=str(e))
+            trace.attrs["error"] = str(e)
+            headers = {"X-Trace-Id": trace.trace_id}
+            if providers()["mock_mode"]:
+                raise HTTPException(status_code=500, detail=f"Error in mock mode: {str(e)}. To use real AI models, provide valid API keys in .env file.", headers=headers) 
+            else:
+                raise HTTPException(status_code=500, detail=f"Failed to generate mind map: {str(e)}", headers=headers) 
+        trace.attrs["cache"] = result.cache
+        trace.attrs["api_used"] = result.api_used
+        trace.finish()
+    response.headers["X-Trace-Id"] = trace.trace_id
+    response.headers["Server-Timing"] = trace.server_timing()
+    if request.debug:
+        result.debug = trace.to_dict()
+    return result
+
+@app.post("/generate_maps")
+async def generate_maps(batch: BatchMapRequest):
+    """
+    Generate many maps through the bounded batch scheduler.
+    Results are streamed back as newline-delimited JSON in completion order,
+    each line tagged with the index of its request.
+    """
+    max_requests = batch_max_requests()
+    if len(batch.requests) > max_requests:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {max_requests} requests per call")
+    log.info("generate_maps", items=len(batch.requests))
+    
+    jobs = [lambda request=request: resolve_map(request) for request in batch.requests]
+    
+    async def results():
+        with IN_FLIGHT.track(endpoint="generate_maps"):
+            async for index, response, error in batch_scheduler().run(jobs):
+                if error is not None:
+                    log.error("generate_map_failed", index=index, error=str(error))
+                    line = {"index": index, "error": f"Failed to generate mind map: {str(error)}"}
+                else:
+                    line = {"index": index, **response.model_dump(exclude_none=True)}
+                yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate_map/stream")
+async def generate_map_stream(request: MapRequest):
+    """Server-Sent Events version of /generate_map that pushes nodes and edges as they are generated."""
+    log.info("generate_map_stream", text=request.text, research_mode=request.research_mode)
+    cache_key = map_cache_key(request)
+
+    async def events():
+        try:
+            with IN_FLIGHT.track(endpoint="generate_map_stream"):
+                cached, tier = await map_cache().aget(cache_key)
+                if cached is not None:
+                    CACHE_EVENTS.inc(cache="map", result="hit")
+                    yield sse_event("done", {**cached, "cache": "hit"})
+                    return
+                CACHE_EVENTS.inc(cache="map", result="miss")
+                if providers()["mock_mode"] or request.fast_mode:
+                    # No streaming provider involved - send the regular pipeline result in one event
+                    result = await build_map(request, cache_key)
+                    yield sse_event("done", {**result, "cache": "miss"})
+                    return
+                async for event, data in stream_map_events(request.text, request.research_mode):
+                    if event == "done":
+                        MAPS_GENERATED.inc(api_used=data["api_used"])
+                        if is_cacheable(data["api_used"]):
+                            await map_cache().aset(cache_key, {"mermaid": data["mermaid"], "api_used": data["api_used"]})
+                    yield sse_event(event, data)
+        except Exception as e:
+            log.error("generate_map_stream_failed", error=str(e))
+            yield sse_event("error", {"detail": f"Failed to generate mind map: {str(e)}"})
+
+    # Disable proxy buffering so events reach the client as soon as they are produced
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
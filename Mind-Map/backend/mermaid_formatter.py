@@ -1,3 +1,63 @@
+import heapq
+from graph import MindMapGraph
+
+class _SubstringIndex:
+    """
+    Answers "first category c (in list order) with c in text or text in c"
+    without testing every category.
+
+    Categories contained in the text are found by looking up the text's
+    substrings of each category length in a hash map. Categories containing
+    the text must share all of its character trigrams, so only the posting
+    list of its rarest trigram needs the real substring test. Texts shorter
+    than a trigram fall back to a direct scan.
+    """
+
+    def __init__(self, categories):
+        self.categories = categories
+        self._position = {}
+        self._by_trigram = {}
+        for position, category in enumerate(categories):
+            self._position.setdefault(category, position)
+            for trigram in {category[i:i + 3] for i in range(len(category) - 2)}:
+                self._by_trigram.setdefault(trigram, []).append(position)
+        self._lengths = sorted({len(category) for category in self._position})
+        self._memo = {}
+
+    def first_match(self, text):
+        """Position of the first matching category, or None."""
+        if text in self._memo:
+            return self._memo[text]
+
+        categories = self.categories
+        match = None
+        if len(text) < 3:
+            for position, category in enumerate(categories):
+                if category in text or text in category:
+                    match = position
+                    break
+        else:
+            # Categories contained in the text
+            for length in self._lengths:
+                if length > len(text):
+                    break
+                for i in range(len(text) - length + 1):
+                    position = self._position.get(text[i:i + length])
+                    if position is not None and (match is None or position < match):
+                        match = position
+            # Categories containing the text
+            trigrams = {text[i:i + 3] for i in range(len(text) - 2)}
+            rarest = min((self._by_trigram.get(trigram, ()) for trigram in trigrams), key=len)
+            for position in rarest:
+                if match is not None and position >= match:
+                    break
+                if text in categories[position]:
+                    match = position
+                    break
+        self._memo[text] = match
+        return match
+
+
 def to_mermaid(nodes, edges, main_topic=None):
     """
     Convert nodes and edges to structured Mermaid mind map syntax
@@ -8,64 +68,59 @@ def to_mermaid(nodes, edges, main_topic=None):
     - edges: List of [source, target, relationship] triples
     - main_topic: The original user query to use as the main/root node
     """
-    # Ensure edges have the correct format [source, target, relationship]
-    # If an edge has only 2 elements, add an empty relationship
-    sanitized_edges = []
-    for edge in edges:
-        if not edge:
-            continue
-        if len(edge) == 2:
-            sanitized_edges.append([edge[0], edge[1], ""])
-        elif len(edge) >= 3:
-            sanitized_edges.append([edge[0], edge[1], edge[2]])
-        else:
-            # Skip invalid edges
-            continue
+    return graph_to_mermaid(MindMapGraph.from_lists(nodes, edges), main_topic=main_topic)
+
+def graph_to_mermaid(graph, main_topic=None):
+    """
+    Render a MindMapGraph as structured Mermaid mind map syntax (see to_mermaid).
     
-    # Use sanitized edges from now on
-    edges = sanitized_edges
+    Runs in roughly linear time: every pass over the edges is done once, and
+    all membership tests use precomputed sets / adjacency indexes over node
+    indices. Node IDs come from the graph, which sanitized them once and keeps
+    them unique. The main topic is added to the graph if it is not a node yet.
+    """
+    names = graph.names
+    sources, targets = graph.sources, graph.targets
     
-    # First, identify the main/root node - either already defined or the one with most connections
+    # Net degree (outgoing - incoming) in order of first appearance,
+    # and outgoing adjacency (edge indices in edge order)
     node_connections = {}
-    for source, target, _ in edges:
-        # Skip any empty nodes
-        if not source or not target:
-            continue
-            
-        if source not in node_connections:
-            node_connections[source] = 0
-        if target not in node_connections:
-            node_connections[target] = 0
-        node_connections[source] += 1  # Outgoing connection
-        node_connections[target] -= 1  # Incoming connection
+    children = {}
+    for edge, (source, target) in enumerate(zip(sources, targets)):
+        node_connections[source] = node_connections.get(source, 0) + 1  # Outgoing connection
+        node_connections[target] = node_connections.get(target, 0) - 1  # Incoming connection
+        children.setdefault(source, []).append(edge)
     
-    # Filter out any empty nodes
-    nodes = [node for node in nodes if node and node.strip()]
+    # Listed nodes, skipping whitespace-only names
+    nodes = [node for node in graph.listed_nodes() if names[node].strip()]
+    node_set = set(nodes)
     
     # If main_topic is provided, make it the root node or find a close match
     if main_topic:
         main_topic_lower = main_topic.lower().strip()
+        lowered = [names[node].lower() for node in nodes]
         
         # First try to find exact match
         main_node = None
-        for node in nodes:
-            if node.lower() == main_topic_lower:
+        for node, node_lower in zip(nodes, lowered):
+            if node_lower == main_topic_lower:
                 main_node = node
                 break
                 
         # If no exact match, look for node containing the topic
-        if not main_node:
-            for node in nodes:
-                if main_topic_lower in node.lower() or node.lower() in main_topic_lower:
+        if main_node is None:
+            for node, node_lower in zip(nodes, lowered):
+                if main_topic_lower in node_lower or node_lower in main_topic_lower:
                     main_node = node
                     break
                     
         # If still no match, use the topic directly
-        if not main_node:
-            main_node = main_topic
+        if main_node is None:
+            main_node = graph.add_node(main_topic)
             # Add it to nodes if not already there
-            if main_node not in nodes:
+            if main_node not in node_set:
                 nodes.append(main_node)
+                node_set.add(main_node)
     else:
         # Original approach if no main_topic provided
         main_candidates = ["Agentic AI Development Methodologies", "AI Development", "AI Methodologies", 
@@ -73,30 +128,29 @@ def to_mermaid(nodes, edges, main_topic=None):
         
         main_node = None
         for candidate in main_candidates:
-            if candidate in nodes:
-                main_node = candidate
+            if graph.index(candidate) in node_set:
+                main_node = graph.index(candidate)
                 break
         
         # If no main candidate found, use the one with most outgoing connections
-        if not main_node:
-            sorted_nodes = sorted(node_connections.items(), key=lambda x: x[1], reverse=True)
-            main_node = sorted_nodes[0][0] if sorted_nodes else (nodes[0] if nodes else "Main Topic")
+        if main_node is None:
+            if node_connections:
+                # max() keeps the first of equally connected nodes, like a stable sort would
+                main_node = max(node_connections.items(), key=lambda x: x[1])[0]
+            else:
+                main_node = nodes[0] if nodes else graph.add_node("Main Topic")
     
-    # Force main node to be the central node
+    # Force main node to be the central node; edges are (source, target) index pairs
     new_edges = []
     used_targets = set()
     
     # First, identify direct children of the main node (main categories)
     main_categories = []
-    for source, target, rel in edges:
-        # Skip empty nodes
-        if not source or not target:
-            continue
-            
-        if source == main_node:
-            main_categories.append(target)
-            new_edges.append([source, target, rel])
-            used_targets.add(target)
+    for edge in children.get(main_node, ()):
+        target = targets[edge]
+        main_categories.append(target)
+        new_edges.append((main_node, target))
+        used_targets.add(target)
     
     # If no main categories directly connected, create artificial main categories
     if not main_categories:
@@ -110,114 +164,61 @@ def to_mermaid(nodes, edges, main_topic=None):
         
         # Find which of these are in the nodes, or add the most connected ones
         for category in artificial_categories:
-            if category in nodes:
+            category = graph.index(category)
+            if category in node_set:
                 main_categories.append(category)
-                new_edges.append([main_node, category, ""])
+                new_edges.append((main_node, category))
                 used_targets.add(category)
         
         # If still no main categories, use the most connected nodes
         if not main_categories:
-            sorted_nodes = sorted(node_connections.items(), key=lambda x: x[1], reverse=True)
-            for node, connections in sorted_nodes[:5]:  # Take up to 5 most connected nodes
+            top_nodes = heapq.nlargest(5, node_connections.items(), key=lambda x: x[1])
+            for node, connections in top_nodes:  # Take up to 5 most connected nodes
                 if node != main_node and node not in used_targets:
                     main_categories.append(node)
-                    new_edges.append([main_node, node, ""])
+                    new_edges.append((main_node, node))
                     used_targets.add(node)
     
+    main_category_set = set(main_categories)
+    category_index = _SubstringIndex([names[category] for category in main_categories])
+    
+    def best_category_for(node):
+        # Most relevant main category: first one that contains / is contained in the name
+        if not main_categories:
+            return main_node
+        position = category_index.first_match(names[node])
+        return main_categories[position if position is not None else 0]
+    
     # Connect remaining nodes to appropriate main categories
     remaining_edges = []
-    for source, target, rel in edges:
-        # Skip empty nodes
-        if not source or not target:
-            continue
-            
+    for source, target in zip(sources, targets):
         if source != main_node and target not in used_targets:
-            if source in main_categories:
-                new_edges.append([source, target, rel])
+            if source in main_category_set:
+                new_edges.append((source, target))
                 used_targets.add(target)
             else:
-                remaining_edges.append([source, target, rel])
+                remaining_edges.append((source, target))
     
     # Process any remaining edges
-    for source, target, rel in remaining_edges:
-        # Skip empty nodes
-        if not source or not target:
-            continue
-            
+    for source, target in remaining_edges:
         if target not in used_targets:
-            # Find best main category to connect to
-            best_category = main_categories[0] if main_categories else main_node  # Default
-            for category in main_categories:
-                if category in source or source in category:
-                    best_category = category
-                    break
-            
             # Connect to best category if source is not connected
             if source not in used_targets:
-                new_edges.append([best_category, source, ""])
+                new_edges.append((best_category_for(source), source))
                 used_targets.add(source)
             
             # Add the original edge
-            new_edges.append([source, target, rel])
+            new_edges.append((source, target))
             used_targets.add(target)
     
     # Make sure all nodes are connected
     for node in nodes:
-        # Skip empty nodes
-        if not node or not node.strip():
-            continue
-            
         if node != main_node and node not in used_targets:
             # Connect to most relevant main category
-            best_category = main_categories[0] if main_categories else main_node  # Default
-            for category in main_categories:
-                if category in node or node in category:
-                    best_category = category
-                    break
-            
-            new_edges.append([best_category, node, ""])
+            new_edges.append((best_category_for(node), node))
             used_targets.add(node)
     
-    # Helper function to sanitize node IDs
-    def sanitize_node_id(text):
-        """
-        Remove or replace special characters that can cause issues in Mermaid syntax.
-        """
-        if not text:
-            return "empty_node"
-            
-        # Replace spaces with underscores
-        result = text.replace(' ', '_')
-        
-        # Remove or replace special characters
-        result = result.replace('(', '').replace(')', '')
-        result = result.replace('[', '').replace(']', '')
-        result = result.replace('{', '').replace('}', '')
-        result = result.replace('<', '').replace('>', '')
-        result = result.replace('/', '_').replace('\\', '_')
-        result = result.replace('&', '_and_')
-        result = result.replace('-', '_')
-        result = result.replace(':', '_')
-        result = result.replace('.', '_')
-        result = result.replace(',', '_')
-        result = result.replace('?', '')
-        result = result.replace('!', '')
-        result = result.replace("'", '')
-        result = result.replace('"', '')
-        
-        # Ensure valid ID by removing any non-alphanumeric/underscore characters
-        # and make sure it starts with a letter or underscore
-        result = ''.join(c for c in result if c.isalnum() or c == '_')
-        
-        # Ensure ID doesn't start with a number
-        if result and result[0].isdigit():
-            result = 'n_' + result
-            
-        # If empty after cleaning, use a placeholder
-        if not result:
-            return "node_" + str(hash(text) % 10000)
-        
-        return result
+    ids = graph.ids
     
     # Generate Mermaid code with proper hierarchy
     lines = ["graph LR;"]  # Left-to-right layout
@@ -236,37 +237,33 @@ def to_mermaid(nodes, edges, main_topic=None):
     # lines.append("    linkStyle default stroke:#6a3ee8;")
     
     # Add main node with ID
-    main_id = sanitize_node_id(main_node)
-    lines.append(f"    {main_id}[\"{ main_node}\"];")
+    main_id = ids[main_node]
+    lines.append(f"    {main_id}[\"{ names[main_node]}\"];")
     lines.append(f"    class {main_id} root;")
     
     # Track nodes that have been added
     added_nodes = {main_node}
     
     # Process all edges
-    for source, target, _ in new_edges:
-        # Validate source and target
-        if not source or not target:
-            continue
-            
-        source_id = sanitize_node_id(source)
-        target_id = sanitize_node_id(target)
+    for source, target in new_edges:
+        source_id = ids[source]
+        target_id = ids[target]
         
         # Add source node if not already added
         if source not in added_nodes:
-            lines.append(f"    {source_id}[\"{source}\"];")
+            lines.append(f"    {source_id}[\"{names[source]}\"];")
             added_nodes.add(source)
             
             # Apply styling for main categories
-            if source in main_categories:
+            if source in main_category_set:
                 lines.append(f"    class {source_id} mainCategory;")
         
         # Add target node if not already added
         if target not in added_nodes:
-            lines.append(f"    {target_id}[\"{target}\"];")
+            lines.append(f"    {target_id}[\"{names[target]}\"];")
             added_nodes.add(target)
         
         # Add the connection with no text (keep lines thin and simple)
         lines.append(f"    {source_id} --> {target_id};")
     
-    return "\n".join(lines) 
\ No newline at end of file
+    return "\n".join(lines)
\ No newline at end of file
@@ -0,0 +1,191 @@
+import time
+import bisect
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+from tracing import span
+
+# Latency buckets (seconds) covering sub-millisecond formatting up to 45s provider timeouts
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                                for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in flight."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self.counts: Dict[Tuple, List[int]] = {}
+        self.sums: Dict[Tuple, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+            self.sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[key] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key in sorted(self.counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts[key]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(self.sums[key])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "mindmap_stage_duration_seconds",
+    "Latency of each /generate_map pipeline stage (search, llm, parse, format, total).",
+    ["stage"],
+))
+PROVIDER_SECONDS = REGISTRY.register(Histogram(
+    "mindmap_provider_request_duration_seconds",
+    "Latency of outbound provider HTTP calls, including retries.",
+    ["provider"],
+))
+PROVIDER_CALLS = REGISTRY.register(Counter(
+    "mindmap_provider_calls_total",
+    "Provider calls by outcome (success, failure, rejected).",
+    ["provider", "outcome"],
+))
+MAPS_GENERATED = REGISTRY.register(Counter(
+    "mindmap_maps_total",
+    "Generated maps by the api_used value reported to the client.",
+    ["api_used"],
+))
+CACHE_EVENTS = REGISTRY.register(Counter(
+    "mindmap_cache_events_total",
+    "Cache lookups by cache and result (hit, miss, coalesced).",
+    ["cache", "result"],
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "mindmap_fallbacks_total",
+    "Provider fallbacks and hedges, by the provider given up on and the one used instead.",
+    ["from_provider", "to_provider", "kind"],
+))
+CONTEXT_TOKENS_SAVED = REGISTRY.register(Counter(
+    "mindmap_context_tokens_saved_total",
+    "Estimated prompt tokens removed from research context by dedup and the token budget.",
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "mindmap_in_flight_requests",
+    "Requests currently being processed, by endpoint.",
+    ["endpoint"],
+))
+PROVIDER_IN_FLIGHT = REGISTRY.register(Gauge(
+    "mindmap_provider_in_flight",
+    "Outbound provider calls currently in progress.",
+    ["provider"],
+))
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time one pipeline stage in the stage histogram and as a span of the current trace."""
+    with STAGE_SECONDS.time(stage=stage), span(stage) as record:
+        yield record
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -1,111 +1,324 @@
 import os
 import httpx
 import json
-import sys
-from dotenv import load_dotenv
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import asyncio
+from functools import lru_cache
+from urllib.parse import urlsplit
+from http_client import get_client
+from json_extractor import extract_map_json
+from graph import MindMapGraph
+from scheduler import provider_slot
+from rate_limit import send_with_retry, get_limiter, estimate_tokens
+from circuit_breaker import guarded_call, provider_open, CircuitOpenError
+from tracing import span
+from logs import get_logger
+from cache import TTLCache, cache_from_env, make_key, normalize_text
+from singleflight import SingleFlight
+from deep_research import deep_research
+from context_builder import build_context
+from canonicalize import canonicalize, canonicalize_enabled
+from local_extractor import extract_local, search_results_text
+from long_input import settings as long_input_settings, split_chunks, merge_partial_maps
+from metrics import stage_timer, PROVIDER_SECONDS, PROVIDER_CALLS, PROVIDER_IN_FLIGHT, FALLBACKS, CACHE_EVENTS
+from metrics import CONTEXT_TOKENS_SAVED
 
-# Add print statements to debug
-print("Starting nlp_service.py")
+log = get_logger("nlp")
 
-try:
-    # Load environment variables
-    print("Loading environment variables...")
-    load_dotenv()
-    
-    # Get API keys and print their lengths for debugging
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
-    MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "").strip()
-    SERPER_API_KEY = os.getenv("SERPER_API_KEY", "").strip()  # For web search
-    
-    print(f"API Keys loaded - Gemini: {len(GEMINI_API_KEY)} chars, Mistral: {len(MISTRAL_API_KEY)} chars")
-    
-    # Simple validation for API keys
-    VALID_GEMINI_API = len(GEMINI_API_KEY) >= 10
-    VALID_MISTRAL_API = len(MISTRAL_API_KEY) >= 10
+# Default endpoints - Gemini 1.5 Flash with the fixed API endpoint structure. The Gemini
+# key travels in the x-goog-api-key header so it never appears in URLs or logs. Each URL
+# can be overridden from the environment, e.g. to point at loadtest/mock_providers.py.
+DEFAULT_PROVIDER_URLS = {
+    "GEMINI_API_URL": "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent",
+    "GEMINI_STREAM_URL":
+        "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse",
+    "MISTRAL_API_URL": "https://api.mistral.ai/v1/chat/completions",
+    "SERPER_API_URL": "https://google.serper.dev/search",
+}
+
+_providers: Optional[Dict] = None
+
+
+def providers() -> Dict:
+    """
+    Provider keys, endpoints and availability, read from the environment on
+    first use rather than at import, so importing this module stays cheap and
+    has no side effects. Keys shorter than 10 characters count as missing;
+    without a usable Gemini or Mistral key the service runs in mock mode
+    (local extractor only).
+    """
+    global _providers
+    if _providers is None:
+        gemini_key = os.getenv("GEMINI_API_KEY", "").strip()
+        mistral_key = os.getenv("MISTRAL_API_KEY", "").strip()
+        config = {
+            "gemini_key": gemini_key,
+            "mistral_key": mistral_key,
+            "serper_key": os.getenv("SERPER_API_KEY", "").strip(),  # For web search
+            "gemini_valid": len(gemini_key) >= 10,
+            "mistral_valid": len(mistral_key) >= 10,
+            "gemini_url": os.getenv("GEMINI_API_URL", DEFAULT_PROVIDER_URLS["GEMINI_API_URL"]),
+            "gemini_stream_url": os.getenv("GEMINI_STREAM_URL", DEFAULT_PROVIDER_URLS["GEMINI_STREAM_URL"]),
+            "mistral_url": os.getenv("MISTRAL_API_URL", DEFAULT_PROVIDER_URLS["MISTRAL_API_URL"]),
+            "serper_url": os.getenv("SERPER_API_URL", DEFAULT_PROVIDER_URLS["SERPER_API_URL"]),
+        }
+        config["mock_mode"] = not (config["gemini_valid"] or config["mistral_valid"])
+        _providers = config
+        log.info("providers_configured", gemini_key_chars=len(gemini_key), mistral_key_chars=len(mistral_key),
+                 serper=bool(config["serper_key"]), mock_mode=config["mock_mode"])
+    return _providers
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def research_settings() -> Dict:
+    """
+    RESEARCH_* settings, read per call rather than at import, so a .env loaded at
+    app startup applies even though this module was imported before it.
+
+    Hedging: "off" keeps the sequential Gemini -> Mistral fallback, "delay" starts
+    Mistral if Gemini has not answered after RESEARCH_HEDGE_DELAY seconds, "race"
+    starts both providers at once. First valid map wins.
+
+    Fan-out (opt-in): besides the topic itself, search "<topic> <facet>" for each
+    facet in RESEARCH_FACETS (comma-separated; unset or empty = the topic query only)
+    with at most RESEARCH_SEARCH_CONCURRENCY searches at once. Searches still running
+    after RESEARCH_SEARCH_DEADLINE seconds are dropped; the merged, link-deduplicated
+    results are capped at RESEARCH_MAX_RESULTS.
+    """
+    return {
+        "hedge_policy": os.getenv("RESEARCH_HEDGE_POLICY", "off").strip().lower(),
+        "hedge_delay": _env_float("RESEARCH_HEDGE_DELAY", 5.0),
+        "facets": [facet.strip() for facet in os.getenv("RESEARCH_FACETS", "").split(",")
+                   if facet.strip()],
+        "search_concurrency": max(1, int(_env_float("RESEARCH_SEARCH_CONCURRENCY", 4))),
+        "search_deadline": _env_float("RESEARCH_SEARCH_DEADLINE", 8.0),
+        "results_per_query": max(1, int(_env_float("RESEARCH_RESULTS_PER_QUERY", 5))),
+        "max_results": max(1, int(_env_float("RESEARCH_MAX_RESULTS", 15))),
+    }
+
+HEDGE_STATS = {"hedges_started": 0, "hedges_won": 0, "hedges_lost": 0}
+
+# Running totals of what validate_and_fix_result repaired or dropped
+VALIDATION_STATS = {"edges_repaired": 0, "edges_dropped": 0, "nodes_dropped": 0, "names_merged": 0}
+
+@lru_cache(maxsize=None)
+def search_cache() -> TTLCache:
+    """
+    Serper results keyed on normalized query + num_results, kept on disk across restarts
+    (SEARCH_CACHE_TTL, _STALE_TTL, _MAX_ENTRIES, _MAX_BYTES, _DB). Entries past their TTL
+    but within the stale window are served immediately while a refresh runs in the
+    background. Built on first use, after the app has loaded its settings.
+    """
+    return cache_from_env("web_search", "SEARCH_CACHE", default_ttl=6 * 3600,
+                          default_stale_ttl=7 * 24 * 3600, default_db="search_cache.db")
+
+@lru_cache(maxsize=None)
+def search_flights() -> SingleFlight:
+    """Concurrent misses and refreshes for the same query share one Serper call."""
+    return SingleFlight()
+
+# Strong references to running background refreshes (the event loop only keeps weak ones)
+_refresh_tasks = set()
+
+async def post_provider(provider: str, url: str, tokens: int = 0, **kwargs) -> httpx.Response:
+    """
+    POST to a provider through its batch slot, rate limiter and 429-aware retries.
+    Every attempt runs under the provider's circuit breaker, which raises
+    CircuitOpenError immediately while the provider is considered down.
+    """
+    client = get_client(url)
+    attempts = 0
+    
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        # One span per HTTP attempt, so retries and fallbacks show up in the trace
+        with span(provider, attempt=attempts) as record:
+            try:
+                async with guarded_call(provider) as call:
+                    with PROVIDER_IN_FLIGHT.track(provider=provider):
+                        response = await client.post(url, **kwargs)
+                    # 429s are queued and retried by the limiter; only 5xx, timeouts and
+                    # transport errors say the provider is unhealthy
+                    call.success = None if response.status_code == 429 else response.status_code < 500
+            except CircuitOpenError:
+                PROVIDER_CALLS.inc(provider=provider, outcome="rejected")
+                raise
+            except Exception:
+                PROVIDER_CALLS.inc(provider=provider, outcome="failure")
+                raise
+            if record is not None:
+                record.attrs["status"] = response.status_code
+        PROVIDER_CALLS.inc(provider=provider, outcome="success" if response.status_code < 400 else "failure")
+        return response
+    
+    async with provider_slot(provider):
+        with PROVIDER_SECONDS.time(provider=provider):
+            return await send_with_retry(provider, attempt, tokens=tokens)
+
+async def serper_search(query: str, num_results: int = 5) -> List[Dict]:
+    """Query Serper and cache the organic results. Errors propagate to the caller."""
+    headers = {
+        "X-API-KEY": providers()["serper_key"],
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "q": query,
+        "num": num_results
+    }
     
-    print(f"=== API KEY STATUS ===")
-    print(f"Gemini API key length: {len(GEMINI_API_KEY)} (Valid: {VALID_GEMINI_API})")
-    print(f"Mistral API key length: {len(MISTRAL_API_KEY)} (Valid: {VALID_MISTRAL_API})")
-    print(f"======================")
+    with stage_timer("search"):
+        response = await post_provider("serper", providers()["serper_url"], json=payload, headers=headers, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    
+    results = []
+    if "organic" in data:
+        for item in data["organic"]:
+            results.append({
+                "title": item.get("title", ""),
+                "snippet": item.get("snippet", ""),
+                "link": item.get("link", "")
+            })
+    await search_cache().aset(make_key(normalize_text(query), num_results), results)
+    return results
 
-    # If we have no valid API keys, set mock mode
-    MOCK_MODE = not (VALID_GEMINI_API or VALID_MISTRAL_API)
+def _refresh_search(key: str, query: str, num_results: int):
+    """Refresh a stale search entry in the background (at most one refresh per key at a time)."""
+    async def refresh():
+        try:
+            await search_flights().do(key, lambda: serper_search(query, num_results))
+        except Exception as e:
+            log.warning("search_refresh_failed", query=query, error=str(e))
     
-    # API URLs - Updated to use Gemini 1.5 Flash model with fixed API endpoint structure
-    GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}"
-    MISTRAL_API_URL = "https://api.mistral.ai/v1/chat/completions"
-    SERPER_API_URL = "https://google.serper.dev/search"
-except Exception as e:
-    print(f"Error initializing nlp_service: {str(e)}")
-    print(f"Exception type: {type(e)}")
-    print(f"Exception traceback: {sys.exc_info()}")
-    # Set defaults
-    MOCK_MODE = True
-    GEMINI_API_KEY = ""
-    MISTRAL_API_KEY = ""
-    SERPER_API_KEY = ""
-    VALID_GEMINI_API = False
-    VALID_MISTRAL_API = False
-    GEMINI_API_URL = ""
-    MISTRAL_API_URL = ""
-    SERPER_API_URL = ""
+    task = asyncio.ensure_future(refresh())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
 
 async def web_search(query: str, num_results: int = 5) -> List[Dict]:
     """Perform a web search using Serper API (Google Search API alternative)."""
     try:
-        if not SERPER_API_KEY:
-            print("No SERPER_API_KEY found. Skipping web search.")
-            return []
+        key = make_key(normalize_text(query), num_results)
+        cached, tier = await search_cache().aget(key)
+        if cached is not None:
+            CACHE_EVENTS.inc(cache="search", result="stale" if tier == "stale" else "hit")
+            if tier == "stale" and providers()["serper_key"] and not provider_open("serper"):
+                _refresh_search(key, query, num_results)
+            return cached
         
-        headers = {
-            "X-API-KEY": SERPER_API_KEY,
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "q": query,
-            "num": num_results
-        }
+        if not providers()["serper_key"]:
+            log.info("web_search_skipped", reason="no SERPER_API_KEY")
+            return []
+        if provider_open("serper"):
+            log.info("web_search_skipped", reason="circuit breaker open")
+            return []
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(SERPER_API_URL, json=payload, headers=headers, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = []
-                if "organic" in data:
-                    for item in data["organic"]:
-                        results.append({
-                            "title": item.get("title", ""),
-                            "snippet": item.get("snippet", ""),
-                            "link": item.get("link", "")
-                        })
-                return results
+            results, shared = await search_flights().do(key, lambda: serper_search(query, num_results))
+            CACHE_EVENTS.inc(cache="search", result="coalesced" if shared else "miss")
+            return results
         except Exception as e:
-            print(f"Web search error: {e}")
+            log.warning("web_search_error", error=str(e))
             return []
     except Exception as e:
-        print(f"Error in web_search: {str(e)}")
+        log.error("web_search_failed", error=str(e))
         return []
 
+def research_queries(topic: str) -> List[str]:
+    """The topic itself followed by one sub-query per research facet."""
+    return [topic] + [f"{topic} {facet}" for facet in research_settings()["facets"]]
+
+def _link_key(result: Dict) -> str:
+    """Dedup key: the link without scheme, fragment, 'www.' or trailing slash (the title if no link)."""
+    link = result.get("link", "")
+    if not link:
+        return "title:" + normalize_text(result.get("title", ""))
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+def merge_search_results(result_lists: List[List[Dict]], limit: int) -> List[Dict]:
+    """
+    Interleave the result lists round-robin (so every sub-query is represented
+    when the limit cuts in) and keep the first occurrence of each link.
+    """
+    merged = []
+    seen = set()
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            key = _link_key(results[rank])
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(results[rank])
+            if len(merged) >= limit:
+                return merged
+    return merged
+
+async def research_search(topic: str) -> List[Dict]:
+    """
+    Run the topic's research sub-queries concurrently (bounded by
+    RESEARCH_SEARCH_CONCURRENCY) and merge whatever finished within
+    RESEARCH_SEARCH_DEADLINE seconds.
+    """
+    config = research_settings()
+    queries = research_queries(topic)
+    if len(queries) == 1:
+        return await web_search(topic)
+    
+    semaphore = asyncio.Semaphore(config["search_concurrency"])
+    
+    async def search(query: str) -> List[Dict]:
+        async with semaphore:
+            return await web_search(query, config["results_per_query"])
+    
+    with span("research_search", queries=len(queries)) as record:
+        tasks = [asyncio.ensure_future(search(query)) for query in queries]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=config["search_deadline"])
+        finally:
+            # Serper calls keep running behind the search cache's single-flight and still get cached
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        if pending:
+            log.warning("research_search_deadline", finished=len(done), dropped=len(pending),
+                        deadline=config["search_deadline"])
+        results = merge_search_results([task.result() for task in tasks if task in done], config["max_results"])
+        if record is not None:
+            record.attrs.update(finished=len(done), results=len(results))
+    return results
+
 async def extract_info_from_search_results(search_results: List[Dict], topic: str) -> str:
-    """Combine search results into a single text for further processing."""
+    """
+    Combine search results into a single text for further processing: the most
+    relevant, de-duplicated passages packed into CONTEXT_TOKEN_BUDGET tokens.
+    """
     if not search_results:
         return f"Information about {topic}."
     
-    combined_text = f"Research on {topic}:\n\n"
-    for i, result in enumerate(search_results, 1):
-        combined_text += f"Source {i}:\n"
-        combined_text += f"Title: {result['title']}\n"
-        combined_text += f"Summary: {result['snippet']}\n\n"
-    
+    with span("context") as record:
+        combined_text, report = build_context(search_results, topic)
+        if record is not None:
+            record.attrs.update(report)
+    CONTEXT_TOKENS_SAVED.inc(report["tokens_saved"])
+    log.debug("context_built", **report)
     return combined_text
 
-async def call_gemini(text: str, is_research_mode: bool = False) -> Dict:
-    """Call the Gemini API to extract concepts and relationships."""
-    example_structure = """
+# The extraction prompts are built once at import; build_prompt only appends the text.
+# Keep them byte-for-byte stable: replay fixtures (benchmarks/fixtures) match requests by body.
+_EXAMPLE_STRUCTURE = """
     Example structure similar to:
     - Main Topic: "Agentic AI Development Methodologies" 
     - Main categories:
@@ -117,10 +330,10 @@ async def call_gemini(text: str, is_research_mode: bool = False) -> Dict:
     Use simple, direct relationships without verbose descriptions. Focus on clear hierarchy and organization.
     """
 
-    base_prompt = f"""
+BASE_PROMPT = f"""
     Create a structured mind map about the given topic that matches the following example structure.
     
-    {example_structure}
+    {_EXAMPLE_STRUCTURE}
     
     Return ONLY a valid JSON object with these fields:
     - 'nodes': A list of concept names (15-25 total nodes)
@@ -133,11 +346,11 @@ async def call_gemini(text: str, is_research_mode: bool = False) -> Dict:
     4. Focus on organization similar to the example structure
     5. Produce a balanced mind map with clean concepts
     """
-    
-    research_prompt = f"""
+
+RESEARCH_PROMPT = f"""
     Create a comprehensive structured mind map based on your research that matches the following example structure.
     
-    {example_structure}
+    {_EXAMPLE_STRUCTURE}
     
     Return ONLY a valid JSON object with these fields:
     - 'nodes': A list of concept names (20-30 total nodes)
@@ -150,12 +363,23 @@ async def call_gemini(text: str, is_research_mode: bool = False) -> Dict:
     4. Focus on organization similar to the example structure
     5. Produce a balanced mind map with clean concepts
     """
-    
-    prompt = research_prompt if is_research_mode else base_prompt
-    prompt += f"\n\nText: {text}"
-    
+
+
+def build_prompt(text: str, is_research_mode: bool = False) -> str:
+    """Build the mind map extraction prompt shared by all providers."""
+    prompt = RESEARCH_PROMPT if is_research_mode else BASE_PROMPT
+    return prompt + f"\n\nText: {text}"
+
+def gemini_headers() -> Dict:
+    return {
+        "x-goog-api-key": providers()["gemini_key"],
+        "Content-Type": "application/json"
+    }
+
+def gemini_payload(prompt: str) -> Dict:
+    """Request body for Gemini generateContent / streamGenerateContent."""
     # Updated payload structure for the Gemini 1.5 Flash model
-    payload = {
+    return {
         "contents": [
             {
                 "parts": [
@@ -188,93 +412,11 @@ async def call_gemini(text: str, is_research_mode: bool = False) -> Dict:
             }
         ]
     }
-    
-    try:
-        print(f"Calling Gemini API with model: {GEMINI_API_URL}")
-        async with httpx.AsyncClient() as client:
-            response = await client.post(GEMINI_API_URL, json=payload, timeout=45)
-            
-            if response.status_code != 200:
-                print(f"Gemini API error status: {response.status_code}")
-                print(f"Response content: {response.text[:500]}")
-                
-            response.raise_for_status()
-            data = response.json()
-            
-            # Parse Gemini's response to extract nodes and edges
-            text_response = data["candidates"][0]["content"]["parts"][0]["text"]
-            
-            # Find the JSON part in the response (handles potential text wrapper)
-            json_start = text_response.find('{')
-            json_end = text_response.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_str = text_response[json_start:json_end]
-                result = json.loads(json_str)
-                # Add info about which API was used
-                result["api_used"] = "gemini"
-                return result
-            else:
-                print("Could not find valid JSON in Gemini response")
-                return {"nodes": [], "edges": [], "api_used": "gemini_failed"}
-                
-    except Exception as e:
-        print(f"Gemini API error: {e}")
-        return {"nodes": [], "edges": [], "api_used": "gemini_failed"}
 
-async def call_mistral(text: str, is_research_mode: bool = False) -> Dict:
-    """Call the Mistral API to extract concepts and relationships."""
-    example_structure = """
-    Example structure similar to:
-    - Main Topic: "Agentic AI Development Methodologies" 
-    - Main categories:
-      - "Architectural Approaches" → connects to "Multi-Agent Systems", "Hierarchical Reinforcement Learning", "Goal-Directed Model Architectures"
-      - "Learning Paradigms" → connects to "Supervised Learning", "Unsupervised Learning", "Reinforcement Learning"
-      - "Training and Evaluation Techniques" → connects to "Situation-Based Testing", "Curriculum Learning", "Multi-Task Learning"
-      - "Tools and Frameworks" → connects to "OpenAI Gym", "Unity ML-Agents", "TensorFlow Agents", "PyMARL", "Rasa"
-    
-    Use simple, direct relationships without verbose descriptions. Focus on clear hierarchy and organization.
-    """
-
-    base_prompt = f"""
-    Create a structured mind map about the given topic that matches the following example structure.
-    
-    {example_structure}
-    
-    Return ONLY a valid JSON object with these fields:
-    - 'nodes': A list of concept names (15-25 total nodes)
-    - 'edges': A list of [source, target, ""] triples (use empty string for the relationship)
-    
-    Important requirements:
-    1. Create a hierarchical structure with ONE central topic and 3-5 main categories
-    2. Each main category should have 2-5 subcategories/examples
-    3. Ensure connections are simple with NO verbose text descriptions
-    4. Focus on organization similar to the example structure
-    5. Produce a balanced mind map with clean concepts
-    """
-    
-    research_prompt = f"""
-    Create a comprehensive structured mind map based on your research that matches the following example structure.
-    
-    {example_structure}
-    
-    Return ONLY a valid JSON object with these fields:
-    - 'nodes': A list of concept names (20-30 total nodes)
-    - 'edges': A list of [source, target, ""] triples (use empty string for the relationship)
-    
-    Important requirements:
-    1. Create a hierarchical structure with ONE central topic and 4-6 main categories
-    2. Each main category should have 3-6 subcategories/examples
-    3. Ensure connections are simple with NO verbose text descriptions
-    4. Focus on organization similar to the example structure
-    5. Produce a balanced mind map with clean concepts
-    """
-    
-    prompt = research_prompt if is_research_mode else base_prompt
-    prompt += f"\n\nText: {text}"
-    
+def mistral_request(prompt: str, stream: bool = False) -> Tuple[Dict, Dict]:
+    """Headers and request body for the Mistral chat completions API."""
     headers = {
-        "Authorization": f"Bearer {MISTRAL_API_KEY}",
+        "Authorization": f"Bearer {providers()['mistral_key']}",
         "Content-Type": "application/json"
     }
     payload = {
@@ -283,176 +425,398 @@ async def call_mistral(text: str, is_research_mode: bool = False) -> Dict:
             {"role": "user", "content": prompt}
         ]
     }
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+async def call_gemini(text: str, is_research_mode: bool = False) -> Dict:
+    """Call the Gemini API to extract concepts and relationships."""
+    prompt = build_prompt(text, is_research_mode)
+    payload = gemini_payload(prompt)
+    
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(MISTRAL_API_URL, headers=headers, json=payload, timeout=45)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Get the text response
-            text_response = data["choices"][0]["message"]["content"]
+        log.debug("provider_call", provider="gemini", prompt_chars=len(prompt))
+        with stage_timer("llm"):
+            response = await post_provider("gemini", providers()["gemini_url"], tokens=estimate_tokens(prompt),
+                                           headers=gemini_headers(), json=payload, timeout=45)
+        
+        if response.status_code != 200:
+            log.warning("provider_bad_status", provider="gemini", status=response.status_code, body=response.text)
             
-            # Find the JSON part in the response (handles potential text wrapper)
-            json_start = text_response.find('{')
-            json_end = text_response.rfind('}') + 1
+        response.raise_for_status()
+        data = response.json()
+        
+        # Parse Gemini's response to extract nodes and edges
+        text_response = data["candidates"][0]["content"]["parts"][0]["text"]
+        
+        # Recover the JSON map even from fenced, truncated or slightly malformed replies
+        with stage_timer("parse"):
+            result = extract_map_json(text_response)
+            if result is not None:
+                # Add info about which API was used
+                result["api_used"] = "gemini"
+                result = validate_and_fix_result(result)
+        
+        if result is not None:
+            v = result["validation"]
+            if v["edges_repaired"] or v["edges_dropped"]:
+                log.info("map_repaired", provider="gemini", edges_repaired=v["edges_repaired"],
+                         edges_dropped=v["edges_dropped"])
+            return result
+        else:
+            log.warning("no_json_in_reply", provider="gemini")
+            return {"nodes": [], "edges": [], "api_used": "gemini_failed"}
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = text_response[json_start:json_end]
-                result = json.loads(json_str)
+    except Exception as e:
+        log.warning("provider_error", provider="gemini", error=str(e))
+        return {"nodes": [], "edges": [], "api_used": "gemini_failed"}
+
+async def call_mistral(text: str, is_research_mode: bool = False) -> Dict:
+    """Call the Mistral API to extract concepts and relationships."""
+    prompt = build_prompt(text, is_research_mode)
+    headers, payload = mistral_request(prompt)
+    try:
+        with stage_timer("llm"):
+            response = await post_provider("mistral", providers()["mistral_url"], tokens=estimate_tokens(prompt),
+                                           headers=headers, json=payload, timeout=45)
+        response.raise_for_status()
+        data = response.json()
+        
+        # Get the text response
+        text_response = data["choices"][0]["message"]["content"]
+        
+        # Recover the JSON map even from fenced, truncated or slightly malformed replies
+        with stage_timer("parse"):
+            result = extract_map_json(text_response)
+            if result is not None:
                 # Add info about which API was used
                 result["api_used"] = "mistral"
-                return result
-            else:
-                print("Could not find valid JSON in Mistral response")
-                return {"nodes": [], "edges": [], "api_used": "mistral_failed"}
-                
+                result = validate_and_fix_result(result)
+        
+        if result is not None:
+            v = result["validation"]
+            if v["edges_repaired"] or v["edges_dropped"]:
+                log.info("map_repaired", provider="mistral", edges_repaired=v["edges_repaired"],
+                         edges_dropped=v["edges_dropped"])
+            return result
+        else:
+            log.warning("no_json_in_reply", provider="mistral")
+            return {"nodes": [], "edges": [], "api_used": "mistral_failed"}
+            
     except Exception as e:
-        print(f"Mistral API error: {e}")
+        log.warning("provider_error", provider="mistral", error=str(e))
         return {"nodes": [], "edges": [], "api_used": "mistral_failed"}
 
-async def research_and_extract(text: str):
+async def _sse_data(response: httpx.Response) -> AsyncIterator[Dict]:
+    """Yield the decoded JSON payload of each 'data:' line of a Server-Sent Events response."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            continue
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+async def stream_gemini(text: str, is_research_mode: bool = False) -> AsyncIterator[str]:
+    """Stream the raw text of a Gemini reply chunk by chunk. Errors propagate to the caller."""
+    prompt = build_prompt(text, is_research_mode)
+    payload = gemini_payload(prompt)
+    await get_limiter("gemini").acquire(estimate_tokens(prompt))
+    url = providers()["gemini_stream_url"]
+    client = get_client(url)
+    async with guarded_call("gemini") as call:
+        async with client.stream("POST", url, headers=gemini_headers(), json=payload,
+                                 timeout=45) as response:
+            call.mark()
+            if response.status_code == 429:
+                call.success = None
+            response.raise_for_status()
+            async for data in _sse_data(response):
+                for candidate in data.get("candidates", []):
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+
+async def stream_mistral(text: str, is_research_mode: bool = False) -> AsyncIterator[str]:
+    """Stream the raw text of a Mistral reply chunk by chunk. Errors propagate to the caller."""
+    prompt = build_prompt(text, is_research_mode)
+    headers, payload = mistral_request(prompt, stream=True)
+    await get_limiter("mistral").acquire(estimate_tokens(prompt))
+    url = providers()["mistral_url"]
+    client = get_client(url)
+    async with guarded_call("mistral") as call:
+        async with client.stream("POST", url, headers=headers, json=payload, timeout=45) as response:
+            call.mark()
+            if response.status_code == 429:
+                call.success = None
+            response.raise_for_status()
+            async for data in _sse_data(response):
+                for choice in data.get("choices", []):
+                    content = choice.get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+def is_valid_map(result: Dict) -> bool:
+    """A provider result is usable when it has at least one node and one edge."""
+    return bool(result and result.get("nodes") and result.get("edges"))
+
+async def _provider_call(provider: str, text: str, is_research_mode: bool) -> Dict:
+    call = call_gemini if provider == "gemini" else call_mistral
+    try:
+        return await call(text, is_research_mode)
+    except Exception as e:
+        log.warning("provider_error", provider=provider, research_mode=True, error=str(e))
+        return {"nodes": [], "edges": [], "api_used": f"{provider}_failed"}
+
+async def hedged_research_call(research_text: str) -> Dict:
+    """
+    Run Gemini with Mistral as a hedge according to RESEARCH_HEDGE_POLICY.
+    The first valid result wins and the other call is cancelled.
+    """
+    config = research_settings()
+    tasks = {asyncio.ensure_future(_provider_call("gemini", research_text, True)): "gemini"}
+    try:
+        if config["hedge_policy"] != "race":
+            done, _ = await asyncio.wait(set(tasks), timeout=config["hedge_delay"])
+            if done:
+                # Gemini answered before the hedge delay - no hedge needed
+                result = next(iter(done)).result()
+                if is_valid_map(result):
+                    return result
+                FALLBACKS.inc(from_provider="gemini", to_provider="mistral", kind="fallback")
+                return await _provider_call("mistral", research_text, True)
+
+        HEDGE_STATS["hedges_started"] += 1
+        FALLBACKS.inc(from_provider="gemini", to_provider="mistral", kind="hedge")
+        log.info("hedge_started", provider="mistral", policy=config["hedge_policy"])
+        tasks[asyncio.ensure_future(_provider_call("mistral", research_text, True))] = "mistral"
+
+        pending = set(tasks)
+        last_result = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if is_valid_map(result):
+                    HEDGE_STATS["hedges_won" if tasks[task] == "mistral" else "hedges_lost"] += 1
+                    return result
+                # Prefer returning Mistral's failure, matching the sequential fallback
+                if last_result is None or tasks[task] == "mistral":
+                    last_result = result
+        return last_result
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+def local_extract(text: str, topic: str = None, api_used: str = "local") -> Dict:
+    """Map from the local extractor (no LLM call), validated like a provider result."""
+    with stage_timer("local"):
+        result = extract_local(text, topic)
+    result["api_used"] = api_used
+    return validate_and_fix_result(result)
+
+async def extract_long_text(text: str, use_mistral: bool, use_gemini: bool) -> Dict:
+    """
+    Map-reduce extraction for long inputs: split the text into overlapping
+    chunks, extract each chunk concurrently (Mistral first, Gemini as the
+    per-chunk fallback) and merge the partial maps into one graph, so the
+    wall-clock time is that of the slowest chunk.
+    """
+    config = long_input_settings()
+    chunks = split_chunks(text, config["chunk_chars"], config["overlap"], config["max_chunks"])
+    semaphore = asyncio.Semaphore(config["concurrency"])
+    
+    async def extract_chunk(index: int, chunk: str) -> Dict:
+        async with semaphore:
+            with span("chunk", index=index, chars=len(chunk)):
+                result = {"nodes": [], "edges": [], "api_used": "api_failure"}
+                if use_mistral:
+                    result = await call_mistral(chunk)
+                    if is_valid_map(result):
+                        return result
+                if use_gemini:
+                    if use_mistral:
+                        FALLBACKS.inc(from_provider="mistral", to_provider="gemini", kind="fallback")
+                    result = await call_gemini(chunk)
+                return result
+    
+    with span("long_input", chunks=len(chunks)):
+        results = await asyncio.gather(*[extract_chunk(index, chunk) for index, chunk in enumerate(chunks)])
+        valid = [result for result in results if is_valid_map(result)]
+        log.info("long_input_extracted", chars=len(text), chunks=len(chunks), succeeded=len(valid))
+        if not valid:
+            log.error("all_providers_failed", chunks=len(chunks))
+            return local_extract(text, api_used="local_fallback")
+        
+        with stage_timer("merge"):
+            merged = merge_partial_maps(valid)
+    # Name every provider that contributed, e.g. "mistral" or "mistral+gemini"
+    contributors = [name for name in ("mistral", "gemini") if any(r["api_used"] == name for r in valid)]
+    merged["api_used"] = "+".join(contributors)
+    merged["chunks"] = {"total": len(chunks), "succeeded": len(valid)}
+    return merged
+
+async def research_and_extract(text: str, fast_mode: bool = False):
     """Perform web search and then extract concepts and relationships."""
     try:
-        print(f"Starting research_and_extract for: {text}")
+        log.debug("research_started", text=text)
+        
+        # Fast mode skips the LLM (and page downloads): the map is built locally from the search results
+        if fast_mode:
+            search_results = await research_search(text)
+            return local_extract(search_results_text(search_results) or text, topic=text)
         
-        # If we're in mock mode, return mock data
-        if MOCK_MODE:
-            print("Using MOCK_MODE for research")
-            mock_nodes = ["Java Agent Development", "Agent Architecture", "Java APIs", "Libraries", "Frameworks", 
-                          "JADE", "JACK", "Jason", "Jadex", "Java Agent Development Framework",
-                          "BDI Model", "Communication Protocols", "FIPA Standards", "ACL Messages",
-                          "Concurrency", "Multithreading", "Distributed Systems", "Agent Mobility"]
-            mock_edges = [
-                ["Java Agent Development", "Agent Architecture", ""],
-                ["Java Agent Development", "Java APIs", ""],
-                ["Java Agent Development", "Libraries", ""],
-                ["Java Agent Development", "Frameworks", ""],
-                ["Frameworks", "JADE", ""],
-                ["Frameworks", "JACK", ""],
-                ["Frameworks", "Jason", ""],
-                ["Frameworks", "Jadex", ""],
-                ["JADE", "Java Agent Development Framework", "is"],
-                ["Agent Architecture", "BDI Model", "includes"],
-                ["Java APIs", "Communication Protocols", ""],
-                ["Communication Protocols", "FIPA Standards", "follows"],
-                ["Communication Protocols", "ACL Messages", "uses"],
-                ["Java APIs", "Concurrency", "supports"],
-                ["Concurrency", "Multithreading", "through"],
-                ["Java Agent Development", "Distributed Systems", "enables"],
-                ["Distributed Systems", "Agent Mobility", "supports"]
-            ]
-            return {"nodes": mock_nodes, "edges": mock_edges, "api_used": "mock_mode"}
+        # Without provider keys, the local extractor works from the search results alone
+        if providers()["mock_mode"]:
+            log.debug("mock_mode", research_mode=True)
+            search_results = await research_search(text)
+            return local_extract(search_results_text(search_results) or text, topic=text, api_used="local_fallback")
         
         # Perform web search - we'll extract top results
-        search_results = await web_search(text)
+        search_results = await research_search(text)
+        # Optionally read the top result pages themselves (DEEP_RESEARCH_ENABLED)
+        search_results = await deep_research(search_results)
         
         # Combine search results with original query
         research_text = await extract_info_from_search_results(search_results, text)
         
-        print(f"Research completed, now generating mind map with {'Gemini' if VALID_GEMINI_API else 'Mistral'}")
+        log.debug("research_completed", results=len(search_results), research_chars=len(research_text))
+        
+        # Providers whose circuit breaker is open are skipped without waiting for a timeout
+        use_gemini = providers()["gemini_valid"] and not provider_open("gemini")
+        use_mistral = providers()["mistral_valid"] and not provider_open("mistral")
+        
+        # With both providers available, optionally hedge Gemini with Mistral
+        if use_gemini and use_mistral and research_settings()["hedge_policy"] in ("delay", "race"):
+            result = await hedged_research_call(research_text)
+            if is_valid_map(result):
+                return result
+            return local_extract(search_results_text(search_results) or text, topic=text, api_used="local_fallback")
         
         # Always try Gemini first for research mode (as it handles complexity better)
-        if VALID_GEMINI_API:
+        if use_gemini:
             try:
                 result = await call_gemini(research_text, True)
-                if result.get("nodes") and result.get("edges"):
+                if is_valid_map(result):
                     return result
             except Exception as e:
-                print(f"Gemini API error in research mode: {e}")
+                log.warning("provider_error", provider="gemini", research_mode=True, error=str(e))
         
         # Fall back to Mistral if Gemini fails or isn't available
-        if VALID_MISTRAL_API:
+        if use_mistral:
+            if use_gemini:
+                FALLBACKS.inc(from_provider="gemini", to_provider="mistral", kind="fallback")
             try:
                 result = await call_mistral(research_text, True)
-                return result
+                if is_valid_map(result):
+                    return result
             except Exception as e:
-                print(f"Mistral API error in research mode: {e}")
+                log.warning("provider_error", provider="mistral", research_mode=True, error=str(e))
         
-        # If both fail, return a simplified mock response
-        print("Both APIs failed, returning mock data")
-        mock_nodes = ["Java Agent Development", "Failed to process with APIs"]
-        mock_edges = [["Java Agent Development", "Failed to process with APIs", "error"]]
-        return {"nodes": mock_nodes, "edges": mock_edges, "api_used": "api_failure"}
+        # If both fail, build the map locally from what the search found
+        log.error("all_providers_failed", research_mode=True)
+        return local_extract(search_results_text(search_results) or text, topic=text, api_used="local_fallback")
         
     except Exception as e:
-        print(f"Error in research_and_extract: {str(e)}")
+        log.error("research_failed", error=str(e))
         error_nodes = ["Error", "Processing Failed"]
         error_edges = [["Error", "Processing Failed", str(e)]]
         return {"nodes": error_nodes, "edges": error_edges, "api_used": "error"}
 
-async def extract_concepts_and_relationships(text: str, is_research_mode: bool = False):
-    """Extract concepts and relationships from text using AI."""
+async def extract_concepts_and_relationships(text: str, is_research_mode: bool = False, fast_mode: bool = False):
+    """
+    Extract concepts and relationships from text using AI. With fast_mode, or
+    when no provider succeeds, the map is built by the local extractor instead.
+    """
     try:
-        if MOCK_MODE:
-            print("Using MOCK_MODE for extraction")
-            mock_nodes = ["Java Developer", "Skills", "Technologies", "Roles", "Education",
-                        "Java", "Spring", "Hibernate", "SQL", "Git",
-                        "Backend Developer", "Software Engineer", "Application Developer",
-                        "CS Degree", "Java Certification"]
-            mock_edges = [
-                ["Java Developer", "Skills", "needs"],
-                ["Java Developer", "Technologies", "uses"],
-                ["Java Developer", "Roles", "can be"],
-                ["Java Developer", "Education", "requires"],
-                ["Skills", "Java", "includes"],
-                ["Skills", "SQL", "includes"],
-                ["Skills", "Git", "includes"],
-                ["Technologies", "Spring", "includes"],
-                ["Technologies", "Hibernate", "includes"],
-                ["Roles", "Backend Developer", "such as"],
-                ["Roles", "Software Engineer", "such as"],
-                ["Roles", "Application Developer", "such as"],
-                ["Education", "CS Degree", "like"],
-                ["Education", "Java Certification", "or"]
-            ]
-            return {"nodes": mock_nodes, "edges": mock_edges, "api_used": "mock_mode"}
+        if fast_mode:
+            return local_extract(text)
+        if providers()["mock_mode"]:
+            # No provider keys: the local extractor stands in for the LLM
+            log.debug("mock_mode", research_mode=is_research_mode)
+            return local_extract(text, api_used="local_fallback")
+        
+        log.debug("extraction_started", text=text, research_mode=is_research_mode)
         
-        print(f"Extraction started for: {text} with research_mode: {is_research_mode}")
+        # Providers whose circuit breaker is open are skipped without waiting for a timeout
+        use_mistral = providers()["mistral_valid"] and not provider_open("mistral")
+        use_gemini = providers()["gemini_valid"] and not provider_open("gemini")
+        
+        # Long documents are extracted chunk by chunk and merged (LONG_INPUT_THRESHOLD)
+        if not is_research_mode and (use_mistral or use_gemini) \
+                and len(text) > long_input_settings()["threshold"]:
+            return await extract_long_text(text, use_mistral, use_gemini)
         
         # For standard mode (not research) - use Mistral
-        if VALID_MISTRAL_API:
+        if use_mistral:
             try:
                 result = await call_mistral(text, is_research_mode)
-                return result
+                if is_valid_map(result):
+                    return result
             except Exception as e:
-                print(f"Mistral API error: {e}")
+                log.warning("provider_error", provider="mistral", error=str(e))
         
         # Fall back to Gemini only if Mistral fails
-        if VALID_GEMINI_API:
+        if use_gemini:
+            if use_mistral:
+                FALLBACKS.inc(from_provider="mistral", to_provider="gemini", kind="fallback")
             try:
                 result = await call_gemini(text, is_research_mode)
-                return result
+                if is_valid_map(result):
+                    return result
             except Exception as e:
-                print(f"Gemini API error: {e}")
+                log.warning("provider_error", provider="gemini", error=str(e))
                 
-        # If both fail, return an error map
-        error_nodes = ["Error", "API Processing Failed"]
-        error_edges = [["Error", "API Processing Failed", "Both Mistral and Gemini failed"]]
-        return {"nodes": error_nodes, "edges": error_edges, "api_used": "api_failure"}
+        # If both fail, answer with the local extractor rather than an error map
+        log.error("all_providers_failed", research_mode=is_research_mode)
+        return local_extract(text, api_used="local_fallback")
             
     except Exception as e:
-        print(f"Error in extract_concepts_and_relationships: {str(e)}")
+        log.error("extraction_failed", error=str(e))
         error_nodes = ["Error", "Processing Failed"]
         error_edges = [["Error", "Processing Failed", str(e)]]
         return {"nodes": error_nodes, "edges": error_edges, "api_used": "error"}
 
 def validate_and_fix_result(result: Dict) -> Dict:
-    """Validate and fix the structure of nodes and edges to ensure they are well-formed."""
+    """
+    Validate and fix the structure of nodes and edges to ensure they are well-formed.
+    
+    Edge endpoints are resolved through a one-pass casefold index of the node
+    names, so each edge costs O(1) instead of a rescan of every node. Names
+    are then canonicalized (see canonicalize.py). The returned dict carries a
+    'validation' entry with the repair and merge counts.
+    """
     if not result:
-        return {"nodes": [], "edges": [], "api_used": "validation_failed"}
+        return {"nodes": [], "edges": [], "api_used": "validation_failed",
+                "validation": {"edges_repaired": 0, "edges_dropped": 0, "nodes_dropped": 0, "names_merged": 0}}
     
     # Ensure we have nodes and edges
-    nodes = result.get("nodes", [])
-    edges = result.get("edges", [])
+    nodes = result.get("nodes") or []
+    edges = result.get("edges") or []
     api_used = result.get("api_used", "unknown")
     
     # Filter out any None or empty nodes
     valid_nodes = [node for node in nodes if node and isinstance(node, str)]
+    node_set = set(valid_nodes)
+    
+    # Case-insensitive name -> canonical name (later nodes win, as before)
+    casefold_index = {node.casefold(): node for node in valid_nodes}
+    
+    def resolve(name):
+        if name in node_set:
+            return name, False
+        canonical = casefold_index.get(name.casefold())
+        return canonical, canonical is not None
     
     # Validate and fix edges
     valid_edges = []
+    repaired = 0
     for edge in edges:
-        if not edge or not isinstance(edge, list):
+        if not edge or not isinstance(edge, (list, tuple)):
             continue
             
         # Must have at least source and target
@@ -463,32 +827,38 @@ def validate_and_fix_result(result: Dict) -> Dict:
         if not isinstance(edge[0], str) or not edge[0] or not isinstance(edge[1], str) or not edge[1]:
             continue
             
-        # Ensure source and target are in nodes
-        if edge[0] not in valid_nodes or edge[1] not in valid_nodes:
-            # Try to find them case-insensitively
-            source_found = False
-            target_found = False
-            
-            for node in valid_nodes:
-                if node.lower() == edge[0].lower():
-                    edge[0] = node  # Use the correct case
-                    source_found = True
-                if node.lower() == edge[1].lower():
-                    edge[1] = node  # Use the correct case
-                    target_found = True
-            
-            # Skip edges with nodes not in the nodes list
-            if not source_found or not target_found:
-                continue
+        # Ensure source and target are in nodes, fixing their case if needed
+        source, source_fixed = resolve(edge[0])
+        target, target_fixed = resolve(edge[1])
+        
+        # Skip edges with nodes not in the nodes list
+        if source is None or target is None:
+            continue
+        if source_fixed or target_fixed:
+            repaired += 1
         
         # Ensure edge has 3 elements [source, target, relation]
-        if len(edge) == 2:
-            valid_edges.append([edge[0], edge[1], ""])
-        elif len(edge) >= 3:
-            valid_edges.append([edge[0], edge[1], edge[2]])
+        valid_edges.append([source, target, edge[2] if len(edge) >= 3 else ""])
+    
+    stats = {
+        "edges_repaired": repaired,
+        "edges_dropped": len(edges) - len(valid_edges),
+        "nodes_dropped": len(nodes) - len(valid_nodes),
+        "names_merged": 0,
+    }
+    if canonicalize_enabled():
+        # Fold spelling variants and near-duplicate concepts into one node before formatting
+        valid_nodes, valid_edges, canonical_stats = canonicalize(valid_nodes, valid_edges)
+        stats["names_merged"] = canonical_stats["names_merged"]
+
+    for key, value in stats.items():
+        VALIDATION_STATS[key] += value
     
     return {
         "nodes": valid_nodes,
         "edges": valid_edges,
-        "api_used": api_used
-    } 
\ No newline at end of file
+        # Interned graph handed to the formatter, so names are sanitized only once
+        "graph": MindMapGraph.from_lists(valid_nodes, valid_edges),
+        "api_used": api_used,
+        "validation": stats,
+    }
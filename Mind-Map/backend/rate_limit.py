@@ -0,0 +1,198 @@
+import os
+import time
+import random
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from logs import get_logger
+
+log = get_logger("rate_limit")
+
+# Status codes that mean "slow down and try again"
+RETRYABLE_STATUS = (429, 503)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller would have to queue longer than the limiter's max_wait."""
+
+
+class TokenBucket:
+    """Classic token bucket: refills at `rate` per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    """
+    Per-provider limiter with a requests/second and a tokens/minute bucket.
+
+    Callers are served strictly in arrival order (asyncio.Lock wakes waiters
+    FIFO), so a burst queues up briefly instead of failing. A rate of 0
+    disables that bucket. After a 429 the whole provider is paused until its
+    Retry-After has passed.
+    """
+
+    def __init__(self, name: str, requests_per_second: float = 0, tokens_per_minute: float = 0,
+                 max_wait: float = 15.0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_second, max(requests_per_second, 1)) if requests_per_second > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_wait = max_wait
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.waiting = 0
+        self.stats = {"acquired": 0, "waited_seconds": 0.0, "timeouts": 0, "retries": 0, "throttled": 0}
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds` (e.g. after a 429 with Retry-After)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = max(0.0, self._paused_until - time.monotonic())
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    async def acquire(self, tokens: int = 0):
+        """Wait for a request slot (and `tokens` LLM tokens) in FIFO order."""
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    if time.monotonic() - started + wait > self.max_wait:
+                        self.stats["timeouts"] += 1
+                        raise RateLimitTimeout(f"{self.name} rate limit: queue wait would exceed {self.max_wait}s")
+                    await asyncio.sleep(wait)
+                if self.requests is not None:
+                    self.requests.take(1)
+                if self.tokens is not None and tokens:
+                    self.tokens.take(tokens)
+        finally:
+            self.waiting -= 1
+        self.stats["acquired"] += 1
+        self.stats["waited_seconds"] += time.monotonic() - started
+
+    def info(self) -> Dict:
+        return {
+            "queue_depth": self.waiting,
+            "requests_per_second": self.requests.rate if self.requests else None,
+            "tokens_per_minute": self.tokens.rate * 60 if self.tokens else None,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+        }
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """Limiter for a provider, configured by <PROVIDER>_RPS, <PROVIDER>_TPM and RATE_LIMIT_MAX_WAIT."""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        prefix = provider.upper()
+        limiter = ProviderLimiter(
+            provider,
+            requests_per_second=_env_float(f"{prefix}_RPS", 0),
+            tokens_per_minute=_env_float(f"{prefix}_TPM", 0),
+            max_wait=_env_float("RATE_LIMIT_MAX_WAIT", 15.0),
+        )
+        _limiters[provider] = limiter
+    return limiter
+
+
+def limiter_info() -> Dict[str, Dict]:
+    return {name: limiter.info() for name, limiter in _limiters.items()}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token) for the tokens/minute bucket."""
+    return max(1, len(text) // 4)
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+async def send_with_retry(provider: str, send: Callable[[], Awaitable[httpx.Response]],
+                          tokens: int = 0) -> httpx.Response:
+    """
+    Send a provider request through its limiter, retrying 429/503 answers with
+    jittered exponential backoff (or the server's Retry-After when given).
+    The last response is returned as-is once retries are exhausted.
+    """
+    limiter = get_limiter(provider)
+    max_retries = int(_env_float("PROVIDER_MAX_RETRIES", 3))
+    base_delay = _env_float("PROVIDER_RETRY_BASE_DELAY", 0.5)
+    # A longer pause would time out every caller queued behind it instead of making them wait
+    max_delay = min(_env_float("PROVIDER_RETRY_MAX_DELAY", 15.0), limiter.max_wait)
+
+    attempt = 0
+    while True:
+        await limiter.acquire(tokens)
+        response = await send()
+        if response.status_code not in RETRYABLE_STATUS or attempt >= max_retries:
+            return response
+
+        limiter.stats["throttled"] += 1
+        delay = retry_after_seconds(response)
+        if delay is None:
+            # Full jitter: uniform in [0, base * 2^attempt]
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+        if delay > max_delay:
+            log.warning("retry_abandoned", provider=provider, retry_after=round(delay, 1))
+            return response
+        # Everyone queued on this provider backs off, not just this caller
+        limiter.pause(delay)
+        limiter.stats["retries"] += 1
+        attempt += 1
+        log.info("provider_retry", provider=provider, status=response.status_code, attempt=attempt,
+                 max_retries=max_retries, delay=round(delay, 2))
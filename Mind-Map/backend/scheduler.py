@@ -0,0 +1,105 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Scheduler of the batch job running in the current task (None outside batches).
+# Provider calls look it up so per-provider caps only apply to batch work.
+_active_scheduler: ContextVar[Optional["BatchScheduler"]] = ContextVar("batch_scheduler", default=None)
+
+
+@asynccontextmanager
+async def provider_slot(provider: str):
+    """Hold one of the active batch scheduler's slots for this provider (no-op outside batches)."""
+    scheduler = _active_scheduler.get()
+    if scheduler is None or provider not in scheduler.provider_limits:
+        yield
+        return
+    async with scheduler._provider_semaphores[provider]:
+        yield
+
+
+class BatchScheduler:
+    """
+    Bounded-concurrency worker pool for batch map generation.
+
+    max_concurrency caps the jobs running at once across every batch sharing
+    this scheduler; provider_limits caps the concurrent calls to each provider
+    (enforced through provider_slot inside the provider calls).
+    """
+
+    def __init__(self, max_concurrency: int = 8, provider_limits: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.provider_limits = {name: max(1, limit) for name, limit in (provider_limits or {}).items()}
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._provider_semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.provider_limits.items()}
+        self.stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+
+    async def run(self, jobs: List[Callable[[], Awaitable[Any]]]) -> AsyncIterator[Tuple[int, Any, Optional[Exception]]]:
+        """Run the jobs and yield (index, result, error) in completion order."""
+        pending: asyncio.Queue = asyncio.Queue()
+        for index, job in enumerate(jobs):
+            pending.put_nowait((index, job))
+        finished: asyncio.Queue = asyncio.Queue()
+        self.stats["queued"] += len(jobs)
+
+        async def worker():
+            while True:
+                try:
+                    index, job = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self._global.acquire()
+                finally:
+                    # Off the queue now, whether the job starts or the worker was cancelled while waiting
+                    self.stats["queued"] -= 1
+                self.stats["running"] += 1
+                token = _active_scheduler.set(self)
+                try:
+                    result = await job()
+                    self.stats["completed"] += 1
+                    finished.put_nowait((index, result, None))
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    finished.put_nowait((index, None, e))
+                finally:
+                    _active_scheduler.reset(token)
+                    self.stats["running"] -= 1
+                    self._global.release()
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.max_concurrency, len(jobs)))]
+        try:
+            for _ in range(len(jobs)):
+                yield await finished.get()
+        finally:
+            # Client went away or the consumer stopped early: drop the rest of the batch
+            for task in workers:
+                task.cancel()
+            self.stats["queued"] -= pending.qsize()
+
+    def info(self) -> Dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "provider_limits": self.provider_limits,
+            **self.stats,
+        }
+
+
+def scheduler_from_env() -> BatchScheduler:
+    """Create the batch scheduler from BATCH_MAX_CONCURRENCY and BATCH_<PROVIDER>_CONCURRENCY."""
+    def _int(name, default):
+        try:
+            return int(os.getenv(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    return BatchScheduler(
+        max_concurrency=_int("BATCH_MAX_CONCURRENCY", 8),
+        provider_limits={
+            "gemini": _int("BATCH_GEMINI_CONCURRENCY", 4),
+            "mistral": _int("BATCH_MISTRAL_CONCURRENCY", 4),
+            "serper": _int("BATCH_SERPER_CONCURRENCY", 4),
+        },
+    )
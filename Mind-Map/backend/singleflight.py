@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key onto one running task.
+
+    The first caller for a key starts the work; every caller that arrives
+    while it is still running awaits the same task. Each waiter is shielded,
+    so a client that disconnects (and gets cancelled) does not cancel the
+    work the other waiters depend on.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception so it is not reported as unhandled when every waiter has gone
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run factory() once per key at a time. Returns (result, shared)."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task), shared
+
+    def info(self) -> Dict:
+        return {"in_flight": len(self._inflight), **self.stats}
@@ -0,0 +1,103 @@
+from typing import AsyncIterator, Dict, Tuple
+from deep_research import deep_research
+from nlp_service import (
+    stream_gemini, stream_mistral, research_search, extract_info_from_search_results, validate_and_fix_result,
+    local_extract, providers,
+)
+from local_extractor import search_results_text
+from json_extractor import IncrementalMapParser
+from mermaid_formatter import graph_to_mermaid
+from graph import MindMapGraph
+from circuit_breaker import provider_open
+from metrics import stage_timer, FALLBACKS
+from logs import get_logger
+
+log = get_logger("streaming")
+
+STREAMERS = {"gemini": stream_gemini, "mistral": stream_mistral}
+
+
+def node_event(graph: MindMapGraph, name: str) -> Dict:
+    node_id = graph.node_id(graph.add_node(name))
+    return {"id": node_id, "label": name, "mermaid": f"{node_id}[\"{name}\"];"}
+
+
+def edge_event(graph: MindMapGraph, edge) -> Dict:
+    position = graph.add_edge(edge[0], edge[1], edge[2])
+    source_id = graph.node_id(graph.sources[position])
+    target_id = graph.node_id(graph.targets[position])
+    return {
+        "source": edge[0],
+        "target": edge[1],
+        "label": edge[2],
+        "mermaid": f"{source_id} --> {target_id};",
+    }
+
+
+async def stream_map_events(text: str, research_mode: bool = False) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Generate a mind map with the providers' streaming APIs, yielding
+    (event, data) pairs as soon as each node / edge is complete:
+
+    - "provider": a provider attempt started
+    - "node" / "edge": incremental graph deltas with a Mermaid fragment
+    - "reset": the provider failed mid-stream; discard the deltas received so far
+    - "done": the final structured Mermaid map (same output as /generate_map);
+      built by the local extractor when every provider failed. It replaces the
+      deltas: validation and canonicalization run on the complete map, so merged
+      or dropped names, and their IDs, can differ from what was streamed
+    """
+    if research_mode:
+        search_results = await deep_research(await research_search(text))
+        prompt_text = await extract_info_from_search_results(search_results, text)
+        # Same provider order as research_and_extract
+        order = ["gemini", "mistral"]
+    else:
+        search_results = []
+        prompt_text = text
+        # Same provider order as extract_concepts_and_relationships
+        order = ["mistral", "gemini"]
+
+    # Providers whose circuit breaker is open are skipped immediately
+    available = {
+        "gemini": providers()["gemini_valid"] and not provider_open("gemini"),
+        "mistral": providers()["mistral_valid"] and not provider_open("mistral"),
+    }
+    previous = None
+    for provider in [name for name in order if available[name]]:
+        if previous is not None:
+            FALLBACKS.inc(from_provider=previous, to_provider=provider, kind="fallback")
+        previous = provider
+        parser = IncrementalMapParser()
+        # Graph of the deltas sent so far, so a node keeps one ID across the stream
+        graph = MindMapGraph()
+        emitted = False
+        yield "provider", {"provider": provider}
+        try:
+            async for chunk in STREAMERS[provider](prompt_text, research_mode):
+                for kind, value in parser.feed(chunk):
+                    emitted = True
+                    yield kind, node_event(graph, value) if kind == "node" else edge_event(graph, value)
+            result = validate_and_fix_result(parser.result())
+            if result["nodes"] and result["edges"]:
+                api_used = f"research+{provider}" if research_mode else provider
+                with stage_timer("format"):
+                    mermaid = graph_to_mermaid(result["graph"], main_topic=text)
+                yield "done", {"mermaid": mermaid, "api_used": api_used, "cache": "miss"}
+                return
+            log.warning("stream_unusable", provider=provider)
+        except Exception as e:
+            log.warning("stream_error", provider=provider, error=str(e))
+        if emitted:
+            yield "reset", {"reason": f"{provider} failed"}
+
+    # Every provider failed: finish with the local extractor's map rather than an error
+    log.error("all_providers_failed", research_mode=research_mode)
+    if research_mode:
+        result = local_extract(search_results_text(search_results) or text, topic=text, api_used="local_fallback")
+    else:
+        result = local_extract(text, api_used="local_fallback")
+    with stage_timer("format"):
+        mermaid = graph_to_mermaid(result["graph"], main_topic=text)
+    api_used = "research+local_fallback" if research_mode else "local_fallback"
+    yield "done", {"mermaid": mermaid, "api_used": api_used, "cache": "miss"}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules import each other by bare name ("from logs import get_logger"),
+# as they do when the server runs from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
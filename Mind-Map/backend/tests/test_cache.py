@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+import cache as cache_module
+import nlp_service
+from cache import TTLCache, make_key, normalize_text
+
+
+async def settle():
+    """Let freshly scheduled tasks (the refresh and its single-flight task) start."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_entry_goes_fresh_then_stale_then_missing(clock):
+    cache = TTLCache("test", ttl=10, stale_ttl=60)
+    cache.set("key", {"value": 1})
+    assert cache.get("key") == ({"value": 1}, "memory")
+    clock.now += 11
+    assert cache.get("key") == ({"value": 1}, "stale")
+    clock.now += 60
+    assert cache.get("key") == (None, "miss")
+
+
+def test_lru_eviction_and_byte_budget(clock):
+    cache = TTLCache("test", ttl=10, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (None, "miss")
+    assert cache.get("a")[1] == cache.get("c")[1] == "memory"
+
+    small = TTLCache("test", ttl=10, max_bytes=8)
+    small.set("big", "x" * 20)
+    assert small.get("big") == (None, "miss")
+
+
+def test_disk_tier_survives_a_restart(clock, tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = TTLCache("test", ttl=10, db_path=path)
+    first.set("key", ["result"])
+    first.close()
+    second = TTLCache("test", ttl=10, db_path=path)
+    assert second.get("key") == (["result"], "disk")
+    assert second.get("key") == (["result"], "memory")
+    second.close()
+
+
+def test_keys_ignore_case_and_spacing():
+    assert make_key(normalize_text("  Rust   Memory Safety "), 5) == make_key(normalize_text("rust memory safety"), 5)
+
+
+def test_stale_search_is_served_while_a_background_refresh_runs(clock, monkeypatch):
+    search_cache = TTLCache("web_search", ttl=10, stale_ttl=600)
+    monkeypatch.setattr(nlp_service, "search_cache", lambda: search_cache)
+    monkeypatch.setattr(nlp_service, "_providers", {**nlp_service.providers(), "serper_key": "serper-test-key"})
+    key = make_key(normalize_text("rust"), 5)
+    search_cache.set(key, [{"title": "old"}])
+    clock.now += 11
+
+    release = asyncio.Event()
+    refreshes = []
+
+    async def serper_search(query, num_results=5):
+        refreshes.append(query)
+        await release.wait()
+        results = [{"title": "new"}]
+        search_cache.set(make_key(normalize_text(query), num_results), results)
+        return results
+
+    monkeypatch.setattr(nlp_service, "serper_search", serper_search)
+
+    async def scenario():
+        # The stale results come back at once; the refresh has started but not finished
+        assert await nlp_service.web_search("rust") == [{"title": "old"}]
+        await settle()
+        assert refreshes == ["rust"]
+        # A second stale read joins the running refresh instead of starting another
+        assert await nlp_service.web_search("Rust") == [{"title": "old"}]
+        await settle()
+        assert refreshes == ["rust"]
+        release.set()
+        await asyncio.gather(*nlp_service._refresh_tasks)
+        assert await nlp_service.web_search("rust") == [{"title": "new"}]
+
+    asyncio.run(scenario())
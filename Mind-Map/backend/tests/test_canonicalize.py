@@ -0,0 +1,105 @@
+import pytest
+
+from canonicalize import canonicalize, normalize_name, is_typo_variant
+
+
+def merge(a, b):
+    """Canonicalize a root with two children and an edge between them."""
+    return canonicalize(["Root", a, b], [["Root", a, ""], ["Root", b, ""], [a, b, ""]])
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Supervised Learning Algorithms", "Unsupervised Learning Algorithms"),
+    ("Synchronous Communication", "Asynchronous Communication"),
+    ("Machine Learning Models", "Machine Learning Modes"),
+    ("Type 1 Diabetes", "Type 2 Diabetes"),
+])
+def test_distinct_concepts_are_not_merged(a, b):
+    nodes, edges, stats = merge(a, b)
+    assert nodes == ["Root", a, b]
+    assert [a, b, ""] in edges
+    assert stats["names_merged"] == 0
+
+
+def test_typo_is_merged_onto_the_more_used_spelling():
+    nodes, edges, stats = canonicalize(
+        ["Root", "Reinforcement Learning", "Reinforcment Learning"],
+        [["Root", "Reinforcement Learning", ""], ["Reinforcement Learning", "Q-Learning", ""],
+         ["Root", "Reinforcment Learning", ""]])
+    assert nodes == ["Root", "Reinforcement Learning"]
+    assert edges == [["Root", "Reinforcement Learning", ""], ["Reinforcement Learning", "Q-Learning", ""]]
+    assert stats["fuzzy_merges"] == 1
+
+
+def test_spelling_variants_are_merged_exactly():
+    nodes, _, stats = canonicalize(["Neural Networks", "neural-network", "Neural Network"], [])
+    assert nodes == ["Neural Networks"]
+    assert stats == {"names_merged": 2, "fuzzy_merges": 0, "edges_dropped": 0}
+
+
+def test_names_without_words_are_never_merged():
+    nodes, edges, stats = canonicalize(["Topic", "!!!", "—", "😀"], [["Topic", "!!!", ""], ["Topic", "—", ""]])
+    assert nodes == ["Topic", "!!!", "—", "😀"]
+    assert len(edges) == 2
+    assert stats["names_merged"] == 0
+
+
+@pytest.mark.parametrize("name, key", [
+    ("News", "news"),
+    ("Windows", "windows"),
+    ("Time Series", "time series"),
+    ("Data Structures", "data structure"),
+    ("Categories", "category"),
+    ("Types of Learning", "types of learning"),
+    ("C++", "c++"),
+    (".NET", ".net"),
+    ("!!!", ""),
+])
+def test_normalize_name(name, key):
+    assert normalize_name(name) == key
+
+
+def test_typo_variant_rules():
+    assert is_typo_variant("reinforcement learning", "reinforcment learning")
+    assert is_typo_variant("transformer model", "transfomrer model")
+    assert not is_typo_variant("machine learning model", "machine learning mode")
+    assert not is_typo_variant("synchronou communication", "asynchronou communication")
+    assert not is_typo_variant("deep learning", "deep learning model")
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Canvas", "canvas"),
+    ("Atlas", "atlas"),
+    ("Design Canvas", "design canvas"),
+    ("Kubernetes", "kubernetes"),
+])
+def test_words_ending_in_as_are_not_singularized(name, key):
+    assert normalize_name(name) == key
+
+
+def test_canvas_is_not_merged_with_canva():
+    nodes, _, stats = canonicalize(["Design Tools", "Canvas", "Canva"], [["Design Tools", "Canvas", ""],
+                                                                          ["Design Tools", "Canva", ""]])
+    assert nodes == ["Design Tools", "Canvas", "Canva"]
+    assert stats["names_merged"] == 0
+
+
+def test_more_used_spelling_wins_over_a_first_seen_typo():
+    nodes, edges, _ = canonicalize(
+        ["Root", "Reinforcment Learning", "Reinforcement Learning"],
+        [["Root", "Reinforcment Learning", ""], ["Root", "Reinforcement Learning", ""],
+         ["Reinforcement Learning", "Q-Learning", ""]])
+    assert nodes == ["Root", "Reinforcement Learning"]
+    assert edges == [["Root", "Reinforcement Learning", ""], ["Reinforcement Learning", "Q-Learning", ""]]
+
+
+def test_spelling_variants_count_together_against_a_typo():
+    # The typo is written twice, the correct name once in each of three variants
+    nodes, _, _ = canonicalize(["Reinforcment Learning", "Reinforcment Learning", "Reinforcement Learning",
+                                "reinforcement learning", "Reinforcement-Learning"], [])
+    assert nodes == ["Reinforcement Learning"]
+
+
+def test_first_seen_only_breaks_equal_counts():
+    nodes, _, _ = canonicalize(["Reinforcment Learning", "Reinforcement Learning"], [])
+    assert nodes == ["Reinforcment Learning"]
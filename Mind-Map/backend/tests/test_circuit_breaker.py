@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, guarded_call
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def tripped(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=2.0, open_seconds=30)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success, 0.1)
+    return breaker
+
+
+def test_stays_closed_until_min_calls(clock):
+    breaker = CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5)
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_failure_rate_and_rejects(clock):
+    breaker = tripped(clock)
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.info()["rejected"] == 1
+    assert breaker.info()["retry_in"] == 30
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=2.0)
+    for latency in (0.1, 5.0, 0.1, 5.0):
+        breaker.record(True, latency)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    breaker = tripped(clock)
+    clock.now += 30
+    assert breaker.info()["state"] == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.info()["window_calls"] == 0
+
+
+def test_failed_probe_reopens(clock):
+    breaker = tripped(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats["opened"] == 2
+
+
+def test_guarded_call(clock, monkeypatch):
+    breaker = tripped(clock)
+    monkeypatch.setitem(circuit_breaker._breakers, "test", breaker)
+
+    async def scenario():
+        with pytest.raises(CircuitOpenError):
+            async with guarded_call("test"):
+                pass
+
+        clock.now += 30
+        # A throttled probe (success=None) says nothing about health and gives the probe back
+        with pytest.raises(RuntimeError):
+            async with guarded_call("test") as call:
+                call.success = None
+                raise RuntimeError("429")
+        assert breaker.state == HALF_OPEN and breaker.allow()
+        breaker.release()
+
+        # A cancelled probe records nothing either
+        with pytest.raises(asyncio.CancelledError):
+            async with guarded_call("test"):
+                raise asyncio.CancelledError()
+        assert breaker.state == HALF_OPEN
+
+        async with guarded_call("test"):
+            pass
+        assert breaker.state == CLOSED
+
+    asyncio.run(scenario())
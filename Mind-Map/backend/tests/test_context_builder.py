@@ -0,0 +1,57 @@
+from context_builder import _naive_context, bm25_scores, build_context, split_passages, term_matrix, tokenize
+from rate_limit import estimate_tokens
+
+FILLER = " ".join(f"Gardeners water tomato plants number {i} every morning in the summer." for i in range(30))
+
+
+def test_split_passages_groups_whole_sentences():
+    text = "One two three. Four five six. Seven eight nine ten."
+    assert split_passages(text, 6) == ["One two three. Four five six.", "Seven eight nine ten."]
+    assert split_passages(text, 2) == ["One two three.", "Four five six.", "Seven eight nine ten."]
+
+
+def test_bm25_ranks_passages_mentioning_the_topic_first():
+    docs = [tokenize("Tomatoes grow in summer."), tokenize("Rust is a systems language. Rust has ownership.")]
+    counts, vocab = term_matrix(docs)
+    scores = bm25_scores(counts, [vocab["rust"]])
+    assert scores[1] > scores[0] == 0
+    assert not bm25_scores(counts, []).any()
+
+
+def test_near_duplicate_passages_are_dropped():
+    results = [
+        {"title": "A", "snippet": "Rust is a systems programming language focused on safety."},
+        {"title": "B", "snippet": "Rust is a systems programming language focused on safety!"},
+        {"title": "C", "snippet": "Cargo is the Rust package manager."},
+    ]
+    text, report = build_context(results, "Rust")
+    assert report["passages"] == 3
+    assert report["duplicates"] == 1
+    assert report["kept"] == 2
+    assert "Title: A" in text and "Title: B" not in text and "Title: C" in text
+    # Sources are renumbered in their original order
+    assert text.index("Source 1:\nTitle: A") < text.index("Source 2:\nTitle: C")
+
+
+def test_budget_keeps_the_relevant_passages(monkeypatch):
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "120")
+    monkeypatch.setenv("CONTEXT_PASSAGE_WORDS", "40")
+    results = [
+        {"title": "Garden", "snippet": "Tomato care.", "content": FILLER},
+        {"title": "Rust", "snippet": "Rust guarantees memory safety without a garbage collector.",
+         "content": FILLER + " The Rust borrow checker enforces ownership rules."},
+    ]
+    text, report = build_context(results, "Rust memory safety")
+    assert "Rust guarantees memory safety" in text
+    assert "borrow checker" in text
+    assert report["tokens_after"] == estimate_tokens(text) <= 130
+    assert report["tokens_before"] == estimate_tokens(_naive_context(results, "Rust memory safety"))
+    assert report["tokens_saved"] == report["tokens_before"] - report["tokens_after"] > 0
+    assert report["kept"] < report["passages"]
+
+
+def test_without_passages_the_naive_context_is_returned():
+    results = [{"title": "Empty"}]
+    text, report = build_context(results, "Rust")
+    assert text == _naive_context(results, "Rust")
+    assert report["passages"] == report["kept"] == report["tokens_saved"] == 0
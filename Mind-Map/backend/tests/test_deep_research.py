@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import deep_research
+
+
+@pytest.mark.parametrize("url, public", [
+    ("http://93.184.215.14/page", True),
+    ("https://[2606:4700::1111]/", True),
+    ("http://127.0.0.1:8000/", False),
+    ("http://[::1]/", False),
+    ("http://10.1.2.3/admin", False),
+    ("http://192.168.0.1/", False),
+    ("http://169.254.169.254/latest/meta-data/", False),
+    ("http://0.0.0.0/", False),
+    ("file:///etc/passwd", False),
+    ("ftp://93.184.215.14/", False),
+])
+def test_is_public_url(url, public):
+    assert asyncio.run(deep_research.is_public_url(url)) is public
+
+
+def test_cancelling_deep_research_cancels_page_downloads(monkeypatch):
+    monkeypatch.setenv("DEEP_RESEARCH_ENABLED", "true")
+    started, cancelled = [], []
+
+    async def slow_page(url, config):
+        started.append(url)
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    monkeypatch.setattr(deep_research, "_page_text", slow_page)
+    results = [{"title": "A", "link": "https://a.example/"}, {"title": "B", "link": "https://b.example/"}]
+
+    async def scenario():
+        task = asyncio.ensure_future(deep_research.deep_research(results))
+        while len(started) < 2:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        # Checked inside the loop: asyncio.run() would cancel leftover tasks on its own
+        assert sorted(cancelled) == sorted(started)
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import nlp_service
+
+GEMINI_MAP = {"nodes": ["A", "B"], "edges": [["A", "B", ""]], "api_used": "gemini"}
+MISTRAL_MAP = {"nodes": ["A", "C"], "edges": [["A", "C", ""]], "api_used": "mistral"}
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Fake providers: set behaviour[name] to (delay, result or exception); records calls and cancellations."""
+    behaviour = {"gemini": (0, GEMINI_MAP), "mistral": (0, MISTRAL_MAP)}
+    calls, cancelled = [], []
+
+    def fake(name):
+        async def call(text, is_research_mode):
+            calls.append(name)
+            delay, outcome = behaviour[name]
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return call
+
+    monkeypatch.setattr(nlp_service, "call_gemini", fake("gemini"))
+    monkeypatch.setattr(nlp_service, "call_mistral", fake("mistral"))
+    monkeypatch.setattr(nlp_service, "HEDGE_STATS", {"hedges_started": 0, "hedges_won": 0, "hedges_lost": 0})
+    monkeypatch.setenv("RESEARCH_HEDGE_DELAY", "0.05")
+    return behaviour, calls, cancelled
+
+
+def hedge(policy, monkeypatch, cancelled=None):
+    monkeypatch.setenv("RESEARCH_HEDGE_POLICY", policy)
+
+    async def run():
+        result = await nlp_service.hedged_research_call("research text")
+        await asyncio.sleep(0)
+        # Checked here, as asyncio.run would cancel any leftover call on its way out
+        if cancelled is not None:
+            assert cancelled == ["gemini"]
+        return result
+
+    return asyncio.run(run())
+
+
+def test_race_returns_the_first_valid_map_and_cancels_the_other(providers, monkeypatch):
+    behaviour, calls, cancelled = providers
+    behaviour["gemini"] = (10, GEMINI_MAP)
+    assert hedge("race", monkeypatch, cancelled) == MISTRAL_MAP
+    assert sorted(calls) == ["gemini", "mistral"]
+    assert nlp_service.HEDGE_STATS == {"hedges_started": 1, "hedges_won": 1, "hedges_lost": 0}
+
+
+def test_race_waits_past_an_invalid_result(providers, monkeypatch):
+    behaviour, _, cancelled = providers
+    behaviour["mistral"] = (0, RuntimeError("boom"))
+    behaviour["gemini"] = (0.01, GEMINI_MAP)
+    assert hedge("race", monkeypatch) == GEMINI_MAP
+    assert cancelled == []
+    assert nlp_service.HEDGE_STATS["hedges_lost"] == 1
+
+
+def test_race_returns_mistrals_failure_when_both_fail(providers, monkeypatch):
+    behaviour, _, _ = providers
+    behaviour["gemini"] = (0, RuntimeError("down"))
+    behaviour["mistral"] = (0.01, RuntimeError("down"))
+    assert hedge("race", monkeypatch)["api_used"] == "mistral_failed"
+
+
+def test_delay_skips_the_hedge_when_gemini_answers_in_time(providers, monkeypatch):
+    _, calls, _ = providers
+    assert hedge("delay", monkeypatch) == GEMINI_MAP
+    assert calls == ["gemini"]
+    assert nlp_service.HEDGE_STATS["hedges_started"] == 0
+
+
+def test_delay_falls_back_sequentially_when_gemini_fails_in_time(providers, monkeypatch):
+    behaviour, calls, _ = providers
+    behaviour["gemini"] = (0, RuntimeError("down"))
+    assert hedge("delay", monkeypatch) == MISTRAL_MAP
+    assert calls == ["gemini", "mistral"]
+    assert nlp_service.HEDGE_STATS["hedges_started"] == 0
+
+
+def test_delay_hedges_a_slow_gemini(providers, monkeypatch):
+    behaviour, calls, cancelled = providers
+    behaviour["gemini"] = (10, GEMINI_MAP)
+    assert hedge("delay", monkeypatch, cancelled) == MISTRAL_MAP
+    assert calls == ["gemini", "mistral"]
+    assert nlp_service.HEDGE_STATS == {"hedges_started": 1, "hedges_won": 1, "hedges_lost": 0}
@@ -0,0 +1,55 @@
+from json_extractor import IncrementalMapParser, extract_map_json
+
+MAP = '{"nodes": ["AI", "ML"], "edges": [["AI", "ML", ""]]}'
+EXPECTED = {"nodes": ["AI", "ML"], "edges": [["AI", "ML", ""]]}
+
+
+def test_bare_json():
+    assert extract_map_json(MAP) == EXPECTED
+
+
+def test_json_fence_with_prose():
+    assert extract_map_json(f"Here is the map:\n```json\n{MAP}\n```\nHope this helps!") == EXPECTED
+
+
+def test_other_fence_before_json_fence():
+    reply = f"Parse it like this:\n```python\nimport json\nprint(json.loads(data))\n```\n```json\n{MAP}\n```"
+    assert extract_map_json(reply) == EXPECTED
+
+
+def test_plain_fence_before_bare_json():
+    reply = f"The format:\n```\nnodes, edges\n```\nThe map:\n{MAP}"
+    assert extract_map_json(reply) == EXPECTED
+
+
+def test_untagged_fence():
+    assert extract_map_json(f"```\n{MAP}\n```") == EXPECTED
+
+
+def test_trailing_commas():
+    reply = '{"nodes": ["AI", "ML",], "edges": [["AI", "ML", ""],],}'
+    assert extract_map_json(reply) == EXPECTED
+
+
+def test_truncated_reply_is_salvaged():
+    reply = '```json\n{"nodes": ["AI", "ML", "DL"], "edges": [["AI", "ML", ""], ["AI", "DL'
+    assert extract_map_json(reply) == {"nodes": ["AI", "ML", "DL"], "edges": [["AI", "ML", ""]]}
+
+
+def test_object_shaped_nodes_and_edges():
+    reply = '{"nodes": [{"name": "AI"}, {"label": "ML"}], "edges": [{"source": "AI", "target": "ML"}]}'
+    assert extract_map_json(reply) == EXPECTED
+
+
+def test_nothing_usable():
+    assert extract_map_json("") is None
+    assert extract_map_json("Sorry, I cannot help with that.") is None
+    assert extract_map_json("```python\nprint('hi')\n```") is None
+
+
+def test_incremental_parser_reports_items_as_they_complete():
+    parser = IncrementalMapParser()
+    events = []
+    for start in range(0, len(MAP), 7):
+        events.extend(parser.feed(MAP[start:start + 7]))
+    assert events == [("node", "AI"), ("node", "ML"), ("edge", ["AI", "ML", ""])]
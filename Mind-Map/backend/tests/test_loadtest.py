@@ -0,0 +1,24 @@
+import pytest
+
+from loadtest.run import percentile
+
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    (list(range(1, 11)), 0.50, 5),
+    (list(range(1, 11)), 0.90, 9),
+    (list(range(1, 11)), 0.95, 10),
+    (list(range(1, 101)), 0.50, 50),
+    (list(range(1, 101)), 0.95, 95),
+    (list(range(1, 101)), 0.99, 99),
+    (list(range(1, 5)), 0.50, 2),
+    (list(range(1, 5)), 0.25, 1),
+    ([7.0], 0.99, 7.0),
+    (list(range(1, 11)), 0.0, 1),
+    (list(range(1, 11)), 1.0, 10),
+])
+def test_nearest_rank_percentile(values, fraction, expected):
+    assert percentile(values, fraction) == expected
+
+
+def test_percentile_of_nothing():
+    assert percentile([], 0.5) == 0.0
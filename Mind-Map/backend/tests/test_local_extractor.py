@@ -0,0 +1,61 @@
+import pytest
+
+from local_extractor import extract_local, search_results_text
+from mermaid_formatter import to_mermaid
+from nlp_service import local_extract
+
+TEXT = """Python is a programming language. Python supports dynamic typing and garbage collection.
+Django is a web framework written in Python. Flask is a lightweight web framework.
+NumPy provides fast arrays for scientific computing. Pandas builds on NumPy for data analysis.
+Web frameworks like Django and Flask handle routing. Scientific computing relies on NumPy."""
+
+
+def assert_tree(result, root):
+    nodes, edges = result["nodes"], result["edges"]
+    assert nodes[0] == root
+    assert len(set(nodes)) == len(nodes)
+    assert all(len(edge) == 3 and edge[0] in nodes and edge[1] in nodes for edge in edges)
+    # Every node but the root has exactly one parent, and all of them hang off the root
+    assert sorted(target for _, target, _ in edges) == sorted(nodes[1:])
+    parent = {target: source for source, target, _ in edges}
+    for node in nodes[1:]:
+        seen = set()
+        while node != root:
+            assert node not in seen
+            seen.add(node)
+            node = parent[node]
+
+
+@pytest.mark.parametrize("topic", [None, "Python Ecosystem"])
+def test_local_extract_returns_a_valid_map_for_plain_text(topic):
+    result = local_extract(TEXT, topic=topic)
+    assert result["api_used"] == "local"
+    assert result["validation"]["edges_dropped"] == 0
+    assert_tree(result, topic or result["nodes"][0])
+    assert {"Python", "Django", "Flask", "NumPy", "Dynamic Typing"} <= set(result["nodes"])
+    assert ["Python", "Dynamic Typing", "supports"] in result["edges"]
+    mermaid = to_mermaid(result["nodes"], result["edges"], main_topic=topic)
+    assert all(f'["{node}"]' in mermaid for node in result["nodes"])
+
+
+def test_local_extract_is_deterministic_and_capped(monkeypatch):
+    assert extract_local(TEXT) == extract_local(TEXT)
+    monkeypatch.setenv("LOCAL_MAX_NODES", "5")
+    monkeypatch.setenv("LOCAL_BRANCHES", "2")
+    result = extract_local(TEXT, topic="Python Ecosystem")
+    assert len(result["nodes"]) == 5
+    assert_tree(result, "Python Ecosystem")
+    assert sum(source == "Python Ecosystem" for source, _, _ in result["edges"]) == 2
+
+
+@pytest.mark.parametrize("text, root", [("", "Main Topic"), ("Hello.", "Hello")])
+def test_local_extract_without_phrases_returns_the_root(text, root):
+    result = local_extract(text, api_used="local_fallback")
+    assert result["nodes"] == [root]
+    assert result["edges"] == []
+    assert result["api_used"] == "local_fallback"
+
+
+def test_search_results_text_ends_every_field_as_a_sentence():
+    results = [{"title": "Rust", "snippet": "A systems language!", "content": ""}, {"title": "Cargo"}]
+    assert search_results_text(results) == "Rust.\nA systems language!\nCargo."
@@ -0,0 +1,92 @@
+import asyncio
+import random
+
+import pytest
+
+import nlp_service
+from long_input import merge_partial_maps, split_chunks
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta".split()
+
+
+def break_heavy_text(words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + rng.choice([".", "", "", "!\n\n"]) for _ in range(words))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_chunk_count_never_exceeds_max_chunks(seed):
+    text = break_heavy_text(random.Random(seed).randint(20000, 60000), seed)
+    chunks = split_chunks(text, 4000, 200, 8)
+    assert len(chunks) <= 8
+    # Nothing is lost: the last chunk ends the text
+    assert text.strip().endswith(chunks[-1])
+
+
+def test_chunks_end_at_breaks_and_overlap():
+    sentences = [f"Sentence number {index} talks about topic {index % 7}." for index in range(200)]
+    text = " ".join(sentences)
+    chunks = split_chunks(text, 1000, 100, 50)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # The next chunk starts inside the previous one's tail
+        assert chunk[:20] in previous[-150:]
+
+
+def test_short_text_is_one_chunk():
+    assert split_chunks("  One short text.  ", 1000, 100, 8) == ["One short text."]
+
+
+def test_merge_partial_maps_unions_case_variants_and_drops_repeats():
+    merged = merge_partial_maps([
+        {"nodes": ["Python", "Django"], "edges": [["Python", "Django", ""]]},
+        {"nodes": ["python", "Flask"], "edges": [["python", "Flask", ""], ["Python", "Django", ""],
+                                                  ["Flask", "flask", ""]]},
+    ])
+    assert merged["nodes"] == ["Python", "Django", "Flask"]
+    assert merged["edges"] == [["Python", "Django", ""], ["Python", "Flask", ""]]
+    assert merged["graph"].names == ["Python", "Django", "Flask"]
+
+
+def test_extract_long_text_maps_chunks_concurrently_and_falls_back_per_chunk(monkeypatch):
+    monkeypatch.setenv("LONG_INPUT_CHUNK_CHARS", "500")
+    monkeypatch.setenv("LONG_INPUT_OVERLAP", "0")
+    monkeypatch.setenv("LONG_INPUT_MAX_CHUNKS", "4")
+    calls = []
+
+    async def call_mistral(chunk, is_research_mode=False):
+        calls.append("mistral")
+        if len(calls) == 1:
+            return {"nodes": [], "edges": [], "api_used": "mistral_failed"}
+        return {"nodes": ["Root", f"Part {len(calls)}"], "edges": [["Root", f"Part {len(calls)}", ""]],
+                "api_used": "mistral"}
+
+    async def call_gemini(chunk, is_research_mode=False):
+        calls.append("gemini")
+        return {"nodes": ["Root", "Gemini Part"], "edges": [["Root", "Gemini Part", ""]], "api_used": "gemini"}
+
+    monkeypatch.setattr(nlp_service, "call_mistral", call_mistral)
+    monkeypatch.setattr(nlp_service, "call_gemini", call_gemini)
+    text = " ".join(f"Sentence {index} is about something." for index in range(100))
+
+    result = asyncio.run(nlp_service.extract_long_text(text, use_mistral=True, use_gemini=True))
+    assert result["chunks"] == {"total": 4, "succeeded": 4}
+    assert calls.count("gemini") == 1
+    assert result["api_used"] == "mistral+gemini"
+    assert result["nodes"][0] == "Root"
+    assert "Gemini Part" in result["nodes"]
+
+
+def test_extract_long_text_falls_back_to_local_extractor(monkeypatch):
+    monkeypatch.setenv("LONG_INPUT_CHUNK_CHARS", "500")
+
+    async def failed(chunk, is_research_mode=False):
+        return {"nodes": [], "edges": [], "api_used": "mistral_failed"}
+
+    monkeypatch.setattr(nlp_service, "call_mistral", failed)
+    text = " ".join(f"Photosynthesis converts light energy in plant cell number {index}." for index in range(60))
+    result = asyncio.run(nlp_service.extract_long_text(text, use_mistral=True, use_gemini=False))
+    assert result["api_used"] == "local_fallback"
+    assert nlp_service.is_valid_map(result)
@@ -0,0 +1,19 @@
+import pytest
+
+from main import is_cacheable
+
+
+@pytest.mark.parametrize("api_used", [
+    "mistral", "gemini", "mistral+gemini", "local", "research+gemini", "research+mistral", "research+local",
+])
+def test_provider_maps_are_cached(api_used):
+    assert is_cacheable(api_used)
+
+
+@pytest.mark.parametrize("api_used", [
+    "error", "unknown", "api_failure", "gemini_failed", "local_fallback", "mock_mode",
+    "research+error", "research+unknown", "research+api_failure", "research+mistral_failed",
+    "research+local_fallback",
+])
+def test_failures_and_fallbacks_are_not_cached(api_used):
+    assert not is_cacheable(api_used)
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from graph import MindMapGraph, sanitize_node_id
+from mermaid_formatter import graph_to_mermaid, to_mermaid
+from legacy_mermaid_formatter import to_mermaid as legacy_to_mermaid
+
+DISTINCT = ["Machine Learning", "Deep Learning", "Neural Networks", "Data Science", "Statistics",
+            "Supervised Learning", "Unsupervised Learning", "Reinforcement Learning", "PyTorch", "TensorFlow",
+            "Tools and Frameworks", "Learning Paradigms", "Computer Vision", "NLP", "Transformers", "AI"]
+# Names whose old sanitized IDs collide ("C", "Node_js", "Q_and_A", "n_3D_Graphics")
+COLLIDING = ["C++", "C#", "C", "Node.js", "Node js", "Node-js", "Q&A", "Q and A", "3D Graphics", "3D-Graphics"]
+TOPICS = [None, "Machine Learning", "learning", "Quantum Gardening", "C++", "Node.js"]
+
+
+def random_map(rng: random.Random, pool):
+    names = rng.sample(pool, rng.randint(2, len(pool)))
+    nodes = [name for name in names if rng.random() < 0.8]
+    edges = []
+    for _ in range(rng.randint(1, 3 * len(names))):
+        edges.append([rng.choice(names), rng.choice(names), rng.choice(["", "uses"])])
+    return nodes, edges
+
+
+def new_and_reference(nodes, edges, topic):
+    graph = MindMapGraph.from_lists(nodes, edges)
+    output = graph_to_mermaid(graph, main_topic=topic)
+    # The reference renders with the IDs the graph allocated (unique even when names collide)
+    reference = legacy_to_mermaid(nodes, edges, topic, node_id=lambda name: graph.ids[graph.index(name)])
+    return output, reference
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_matches_the_old_formatter(seed):
+    rng = random.Random(seed)
+    nodes, edges = random_map(rng, DISTINCT)
+    topic = rng.choice(TOPICS)
+    assert to_mermaid(nodes, edges, main_topic=topic) == legacy_to_mermaid(nodes, edges, topic)
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_matches_the_old_formatter_when_ids_collide(seed):
+    rng = random.Random(seed)
+    nodes, edges = random_map(rng, DISTINCT[:6] + COLLIDING)
+    output, reference = new_and_reference(nodes, edges, rng.choice(TOPICS))
+    assert output == reference
+
+
+def test_colliding_names_get_distinct_ids():
+    nodes = ["Languages", "C++", "C#", "C"]
+    edges = [["Languages", "C++", ""], ["Languages", "C#", ""], ["Languages", "C", ""]]
+    output, reference = new_and_reference(nodes, edges, "Languages")
+    assert output == reference
+    for line in ('C["C++"];', 'C_2["C#"];', 'C_3["C"];', "Languages --> C_2;", "Languages --> C_3;"):
+        assert f"    {line}" in output.splitlines()
+    # The old IDs merged all three into one Mermaid node
+    assert legacy_to_mermaid(nodes, edges, "Languages").count("Languages --> C;") == 3
+
+
+def test_sanitize_node_id():
+    assert sanitize_node_id("Node.js (runtime)") == "Node_js_runtime"
+    assert sanitize_node_id("3D Graphics") == "n_3D_Graphics"
+    assert sanitize_node_id("Q&A") == "Q_and_A"
+    assert sanitize_node_id("") == "empty_node"
+    # Stable across processes, unlike the old hash()-based fallback
+    assert sanitize_node_id("😀") == "node_8756"
@@ -0,0 +1,22 @@
+from nlp_service import merge_search_results, research_queries, research_settings
+
+
+def test_research_settings_are_read_after_import(monkeypatch):
+    monkeypatch.setenv("RESEARCH_FACETS", "tools, ,history")
+    monkeypatch.setenv("RESEARCH_HEDGE_POLICY", " Race ")
+    assert research_queries("Rust") == ["Rust", "Rust tools", "Rust history"]
+    assert research_settings()["hedge_policy"] == "race"
+
+
+def test_merge_search_results_interleaves_and_dedups_links():
+    first = [{"link": "https://www.a.example/x/"}, {"link": "https://b.example/"}]
+    second = [{"link": "http://a.example/x"}, {"link": "https://c.example/"}]
+    merged = merge_search_results([first, second], limit=10)
+    assert [result["link"] for result in merged] == ["https://www.a.example/x/", "https://b.example/",
+                                                     "https://c.example/"]
+    assert len(merge_search_results([first, second], limit=2)) == 2
+
+
+def test_research_fan_out_is_opt_in(monkeypatch):
+    monkeypatch.delenv("RESEARCH_FACETS", raising=False)
+    assert research_queries("Rust") == ["Rust"]
@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+
+import rate_limit
+from rate_limit import ProviderLimiter, RateLimitTimeout, TokenBucket, retry_after_seconds, send_with_retry
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.wait_time(1) == 0
+    bucket.take(2)
+    assert bucket.wait_time(1) == pytest.approx(0.1, abs=0.02)
+    # More than the capacity is capped, not impossible
+    assert bucket.wait_time(50) == pytest.approx(0.2, abs=0.02)
+
+
+def test_limiter_queues_instead_of_failing():
+    async def scenario():
+        limiter = ProviderLimiter("test", requests_per_second=50, max_wait=5)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*[limiter.acquire() for _ in range(55)])
+        # 50 from the full bucket, the other 5 refill at 50/s
+        assert loop.time() - start >= 0.08
+        assert limiter.stats["acquired"] == 55
+        assert limiter.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_limiter_times_out_when_the_wait_is_too_long():
+    async def scenario():
+        limiter = ProviderLimiter("test", requests_per_second=1, max_wait=0.1)
+        await limiter.acquire()
+        with pytest.raises(RateLimitTimeout):
+            await limiter.acquire()
+        assert limiter.stats["timeouts"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = ProviderLimiter("test", max_wait=5)
+        limiter.pause(1)
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(httpx.Response(429, headers={"retry-after": "3"})) == 3
+    assert retry_after_seconds(httpx.Response(429, headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    assert retry_after_seconds(httpx.Response(429)) is None
+
+
+def test_send_with_retry_backs_off_on_429(monkeypatch):
+    monkeypatch.setitem(rate_limit._limiters, "test", ProviderLimiter("test", max_wait=5))
+    monkeypatch.setenv("PROVIDER_RETRY_BASE_DELAY", "0.01")
+    answers = [httpx.Response(429), httpx.Response(503), httpx.Response(200)]
+
+    async def send():
+        return answers.pop(0)
+
+    response = asyncio.run(send_with_retry("test", send))
+    assert response.status_code == 200
+    assert rate_limit._limiters["test"].stats["retries"] == 2
+
+
+def test_send_with_retry_gives_up_on_long_retry_after(monkeypatch):
+    monkeypatch.setitem(rate_limit._limiters, "test", ProviderLimiter("test", max_wait=5))
+    calls = 0
+
+    async def send():
+        nonlocal calls
+        calls += 1
+        return httpx.Response(429, headers={"retry-after": "60"})
+
+    response = asyncio.run(send_with_retry("test", send))
+    assert response.status_code == 429
+    assert calls == 1
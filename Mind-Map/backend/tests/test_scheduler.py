@@ -0,0 +1,76 @@
+import asyncio
+
+from scheduler import BatchScheduler, provider_slot
+
+
+def test_results_arrive_in_completion_order_with_errors():
+    async def scenario():
+        scheduler = BatchScheduler(max_concurrency=3)
+
+        def job(delay, fail=False):
+            async def run():
+                await asyncio.sleep(delay)
+                if fail:
+                    raise ValueError("bad input")
+                return delay
+            return run
+
+        results = [item async for item in scheduler.run([job(0.03), job(0.01, fail=True), job(0.02)])]
+        assert [index for index, _, _ in results] == [1, 2, 0]
+        assert isinstance(results[0][2], ValueError)
+        assert results[2][1] == 0.03
+        assert scheduler.info()["completed"] == 2 and scheduler.info()["failed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_caps():
+    async def scenario():
+        scheduler = BatchScheduler(max_concurrency=4, provider_limits={"mistral": 2})
+        running = {"jobs": 0, "calls": 0}
+        peak = {"jobs": 0, "calls": 0}
+
+        async def job():
+            running["jobs"] += 1
+            peak["jobs"] = max(peak["jobs"], running["jobs"])
+            async with provider_slot("mistral"):
+                running["calls"] += 1
+                peak["calls"] = max(peak["calls"], running["calls"])
+                await asyncio.sleep(0.005)
+                running["calls"] -= 1
+            running["jobs"] -= 1
+
+        async for _ in scheduler.run([job] * 12):
+            pass
+        assert peak == {"jobs": 4, "calls": 2}
+
+    asyncio.run(scenario())
+
+
+def test_stopping_early_cancels_the_rest_and_clears_the_queue():
+    async def scenario():
+        scheduler = BatchScheduler(max_concurrency=2)
+        started = 0
+
+        async def job():
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.01 if started == 1 else 10)
+
+        stream = scheduler.run([job] * 6)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        assert scheduler.info()["queued"] == 0
+        assert scheduler.info()["running"] == 0
+        assert started <= 3
+
+    asyncio.run(scenario())
+
+
+def test_provider_slot_is_a_no_op_outside_batches():
+    async def scenario():
+        async with provider_slot("mistral"):
+            return True
+
+    assert asyncio.run(scenario())
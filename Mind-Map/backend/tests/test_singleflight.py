@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "map"
+
+        callers = [asyncio.ensure_future(flights.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.info()["in_flight"] == 1
+        release.set()
+        results = await asyncio.gather(*callers)
+        assert calls == 1
+        assert sorted(shared for _, shared in results) == [False, True, True]
+        assert all(result == "map" for result, _ in results)
+        assert flights.info() == {"in_flight": 0, "leaders": 1, "coalesced": 2}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_run():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "map"
+
+        leader = asyncio.ensure_future(flights.do("key", work))
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        assert await follower == ("map", True)
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter_and_the_key_is_retried():
+    async def scenario():
+        flights = SingleFlight()
+        attempts = 0
+
+        async def work():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0)
+            if attempts == 1:
+                raise RuntimeError("provider down")
+            return "map"
+
+        outcomes = await asyncio.gather(flights.do("key", work), flights.do("key", work), return_exceptions=True)
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        assert await flights.do("key", work) == ("map", False)
+        assert attempts == 2
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_run_still_finishes_and_clears_its_key():
+    async def scenario():
+        flights = SingleFlight()
+        finished = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            finished.set()
+            return "map"
+
+        caller = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        assert flights.info()["in_flight"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+
+import main
+import nlp_service
+import streaming
+from cache import TTLCache
+
+REPLY = '```json\n{"nodes": ["Python", "Django", "Flask"], "edges": [["Python", "Django", ""], ["Python", "Flask", ""]]}\n```'
+
+
+def chunks(text, size=9):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(nlp_service, "_providers", {
+        **nlp_service.providers(), "mock_mode": False, "gemini_valid": True, "mistral_valid": True,
+    })
+    map_cache = TTLCache("generate_map", ttl=60)
+    monkeypatch.setattr(main, "map_cache", lambda: map_cache)
+    return map_cache
+
+
+def post_stream(body):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/generate_map/stream", json=body)
+            assert response.headers["content-type"].startswith("text/event-stream")
+            return parse_sse(response.text)
+    return asyncio.run(run())
+
+
+def test_stream_emits_deltas_then_the_final_map(app, monkeypatch):
+    async def stream_mistral(text, is_research_mode=False):
+        for chunk in chunks(REPLY):
+            yield chunk
+
+    monkeypatch.setitem(streaming.STREAMERS, "mistral", stream_mistral)
+    events = post_stream({"text": "Python web frameworks"})
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["provider", "node", "node", "node", "edge", "edge", "done"]
+    assert events[1][1] == {"id": "Python", "label": "Python", "mermaid": 'Python["Python"];'}
+    assert events[4][1]["mermaid"] == "Python --> Django;"
+    done = events[-1][1]
+    assert done["api_used"] == "mistral" and done["cache"] == "miss"
+    assert "Django" in done["mermaid"] and "Flask" in done["mermaid"]
+
+    # The finished map was cached: the next request is answered with a single "done"
+    assert post_stream({"text": "Python web frameworks"}) == [("done", {**done, "cache": "hit"})]
+
+
+def test_failed_stream_is_reset_and_the_next_provider_finishes(app, monkeypatch):
+    async def stream_mistral(text, is_research_mode=False):
+        yield REPLY[:40]
+        raise httpx.ReadTimeout("stream stalled")
+
+    async def stream_gemini(text, is_research_mode=False):
+        yield REPLY
+
+    monkeypatch.setitem(streaming.STREAMERS, "mistral", stream_mistral)
+    monkeypatch.setitem(streaming.STREAMERS, "gemini", stream_gemini)
+    events = post_stream({"text": "Python frameworks"})
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[:2] == ["provider", "node"]
+    assert "reset" in kinds
+    reset = kinds.index("reset")
+    assert events[reset + 1] == ("provider", {"provider": "gemini"})
+    assert events[-1][0] == "done" and events[-1][1]["api_used"] == "gemini"
@@ -0,0 +1,149 @@
+import os
+import time
+import secrets
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+class Span:
+    __slots__ = ("span_id", "parent_id", "name", "start", "duration", "attrs")
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, start: float, attrs: Dict[str, Any]):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.duration: Optional[float] = None
+        self.attrs = attrs
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round(self.start * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            **({"attrs": self.attrs} if self.attrs else {}),
+        }
+
+
+class Trace:
+    """Spans of one request, with start offsets relative to the start of the trace."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, **attrs):
+        self.trace_id = trace_id or secrets.token_hex(8)
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Span] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = self.elapsed()
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: one entry per finished span plus the total."""
+        entries = [f"{span.name};dur={span.duration * 1000:.1f}" for span in self.spans if span.duration is not None]
+        entries.append(f"total;dur={(self.duration if self.duration is not None else self.elapsed()) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def summary(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "spans": len(self.spans),
+            **self.attrs,
+        }
+
+    def to_dict(self) -> Dict:
+        return {**self.summary(), "spans": [span.to_dict() for span in self.spans]}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Record the enclosed block as a span of the current trace and yield it
+    (None outside a trace) so callers can add attributes as they learn them.
+    Tasks started inside the block inherit it as their parent span.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    record = Span(len(trace.spans) + 1, _current_span.get(), name, trace.elapsed(), attrs)
+    trace.spans.append(record)
+    token = _current_span.set(record.span_id)
+    try:
+        yield record
+    except BaseException as e:
+        record.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        record.duration = trace.elapsed() - record.start
+
+
+class TraceBuffer:
+    """Bounded ring buffer of finished traces (oldest dropped first)."""
+
+    def __init__(self, size: int = 200):
+        self.traces: deque = deque(maxlen=max(1, size))
+
+    @contextmanager
+    def trace(self, name: str, **attrs):
+        """Make a new trace current for the enclosed block and keep it once finished."""
+        trace = Trace(name, **attrs)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            yield trace
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            trace.finish()
+            self.traces.append(trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        for trace in self.traces:
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0) -> List[Dict]:
+        """Summaries of the newest traces first, optionally only the slow ones."""
+        found = []
+        for trace in reversed(self.traces):
+            if trace.duration is not None and trace.duration * 1000 >= min_duration_ms:
+                found.append(trace.summary())
+                if len(found) >= limit:
+                    break
+        return found
+
+    def info(self) -> Dict:
+        return {"size": self.traces.maxlen, "stored": len(self.traces)}
+
+
+def buffer_from_env() -> TraceBuffer:
+    """Trace ring buffer sized by TRACE_BUFFER_SIZE."""
+    try:
+        size = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+    except ValueError:
+        size = 200
+    return TraceBuffer(size)